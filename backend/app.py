@@ -1,11 +1,13 @@
+import io
 import os
 import subprocess
 import json
 import tempfile
 import re
 import time
-from datetime import datetime
-from flask import Flask, jsonify, request, send_file
+import uuid
+from datetime import date, datetime
+from flask import Flask, Response, g, jsonify, request, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import logging
@@ -23,121 +25,263 @@ logger = logging.getLogger(__name__)
 from dotenv import load_dotenv
 load_dotenv()
 
+from batch_payments import PaymentsError, plan_batch, read_payments_file, read_payments_list
+from cache import SnapshotCache
+from coin_selection import STRATEGIES as COIN_SELECTION_STRATEGIES, InsufficientFunds, select_notes
+from events import EventBus, StreamLimit, sse_event
+from history_store import HistoryStore, InvalidCursor
+from http_cache import compress_response, etag_for, not_modified, with_etag
+from jobs import JobManager, JobQueueFull
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as metrics
+from note_parser import ListNotesParser, NoteSetTracker
+from scheduler import background_priority
+from sync_worker import SyncWorker
+from tx_watcher import TxFolderWatcher
+from wallet_runner import (
+    NOCKCHAIN_WALLET_HOST,
+    TX_FOLDER,
+    coalesce,
+    executor as wallet_executor,
+    last_command,
+    open_wallet_stream,
+    run_wallet_command,
+    runner_stats,
+    shared_state
+)
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Permet toutes les origines en développement
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
-app.config['TX_FOLDER'] = os.path.join(os.path.dirname(__file__), 'txs')  # Use local txs folder
-app.config['HISTORY_FILE'] = os.path.join(os.path.dirname(__file__), 'wallet_history.json')
-
-# Check if running in Docker
-NOCKCHAIN_WALLET_HOST = os.getenv('NOCKCHAIN_WALLET_HOST')
-if NOCKCHAIN_WALLET_HOST:
-    # Running in Docker - wallet commands will be executed in the wallet container
-    WALLET_CMD_PREFIX = ['docker', 'exec', 'nockchain-wallet-service', 'nockchain-wallet']
-    logger.info(f"Running in Docker mode - wallet container: {NOCKCHAIN_WALLET_HOST}")
-else:
-    # Running locally - use local nockchain-wallet
-    WALLET_CMD_PREFIX = ['nockchain-wallet']
-    logger.info("Running in local mode - using local nockchain-wallet")
+app.config['TX_FOLDER'] = TX_FOLDER  # Use local txs folder, as the recording/replay executors do
+app.config['HISTORY_FILE'] = os.path.join(os.path.dirname(__file__), 'wallet_history.json')  # Legacy history, imported once
+app.config['HISTORY_DB'] = os.getenv('HISTORY_DB') or os.path.join(os.path.dirname(__file__), 'wallet_history.db')
+app.config['BALANCE_CACHE_TTL'] = float(os.getenv('BALANCE_CACHE_TTL', 30))  # Seconds before a background refresh
+app.config['SYNC_WORKER_ENABLED'] = os.getenv('SYNC_WORKER_ENABLED', 'True').lower() == 'true'
+app.config['SYNC_MIN_INTERVAL'] = float(os.getenv('SYNC_MIN_INTERVAL', 15))  # Seconds between syncs while notes change
+app.config['SYNC_MAX_INTERVAL'] = float(os.getenv('SYNC_MAX_INTERVAL', 300))  # Back-off ceiling while nothing changes
+app.config['SYNC_FAST_INTERVAL'] = float(os.getenv('SYNC_FAST_INTERVAL', 5))  # Interval right after a transaction
+app.config['SYNC_BURST_SYNCS'] = int(os.getenv('SYNC_BURST_SYNCS', 12))  # Number of fast syncs after a transaction
+app.config['COIN_SELECTION_STRATEGY'] = os.getenv('COIN_SELECTION_STRATEGY', 'auto')  # auto, bnb, min-inputs, min-change, greedy
+app.config['COIN_SELECTION_TIME_BUDGET'] = float(os.getenv('COIN_SELECTION_TIME_BUDGET', 0.1))  # Seconds before falling back to the best set found
+app.config['BATCH_OUTPUTS_PER_TX'] = int(os.getenv('BATCH_OUTPUTS_PER_TX', 50))  # Recipients per create-tx (1 if the CLI takes a single recipient)
+app.config['BATCH_MAX_PAYMENTS'] = int(os.getenv('BATCH_MAX_PAYMENTS', 1000))  # Payments accepted in one batch request
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))  # Threads running ?async=true operations
+app.config['JOB_QUEUE_SIZE'] = int(os.getenv('JOB_QUEUE_SIZE', 32))  # Pending jobs before new ones are refused
+app.config['EVENTS_KEEPALIVE'] = float(os.getenv('EVENTS_KEEPALIVE', 15))  # Seconds between keep-alive comments on /api/events
+app.config['MAX_STREAMS'] = int(os.getenv('MAX_STREAMS', max(1, int(os.getenv('WEB_THREADS', 32)) // 2)))  # Open /api/events, /api/balance/stream and pipeline progress streams before new ones get 503
+app.config['COMPRESS_RESPONSES'] = os.getenv('COMPRESS_RESPONSES', 'True').lower() == 'true'  # gzip/brotli for JSON bodies
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # Smaller bodies are sent as is
+app.config['READY_MAX_SNAPSHOT_AGE'] = float(os.getenv('READY_MAX_SNAPSHOT_AGE', 2 * app.config['SYNC_MAX_INTERVAL']))  # Older balance snapshots fail /readyz
+app.config['READY_MAX_QUEUED'] = int(os.getenv('READY_MAX_QUEUED', 16))  # Waiting wallet commands before /readyz fails
+
+HTTP_SECONDS = metrics.histogram(
+    'http_request_duration_seconds',
+    "Time to build a response (streams: until the first byte), by route",
+    ('method', 'endpoint', 'status')
+)
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.monotonic()
+
+@app.after_request
+def _observe_request(response):
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        # The route pattern, not the path, keeps the label set small
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_SECONDS.observe(time.monotonic() - start, method=request.method, endpoint=endpoint,
+                             status=response.status_code)
+    return response
+
+@app.after_request
+def _compress(response):
+    if app.config['COMPRESS_RESPONSES']:
+        compress_response(response, min_size=app.config['COMPRESS_MIN_SIZE'])
+    return response
 
 # Create txs folder if it doesn't exist
 os.makedirs(app.config['TX_FOLDER'], exist_ok=True)
 
-def get_wallet_public_key():
-    """Get the wallet's active address using list-active-addresses."""
+# Index of .tx files kept current by filesystem events (TX_WATCHER=auto, inotify or poll)
+tx_watcher = TxFolderWatcher(app.config['TX_FOLDER'], mode=os.getenv('TX_WATCHER', 'auto'))
+tx_watcher.start()
+
+# Balance deltas, transaction status transitions and address switches for /api/events
+event_bus = EventBus()
+if shared_state:
+    # Streams in every worker get every worker's events
+    event_bus.follow(shared_state.event_log())
+# Each open stream holds a server thread; the rest stay free for requests and probes
+stream_limit = StreamLimit(app.config['MAX_STREAMS'])
+
+def streams_exhausted():
+    """503 answer for a stream refused by stream_limit."""
+    logger.warning(f"Refusing stream: {stream_limit.limit} streams already open")
+    return jsonify({"success": False, "error": "Too many open streams, try again later."}), 503, {"Retry-After": "30"}
+
+def _load_active_address():
+    """Run list-active-addresses; return {"address", "version"} or {"error"}."""
     try:
-        cmd = WALLET_CMD_PREFIX + ['list-active-addresses']
+        cmd = ['list-active-addresses']
         logger.info("Getting active address with command: %s", " ".join(cmd))
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=30
-        )
+        result = run_wallet_command(cmd, timeout=30)
         
         output = result.stdout
         logger.info(f"Active address command output received: {len(output)} chars")
         
         # Parse the output to extract active signing address
         # Look for address in "Addresses -- Signing" section
+        address = None
+        version = None
         signing_section = re.search(r'Addresses -- Signing(.*?)(?:Addresses -- Watch only|$)', output, re.DOTALL)
         if signing_section:
             address_match = re.search(r'- Address:\s*([^\n]+)', signing_section.group(1))
+            version_match = re.search(r'- Version:\s*(\d+)', signing_section.group(1))
             
             if address_match:
                 address = address_match.group(1).strip()
                 logger.info(f"Active wallet address extracted: {address[:50]}...")
-                return address
+            if version_match:
+                version = int(version_match.group(1))
         
-        logger.warning("Could not extract active address from output")
-        return None
+        if not address:
+            logger.warning("Could not extract active address from output")
+        return {"address": address, "version": version}
         
     except subprocess.TimeoutExpired:
         logger.error("Command timed out")
-        return None
+        return {"error": "Command timed out"}
     except subprocess.CalledProcessError as e:
         logger.error(f"Error getting active address: {e.stderr}")
-        return None
+        return {"error": e.stderr}
     except Exception as e:
         logger.error(f"Unexpected error getting active address: {str(e)}")
-        return None
+        return {"error": str(e)}
+
+def _load_master_addresses():
+    """Run list-master-addresses; return {"addresses": [...]} or {"error"}."""
+    try:
+        cmd = ["list-master-addresses"]
+        logger.info("Listing master addresses with command: %s", " ".join(cmd))
+        
+        result = run_wallet_command(cmd, timeout=30)
+        
+        output = result.stdout
+        logger.info("Master addresses output: %s", output)
+        
+        # Parse the output to extract all addresses
+        addresses = []
+        
+        # Split by separator "―"
+        sections = output.split('―')
+        
+        for section in sections:
+            if 'Address:' in section:
+                address_match = re.search(r'- Address:\s*([^\n]+?)(?:\s*\(active\))?$', section, re.MULTILINE)
+                version_match = re.search(r'- Version:\s*(\d+)', section)
+                is_active = '(active)' in section
+                
+                if address_match:
+                    address = address_match.group(1).strip()
+                    version = int(version_match.group(1)) if version_match else None
+                    
+                    addresses.append({
+                        "address": address,
+                        "version": version,
+                        "is_active": is_active
+                    })
+        
+        return {"addresses": addresses}
+        
+    except subprocess.TimeoutExpired:
+        logger.error("Command timed out")
+        return {"error": "Command timed out"}
+    except subprocess.CalledProcessError as e:
+        logger.error("Command failed with error: %s", e.stderr)
+        return {"error": e.stderr}
+    except Exception as e:
+        logger.error("Error listing master addresses: %s", str(e))
+        return {"error": str(e)}
+
+_last_active_address = None
+
+def _load_active_address_state():
+    """Load the active address (one CLI run for concurrent callers) and announce switches."""
+    global _last_active_address
+    state = coalesce('active_address', _load_active_address)
+    address = state.get('address')
+    if address and address != _last_active_address:
+        if _last_active_address is not None:
+            logger.info(f"Active address changed to {address[:50]}...")
+            event_bus.publish('active-address', {"address": address, "version": state.get('version')})
+        _last_active_address = address
+    return state
+
+# Active address/version and master address list only change through
+# set-active-address and key imports, which call invalidate_address_state();
+# there is no TTL. Concurrent misses share one CLI run.
+active_address_cache = SnapshotCache(
+    "active_address",
+    _load_active_address_state,
+    ttl=None,
+    is_valid=lambda state: not state.get('error') and bool(state.get('address')),
+    shared=shared_state.snapshot('active_address') if shared_state else None
+)
+master_addresses_cache = SnapshotCache(
+    "master_addresses",
+    lambda: coalesce('master_addresses', _load_master_addresses),
+    ttl=None,
+    is_valid=lambda state: not state.get('error'),
+    shared=shared_state.snapshot('master_addresses') if shared_state else None
+)
+
+def invalidate_address_state():
+    """Forget the cached address state and re-read the active address.
+    
+    Re-reading right away (list-active-addresses is cheap) lets /api/events
+    announce an address switch without waiting for the next reader.
+    """
+    active_address_cache.invalidate()
+    master_addresses_cache.invalidate()
+    active_address_cache.refresh()
+
+def get_wallet_public_key():
+    """Get the wallet's active address (cached, see active_address_cache)."""
+    state, _ = active_address_cache.get()
+    return state.get('address')
 
 def get_tx_files_in_folder():
-    """Get all .tx files in the txs folder with their modification times."""
-    tx_files = {}
-    if os.path.exists(app.config['TX_FOLDER']):
-        for filename in os.listdir(app.config['TX_FOLDER']):
-            if filename.endswith('.tx'):
-                filepath = os.path.join(app.config['TX_FOLDER'], filename)
-                tx_files[filename] = os.path.getmtime(filepath)
-    return tx_files
+    """Get all .tx files in the txs folder with their modification times (from the watcher index)."""
+    return tx_watcher.files()
 
 def verify_transaction_file(tx_name, old_files, timeout=5):
-    """Verify that the transaction file was created and matches the transaction name."""
+    """Verify that the transaction file was created and matches the transaction name.
+    
+    Waits for the watcher to see <tx_name>.tx appear (or get rewritten if it
+    was in old_files) instead of polling the folder.
+    """
     expected_filename = f"{tx_name}.tx"
-    start_time = time.time()
     
     logger.info(f"Verifying transaction file: {expected_filename}")
     
-    while time.time() - start_time < timeout:
-        current_files = get_tx_files_in_folder()
-        
-        # Check if the expected file exists and is new
-        if expected_filename in current_files:
-            # If it's a new file (not in old_files) or recently modified
-            if expected_filename not in old_files or current_files[expected_filename] > old_files.get(expected_filename, 0):
-                logger.info(f"✓ Transaction file verified: {expected_filename}")
-                return True
-        
-        time.sleep(0.1)
+    if tx_watcher.wait_for(expected_filename, newer_than=old_files.get(expected_filename), timeout=timeout):
+        logger.info(f"✓ Transaction file verified: {expected_filename}")
+        return True
     
     logger.warning(f"Transaction file verification failed: {expected_filename} not found")
     return False
 
-def load_transaction_history():
-    """Load transaction history from JSON file."""
-    if os.path.exists(app.config['HISTORY_FILE']):
-        try:
-            with open(app.config['HISTORY_FILE'], 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.warning("Could not decode wallet_history.json, starting fresh")
-            return []
-    return []
-
-def save_transaction_history(history):
-    """Save transaction history to JSON file."""
-    with open(app.config['HISTORY_FILE'], 'w') as f:
-        json.dump(history, indent=2, fp=f)
-    logger.info(f"Transaction history saved: {len(history)} transactions")
-
-def add_transaction_to_history(tx_hash, recipient, amount_nock, amount_nick, fee_nick, notes_used, signer, status='created'):
-    """Add a new transaction to history."""
-    history = load_transaction_history()
-    
+# Transaction history (SQLite, WAL mode); imports wallet_history.json on first start
+history_store = HistoryStore(app.config['HISTORY_DB'], legacy_json=app.config['HISTORY_FILE'])
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+def add_transaction_to_history(tx_hash, recipient, amount_nock, amount_nick, fee_nick, notes_used, signer, status='created', **extra):
+    """Add a new transaction to history (extra fields are stored as they are)."""
     transaction = {
+        **extra,
         'hash': tx_hash,
         'recipient': recipient,
         'amount_nock': amount_nock,
@@ -150,216 +294,85 @@ def add_transaction_to_history(tx_hash, recipient, amount_nock, amount_nick, fee
         'updated_at': datetime.now().isoformat()
     }
     
-    history.append(transaction)
-    save_transaction_history(history)
+    history_store.add(transaction)
+    event_bus.publish('transaction', {"hash": tx_hash, "status": status, "recipient": recipient, "amount_nick": amount_nick})
     
     logger.info(f"Transaction added to history: {tx_hash} - Status: {status} - Signer: {signer}")
     return transaction
 
 def update_transaction_status(tx_hash, new_status):
     """Update the status of a transaction in history."""
-    history = load_transaction_history()
-    updated = False
-    
-    for tx in history:
-        if tx['hash'] == tx_hash:
-            tx['status'] = new_status
-            tx['updated_at'] = datetime.now().isoformat()
-            if new_status == 'sent':
-                tx['sent_at'] = datetime.now().isoformat()
-            updated = True
-            logger.info(f"Transaction status updated: {tx_hash} -> {new_status}")
-            break
+    updated = history_store.update_status(tx_hash, new_status)
     
     if updated:
-        save_transaction_history(history)
+        event_bus.publish('transaction', {"hash": tx_hash, "status": new_status})
+        logger.info(f"Transaction status updated: {tx_hash} -> {new_status}")
     else:
         logger.warning(f"Transaction {tx_hash} not found in history")
     
     return updated
 
 def get_wallet_balance():
-    """Get wallet balance by parsing list-notes output."""
+    """Get wallet balance by parsing list-notes output.
+    
+    Concurrent callers share one CLI run and its parsed result.
+    """
+    return coalesce('wallet_balance', _load_wallet_balance)
+
+# Re-parses only the note sections that changed since the previous sync;
+# versions and deltas are shared so every worker agrees on them
+note_tracker = NoteSetTracker(history=shared_state.note_history() if shared_state else None)
+
+def delta_summary(delta):
+    """Counts of a note-set delta, for logs and stats."""
+    if delta is None:
+        return None
+    return {
+        "initial": delta["initial"],
+        "added": len(delta["added"]),
+        "spent": len(delta["spent"]),
+        "changed": len(delta["changed"]),
+        "unchanged": delta["unchanged_count"],
+        "parsed_sections": delta["parsed_sections"],
+        "reused_sections": delta["reused_sections"]
+    }
+
+PARSE_SECONDS = metrics.histogram(
+    'wallet_list_notes_parse_seconds',
+    "Time to parse list-notes output (the CLI run is in wallet_command_duration_seconds)"
+)
+SYNC_NOTES = metrics.gauge('wallet_list_notes_notes', "Notes in the last list-notes output")
+SYNC_STDOUT_BYTES = metrics.gauge('wallet_list_notes_stdout_bytes', "Size of the last list-notes output")
+
+def _load_wallet_balance():
     try:
         # Execute list-notes command
-        result = subprocess.run(
-            WALLET_CMD_PREFIX + ["list-notes"],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=120,
-            bufsize=-1
-        )
+        result = run_wallet_command(["list-notes"], timeout=120)
         
         output = result.stdout
+        logger.info(f"list-notes command executed - output length: {len(output)} characters")
+        
+        parse_start = time.monotonic()
+        balance, delta = note_tracker.parse(output)
+        PARSE_SECONDS.observe(time.monotonic() - parse_start)
+        SYNC_NOTES.set(balance['notes_count'])
+        SYNC_STDOUT_BYTES.set(len(output.encode()))
+        balance['version'] = delta['version']
+        
+        logger.info(f"Balance parsed: {balance['notes_count']} notes, total: {balance['total_assets']} nick")
+        if not delta['initial'] and (delta['added'] or delta['spent'] or delta['changed']):
+            logger.info(f"Note set changed: {len(delta['added'])} added, {len(delta['spent'])} spent, "
+                        f"{len(delta['changed'])} changed")
+            event_bus.publish('balance', {
+                "version": delta['version'],
+                "notes_count": balance['notes_count'],
+                "total_assets": balance['total_assets'],
+                "added": delta['added'],
+                "spent": delta['spent'],
+                "changed": delta['changed']
+            })
         
-        # Remove ANSI escape codes (color codes) from output
-        ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
-        output = ansi_escape.sub('', output)
-        
-        logger.info(f"list-notes command executed - output length: {len(output)} characters (ANSI codes removed)")
-        
-        # Parse the output to extract notes
-        notes = []
-        
-        # Find the "Wallet Notes" section
-        if "Wallet Notes" not in output:
-            logger.warning("No 'Wallet Notes' section found in output")
-            return {"notes": [], "notes_count": 0, "total_assets": 0}
-        
-        # Split by separator lines (50+ dashes or em-dashes)
-        # This works for both v0 and v1 as they both use separators
-        sections = re.split(r'[―\-]{50,}', output)
-        
-        logger.debug(f"Found {len(sections)} sections after split")
-        
-        note_number = 0
-        for i, section in enumerate(sections):
-            section = section.strip()
-            
-            # Skip empty sections and header
-            if not section or "Wallet Notes" in section:
-                continue
-            
-            # Detect if this is a v0 or v1 note
-            is_v1 = "Note Information" in section
-            is_v0 = "Details" in section and "Lock" in section
-            
-            if not is_v0 and not is_v1:
-                continue
-            
-            note_number += 1
-            
-            try:
-                # Extract name (same format for both versions)
-                name_match = re.search(r'- Name:\s*\[(.*?)\]', section, re.DOTALL)
-                if name_match:
-                    name = name_match.group(1).strip().replace('\n', ' ')
-                else:
-                    name = "Unknown"
-                
-                # Extract version (same format for both)
-                version_match = re.search(r'- Version:\s*(\d+)', section)
-                version = int(version_match.group(1)) if version_match else 0
-                
-                # Extract assets - different labels for v0 and v1
-                if is_v1:
-                    # V1: "Assets (nicks):"
-                    assets_match = re.search(r'- Assets \(nicks\):\s*(\d+)', section)
-                else:
-                    # V0: "Assets:"
-                    assets_match = re.search(r'- Assets:\s*(\d+)', section)
-                
-                value = int(assets_match.group(1)) if assets_match else 0
-                
-                # Extract block height - MUST be done separately for each version
-                block_height = 0
-                if is_v1:
-                    # For v1, block height is in the same section as "Note Information"
-                    block_match = re.search(r'Note Information.*?- Block Height:\s*(\d+)', section, re.DOTALL)
-                    if block_match:
-                        block_height = int(block_match.group(1))
-                else:
-                    # For v0, block height is in the "Details" section
-                    block_match = re.search(r'Details.*?- Block Height:\s*(\d+)', section, re.DOTALL)
-                    if block_match:
-                        block_height = int(block_match.group(1))
-                
-                # Extract source (only in v0)
-                source = None
-                if is_v0:
-                    source_match = re.search(r'- Source:\s*(\S+)', section)
-                    source = source_match.group(1) if source_match else "Unknown"
-                
-                # Extract signer - MUST be done separately for each version
-                signer = "Unknown"
-                
-                if is_v1:
-                    # V1: Check for N/A first
-                    if "Lock Information: N/A" in section:
-                        signer = "N/A"
-                    else:
-                        # V1: Look specifically in "Lock Information" section
-                        lock_info_match = re.search(r'- Lock Information:(.*?)(?:$)', section, re.DOTALL)
-                        if lock_info_match:
-                            lock_section = lock_info_match.group(1)
-                            
-                            # Try multiple patterns for v1 signers (ANSI codes are now removed)
-                            patterns = [
-                                r'- Signers:\s*\n\s*-\s*([A-Za-z0-9]{50,})',  # With dash and spaces
-                                r'- Signers:\s*\n\s*([A-Za-z0-9]{50,})',      # Without dash, just spaces
-                                r'Signers:\s*\n\s*-?\s*([A-Za-z0-9]{50,})',   # Optional dash
-                            ]
-                            
-                            for pattern in patterns:
-                                signer_match = re.search(pattern, lock_section)
-                                if signer_match:
-                                    signer = signer_match.group(1).strip()
-                                    logger.debug(f"V1 Signer found with pattern '{pattern}': {signer[:50]}...")
-                                    break
-                            
-                            if signer == "Unknown":
-                                logger.warning(f"V1 Signer not found. Lock section (cleaned): {repr(lock_section[:200])}")
-                else:
-                    # V0: Look specifically in "Lock" section
-                    # Use a more flexible pattern that doesn't require Lock to be at line start
-                    lock_match = re.search(r'Lock\s*\n(.*?)(?:\n\n|$)', section, re.DOTALL)
-                    if lock_match:
-                        lock_section = lock_match.group(1)
-                        
-                        # Try multiple patterns for v0 signers
-                        patterns = [
-                            r'- Signers:\s*\n\s*([A-Za-z0-9]{50,})',          # Standard format
-                            r'Signers:\s*\n\s*([A-Za-z0-9]{50,})',            # Without dash before Signers
-                            r'- Signers:\s*\n\s*-?\s*([A-Za-z0-9]{50,})',    # Optional dash before address
-                        ]
-                        
-                        for pattern in patterns:
-                            signer_match = re.search(pattern, lock_section)
-                            if signer_match:
-                                signer = signer_match.group(1).strip()
-                                logger.debug(f"V0 Signer found with pattern '{pattern}': {signer[:50]}...")
-                                break
-                        
-                        if signer == "Unknown":
-                            logger.warning(f"V0 Signer not found. Lock section: {repr(lock_section[:200])}")
-                    else:
-                        logger.warning(f"V0 Lock section not found. Section preview: {repr(section[:300])}")
-                
-                note = {
-                    'number': note_number,
-                    'name': name,
-                    'value': value,
-                    'block_height': block_height,
-                    'version': version,
-                    'signer': signer
-                }
-                
-                # Add source only for v0 notes
-                if source:
-                    note['source'] = source
-                
-                notes.append(note)
-                
-                format_type = "v1" if is_v1 else "v0"
-                logger.debug(f"Note {note_number} ({format_type}): {name[:50]}... = {value} nick (block {block_height}, signer: {signer[:30]}...)")
-                
-            except Exception as e:
-                logger.error(f"Error parsing section {i}: {str(e)}")
-                logger.debug(f"Section content (first 400 chars): {section[:400]}")
-                import traceback
-                logger.error(traceback.format_exc())
-                continue
-        
-        total_assets = sum(note["value"] for note in notes)
-        
-        logger.info(f"Balance parsed: {len(notes)} notes, total: {total_assets} nick")
-        
-        return {
-            "notes": notes,
-            "notes_count": len(notes),
-            "total_assets": total_assets
-        }
+        return balance
         
     except subprocess.TimeoutExpired:
         logger.error("list-notes command timeout")
@@ -373,10 +386,368 @@ def get_wallet_balance():
         traceback.print_exc()
         return {"notes": [], "notes_count": 0, "total_assets": 0, "error": str(e)}
 
+# Last parsed list-notes snapshot, refreshed in the background once older than the TTL
+balance_cache = SnapshotCache(
+    "balance",
+    get_wallet_balance,
+    ttl=app.config['BALANCE_CACHE_TTL'],
+    is_valid=lambda balance: not balance.get('error'),
+    shared=shared_state.snapshot('balance') if shared_state else None
+)
+
+def _background_balance_refresh():
+    # Scheduled syncs queue behind wallet commands run for requests
+    with background_priority():
+        return balance_cache.refresh()
+
+# Owns list-notes: keeps balance_cache fresh on an adaptive schedule
+sync_worker = SyncWorker(
+    _background_balance_refresh,
+    min_interval=app.config['SYNC_MIN_INTERVAL'],
+    max_interval=app.config['SYNC_MAX_INTERVAL'],
+    fast_interval=app.config['SYNC_FAST_INTERVAL'],
+    burst_syncs=app.config['SYNC_BURST_SYNCS']
+)
+
+def start_background_sync():
+    """Start the sync worker and let stale balance reads wake it.
+    
+    With several server processes (SHARED_STATE_DIR) only the first one to
+    get here runs it; the others pick its snapshots up from the shared state.
+    """
+    if not app.config['SYNC_WORKER_ENABLED']:
+        logger.info("Background sync disabled - balance cache refreshes on demand")
+        return
+    if shared_state and not shared_state.sync_lock.try_hold_forever():
+        logger.info(f"Process {os.getpid()}: another process runs the sync worker")
+        return
+    balance_cache.refresher = sync_worker.request_sync
+    sync_worker.start()
+
+def request_wallet_sync(burst=False):
+    """Ask for a sync after the wallet state changed, without waiting for it."""
+    if sync_worker.running:
+        sync_worker.request_sync(burst=burst)
+
 @app.route("/api/balance")
 def api_balance():
-    """Return balance data in JSON format."""
-    return jsonify(get_wallet_balance())
+    """Return balance data in JSON format from the snapshot cache.
+    
+    Pass ?refresh=true to bypass the cache and wait for a fresh list-notes.
+    Every snapshot carries a `version`; with ?since=<version> the answer is
+    only what changed since then: `removed` note names, `added` notes (new
+    or replaced, matched by name) and the new totals, marked `"delta": true`.
+    When that version is too old to diff against, the full snapshot is
+    returned (`"delta": false`).
+    
+    The ETag follows the snapshot version, so If-None-Match gets a 304 until
+    the notes change. Snapshot age and staleness are in the X-Cache-Age and
+    X-Cache-Stale headers rather than the body, which would change every time.
+    """
+    since = request.args.get('since') or None
+    if since is not None:
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError(since)
+        except ValueError:
+            return jsonify({"error": "since must be a snapshot version (non-negative integer)"}), 400
+    
+    if request.args.get('refresh', '').lower() in ('1', 'true'):
+        balance, age = balance_cache.refresh(), 0.0
+    else:
+        balance, age = balance_cache.get()
+    
+    changes = None
+    if since is not None and 'version' in balance:
+        changes = note_tracker.changes_since(since, balance['version'])
+    
+    etag = None
+    if 'version' in balance:
+        etag = etag_for('balance', balance['version'], '' if since is None else since, changes is not None)
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+    
+    if changes is not None:
+        payload = {
+            "delta": True,
+            "since": since,
+            "version": balance['version'],
+            "notes_count": balance['notes_count'],
+            "total_assets": balance['total_assets'],
+            **changes
+        }
+    else:
+        payload = dict(balance)
+        if since is not None:
+            payload["delta"] = False
+    response = jsonify(payload)
+    response.headers['X-Cache-Age'] = f"{age:.3f}"
+    response.headers['X-Cache-Stale'] = str(age >= balance_cache.ttl).lower()
+    return with_etag(response, etag) if etag else response
+
+@app.route("/api/cache-stats")
+def api_cache_stats():
+    """Return hit/miss/refresh counters for the snapshot caches."""
+    return jsonify({
+        "success": True,
+        "balance": balance_cache.stats(),
+        "active_address": active_address_cache.stats(),
+        "master_addresses": master_addresses_cache.stats(),
+        "sync": sync_worker.status(),
+        "note_delta": delta_summary(note_tracker.last_delta),
+        "events": event_bus.stats(),
+        "streams": stream_limit.stats(),
+        "wallet_commands": runner_stats()
+    })
+
+@metrics.collector
+def _collect_metrics():
+    caches = {cache.name: cache.stats() for cache in (balance_cache, active_address_cache, master_addresses_cache)}
+    wallet = runner_stats()
+    scheduler_stats = wallet['scheduler']
+    sync = sync_worker.status()
+    streams = stream_limit.stats()
+    return [
+        ('snapshot_cache_lookups_total', 'counter', "Snapshot cache lookups by result",
+         [({"cache": name, "result": result}, stats[key])
+          for name, stats in caches.items()
+          for result, key in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses'))]),
+        ('snapshot_cache_hit_ratio', 'gauge', "Share of lookups answered from the snapshot",
+         [({"cache": name}, stats['hit_ratio']) for name, stats in caches.items()]),
+        ('snapshot_cache_age_seconds', 'gauge', "Age of the cached snapshot",
+         [({"cache": name}, stats['age_seconds']) for name, stats in caches.items()]),
+        ('snapshot_cache_invalidations_total', 'counter', "Snapshot invalidations",
+         [({"cache": name}, stats['invalidations']) for name, stats in caches.items()]),
+        ('snapshot_cache_refresh_errors_total', 'counter', "Background refreshes that failed",
+         [({"cache": name}, stats['refresh_errors']) for name, stats in caches.items()]),
+        ('wallet_scheduler_queued', 'gauge', "Wallet commands waiting for their turn",
+         [({"priority": priority}, count) for priority, count in scheduler_stats['queued'].items()]),
+        ('wallet_scheduler_max_queue_depth', 'gauge', "Most wallet commands ever waiting at once",
+         [({}, scheduler_stats['max_queue_depth'])]),
+        ('wallet_scheduler_active_readers', 'gauge', "Read-only wallet commands running",
+         [({}, scheduler_stats['active_readers'])]),
+        ('wallet_scheduler_writer_active', 'gauge', "1 while a mutating wallet command runs",
+         [({}, scheduler_stats['writer_active'])]),
+        ('wallet_scheduler_queue_timeouts_total', 'counter', "Wallet commands that gave up waiting for their turn",
+         [({}, scheduler_stats['queue_timeouts'])]),
+        ('wallet_coalesced_total', 'counter', "Callers that shared another caller's wallet process or parsed result",
+         [({"level": level}, wallet[level]['coalesced']) for level in ('commands', 'results')]),
+        ('sync_worker_syncs_total', 'counter', "Background syncs run",
+         [({}, sync['syncs'])]),
+        ('sync_worker_errors_total', 'counter', "Background syncs that failed",
+         [({}, sync['errors'])]),
+        ('events_subscribers', 'gauge', "Open /api/events streams",
+         [({}, event_bus.stats()['subscribers'])]),
+        ('streams_open', 'gauge', "Open /api/events and /api/balance/stream responses",
+         [({}, streams['open'])]),
+        ('streams_refused_total', 'counter', "Streams refused with 503 past MAX_STREAMS",
+         [({}, streams['refused'])]),
+    ]
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text format: request and wallet command latencies, caches, scheduler."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process answers requests. Touches nothing else."""
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 200 when the wallet is reachable, the balance snapshot fresh and the queue short, 503 otherwise.
+    
+    Never runs a wallet command: the executor probe checks the binary or the
+    container, and the snapshot is read with peek(). The snapshot age only
+    counts in the process running the sync worker, which keeps it fresh;
+    elsewhere snapshots load on demand.
+    """
+    executor_check = wallet_executor.probe()
+    
+    balance, age = balance_cache.peek()
+    max_age = app.config['READY_MAX_SNAPSHOT_AGE']
+    enforced = sync_worker.running
+    snapshot_check = {
+        "ok": not enforced or (age is not None and age <= max_age),
+        "age_seconds": round(age, 3) if age is not None else None,
+        "max_age_seconds": max_age,
+        "version": balance.get('version') if balance else None,
+        "enforced": enforced
+    }
+    
+    scheduler_stats = runner_stats()['scheduler']
+    queued = sum(scheduler_stats['queued'].values())
+    scheduler_check = {
+        "ok": queued <= app.config['READY_MAX_QUEUED'],
+        "queued": queued,
+        "max_queued": app.config['READY_MAX_QUEUED'],
+        "active_readers": scheduler_stats['active_readers'],
+        "writer_active": scheduler_stats['writer_active']
+    }
+    
+    ready = executor_check['reachable'] and snapshot_check['ok'] and scheduler_check['ok']
+    return jsonify({
+        "ready": ready,
+        "executor": {**wallet_executor.describe(), **executor_check},
+        "snapshot": snapshot_check,
+        "scheduler": scheduler_check,
+        "last_command": last_command()
+    }), 200 if ready else 503
+
+def stream_wallet_balance(timeout=120):
+    """Run list-notes and yield balance events while the output is still arriving.
+    
+    Yields {"type": "note"} events as each note section is closed by its
+    separator, then a single {"type": "totals"} or {"type": "error"} event.
+    Notes are not kept in memory once they have been yielded.
+    """
+    try:
+        # Leaving the with block (including a client disconnect) stops the CLI
+        with open_wallet_stream(["list-notes"], timeout=timeout) as stream:
+            parser = ListNotesParser()
+            for line in stream:
+                for note in parser.feed_line(line):
+                    yield {"type": "note", "note": note}
+            for note in parser.close():
+                yield {"type": "note", "note": note}
+            
+            if stream.timed_out:
+                logger.error("list-notes command timeout")
+                yield {"type": "error", "error": "Command timeout", **parser.totals()}
+                return
+            if stream.returncode != 0:
+                logger.error(f"list-notes command failed: {stream.stderr}")
+                yield {"type": "error", "error": f"list-notes exited with status {stream.returncode}", "details": stream.stderr, **parser.totals()}
+                return
+            
+            if not parser.header_seen:
+                logger.warning("No 'Wallet Notes' section found in output")
+            
+            totals = parser.totals()
+            logger.info(f"Balance streamed: {totals['notes_count']} notes, total: {totals['total_assets']} nick")
+            yield {"type": "totals", **totals}
+    
+    except Exception as e:
+        logger.error(f"Unexpected error in stream_wallet_balance: {str(e)}")
+        yield {"type": "error", "error": str(e)}
+
+# Long-running wallet operations submitted with ?async=true
+job_manager = JobManager(
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_QUEUE_SIZE']
+)
+
+def run_or_submit(kind, operation, cleanup=None):
+    """Run operation() now, or as a background job when the client passed ?async=true.
+    
+    operation returns (payload, http status). Async requests get 202 and a
+    job id to poll on /api/jobs/<id>. cleanup() runs if the job is rejected
+    (503) or cancelled before operation() started.
+    """
+    if request.args.get('async', '').lower() not in ('1', 'true'):
+        payload, status = operation()
+        return jsonify(payload), status
+    
+    try:
+        job = job_manager.submit(kind, operation, cleanup=cleanup)
+    except JobQueueFull as e:
+        return jsonify({"success": False, "error": "Too many pending jobs, try again later.", "details": str(e)}), 503
+    
+    status_url = f"/api/jobs/{job.id}"
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url
+    }), 202, {"Location": status_url}
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """Return status, timings and (once finished) the result of a job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route("/api/jobs/<job_id>/cancel", methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job, killing its wallet process."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route("/api/balance/stream")
+def api_balance_stream():
+    """Stream balance data as NDJSON: one line per note, then the totals.
+    
+    Counts against MAX_STREAMS; past it the request gets 503.
+    """
+    if not stream_limit.acquire():
+        return streams_exhausted()
+    
+    def generate():
+        for event in stream_wallet_balance():
+            yield json.dumps(event) + "\n"
+    
+    response = Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if it was never iterated
+    response.call_on_close(stream_limit.release)
+    return response
+
+@app.route("/api/events")
+def api_events():
+    """Server-sent events: `balance` (note-set deltas with the new totals),
+    `transaction` (status transitions), `active-address` and `resync`.
+    
+    Opening the stream never runs a wallet command: the first `hello` event
+    describes the cached snapshot, later events come from syncs the
+    background worker runs anyway. Reconnecting clients send Last-Event-ID
+    (EventSource does) to receive the events they missed.
+    
+    At most MAX_STREAMS streams are open at once; past that the request
+    gets 503 with Retry-After.
+    """
+    if not stream_limit.acquire():
+        return streams_exhausted()
+    subscription = event_bus.subscribe(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    keepalive = app.config['EVENTS_KEEPALIVE']
+    
+    def generate():
+        try:
+            balance, age = balance_cache.peek()
+            address_state, _ = active_address_cache.peek()
+            yield "retry: 5000\n\n"
+            yield sse_event('hello', {
+                "last_event_id": event_bus.stats()["last_event_id"],
+                "notes_count": balance['notes_count'] if balance else None,
+                "total_assets": balance['total_assets'] if balance else None,
+                "snapshot_age_seconds": round(age, 3) if balance else None,
+                "active_address": address_state.get('address') if address_state else None
+            })
+            while True:
+                item = subscription.get(timeout=keepalive)
+                if item is None:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                event_id, event, payload = item
+                yield sse_event(event, payload, event_id)
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(stream_limit.release)
+    return response
 
 @app.route("/api/wallet-info")
 def api_wallet_info():
@@ -394,225 +765,255 @@ def api_wallet_info():
             "error": str(e)
         }), 500
 
-@app.route("/api/create-transaction", methods=['POST'])
-def create_transaction():
-    """Create a transaction."""
+class CreateTxError(Exception):
+    """create-tx failed or its transaction file never appeared; payload is the JSON error answer."""
+    
+    def __init__(self, payload, status=500):
+        super().__init__(payload["error"])
+        self.payload = payload
+        self.status = status
+
+def create_tx_file(selected_notes, outputs, fee_nick):
+    """Run create-tx spending selected_notes to outputs [(recipient, amount_nick)].
+    
+    Returns (tx_name, output) once txs/<tx_name>.tx exists; raises CreateTxError.
+    """
+    # Build the names parameter like in the working script
+    # Format: "[note1],[note2],[note3]" (each note in brackets, separated by commas)
+    names_string = ",".join(f"[{note['name']}]" for note in selected_notes)
+    
+    logger.info(f"Selected {len(selected_notes)} notes:")
+    for i, note in enumerate(selected_notes):
+        note_nock = note['value'] / 65536
+        logger.info(f"  - Note #{i+1}: {note_nock:.4f} NOCK ({note['value']} NICK)")
+        logger.info(f"    Name: {note['name'][:50]}...")
+    logger.info(f"Names string: {names_string[:200]}...")
+
+    # Get current transaction files before creating new one
+    old_tx_files = get_tx_files_in_folder()
+    logger.info(f"Existing transaction files before creation: {len(old_tx_files)}")
+    
+    # Execute create-tx command (one "[1 <pubkey>]" recipient and one gift per output)
+    cmd = [
+        "create-tx",
+        "--names", names_string,
+        "--recipients", ",".join(f"[1 {recipient}]" for recipient, _ in outputs),
+        "--gifts", ",".join(str(amount_nick) for _, amount_nick in outputs),
+        "--fee", str(fee_nick)
+    ]
+    logger.info("Creating transaction with command: %s", " ".join(cmd))
+
     try:
-        data = request.json
-        
-        # Validate required fields
-        if not data.get('recipient'):
-            return jsonify({"error": "Recipient public key is required."}), 400
-        if not data.get('amount_nock'):
-            return jsonify({"error": "Amount is required."}), 400
-        
-        # Get wallet public key for history tracking
-        signer_public_key = get_wallet_public_key()
-        if not signer_public_key:
-            logger.warning("Could not get wallet public key, using 'Unknown'")
-            signer_public_key = "Unknown"
-        
-        # Convert Nock to Nick
-        amount_nock = float(data['amount_nock'])
-        amount_nick = int(amount_nock * 65536)
-        fee_nick = int(data.get('fee', 10))
+        result = run_wallet_command(cmd, timeout=120)
         
-        # Get all notes to select which ones to use
-        balance_data = get_wallet_balance()
-        if balance_data.get('error'):
-            return jsonify(balance_data), 500
+        # Parse output to extract transaction name (which is the hash)
+        output = result.stdout
+        logger.info("=== FULL CREATE-TX OUTPUT ===")
+        logger.info(output)
+        logger.info("=== END OUTPUT ===")
+        
+        # Let's also check stderr
+        if result.stderr:
+            logger.info("=== CREATE-TX STDERR ===")
+            logger.info(result.stderr)
+            logger.info("=== END STDERR ===")
+        
+        # Check what files exist in txs folder after command
+        current_tx_files = get_tx_files_in_folder()
+        logger.info(f"TX files after create-tx: {list(current_tx_files.keys())}")
+        
+        # Try different patterns to extract transaction name
+        patterns = [
+            r"Name: ([^\n]+)",
+            r"Transaction: ([^\n]+)", 
+            r"Hash: ([^\n]+)",
+            r"Created: ([^\n]+)",
+            r"File: ([^\n]+)",
+            r"([A-Za-z0-9]{50,})"  # Any long alphanumeric string
+        ]
         
-        notes = balance_data['notes']
+        tx_name = None
+        for pattern in patterns:
+            match = re.search(pattern, output)
+            if match:
+                tx_name = match.group(1).strip()
+                logger.info(f"Found potential tx name with pattern '{pattern}': {tx_name}")
+                break
         
-        # Check if user provided specific notes to use
-        selected_note_names = data.get('selected_notes')
-        # If selected_notes is provided, use_all_funds should be True by default
-        use_all_funds = data.get('use_all_funds', selected_note_names is not None)
+        if not tx_name:
+            logger.error("Could not extract transaction name from any pattern")
+            # Return the full output for debugging
+            raise CreateTxError({
+                "error": "Failed to extract transaction name from output.",
+                "debug_output": output,
+                "debug_stderr": result.stderr,
+                "tx_files_after": list(current_tx_files.keys())
+            })
         
-        selected_notes = []
-        accumulated = 0
+    except subprocess.TimeoutExpired:
+        logger.error("CREATE-TX TIMEOUT after 120 seconds")
+        raise CreateTxError({"error": "Transaction creation timed out"})
         
-        if selected_note_names:
-            # Use user-selected notes
-            for note in notes:
-                if note['name'] in selected_note_names:
-                    selected_notes.append(note)
-                    accumulated += note['value']  # Changed from note['assets']
-            
-            if not selected_notes:
-                return jsonify({"error": "No valid notes found from selection."}), 400
-            
-            if use_all_funds:
-                # When using selected notes, send all funds minus fee
-                amount_nick = accumulated - fee_nick
-                if amount_nick <= 0:
-                    return jsonify({
-                        "error": f"Selected notes ({accumulated} nick) don't have enough to cover the fee ({fee_nick} nick)."
-                    }), 400
-                logger.info(f"Using all funds from selected notes: {accumulated} nick - {fee_nick} fee = {amount_nick} nick to send")
-                
-                # UPDATE: Recalculate amount_nock for display purposes
-                amount_nock = amount_nick / 65536
-                logger.info(f"Adjusted amount: {amount_nock:.4f} NOCK ({amount_nick} nick)")
-                
-        else:
-            # Auto-select notes - Sort by value descending to minimize number of inputs
-            total_needed = amount_nick + fee_nick
-            sorted_notes = sorted(notes, key=lambda x: x['value'], reverse=True)  # Changed from x['assets']
-            
-            for note in sorted_notes:
-                if accumulated >= total_needed:
-                    break
+    except subprocess.CalledProcessError as e:
+        logger.error(f"CREATE-TX FAILED: return code {e.returncode}")
+        logger.error(f"STDOUT: {e.stdout}")
+        logger.error(f"STDERR: {e.stderr}")
+        raise CreateTxError({
+            "error": f"Transaction creation failed: {e.stderr or e.stdout}",
+            "return_code": e.returncode
+        })
+
+    logger.info(f"Transaction name extracted: {tx_name}")
+    
+    # Verify that the transaction file was created with the correct name
+    if not verify_transaction_file(tx_name, old_tx_files):
+        logger.warning(f"Transaction file {tx_name}.tx not found or not recent")
+        raise CreateTxError({
+            "error": "Transaction was created but file verification failed.",
+            "transaction_name": tx_name
+        })
+    
+    return tx_name, output
+
+def prepare_transaction(data):
+    """Validate a create-transaction request and choose its notes.
+    
+    Returns (plan, None) or (None, (error payload, http status)). The plan
+    holds everything create-tx and the history entry need.
+    """
+    # Validate required fields
+    if not data.get('recipient'):
+        return None, ({"error": "Recipient public key is required."}, 400)
+    if not data.get('amount_nock'):
+        return None, ({"error": "Amount is required."}, 400)
+    
+    # Get wallet public key for history tracking
+    signer_public_key = get_wallet_public_key()
+    if not signer_public_key:
+        logger.warning("Could not get wallet public key, using 'Unknown'")
+        signer_public_key = "Unknown"
+    
+    # Convert Nock to Nick
+    amount_nock = float(data['amount_nock'])
+    amount_nick = int(amount_nock * 65536)
+    fee_nick = int(data.get('fee', 10))
+    
+    # Check if user provided specific notes to use
+    selected_note_names = data.get('selected_notes')
+    strategy = data.get('selection_strategy') or app.config['COIN_SELECTION_STRATEGY']
+    if not selected_note_names and strategy not in COIN_SELECTION_STRATEGIES:
+        return None, ({
+            "error": f"Unknown selection strategy: {strategy}. Expected one of: {', '.join(COIN_SELECTION_STRATEGIES)}"
+        }, 400)
+    # If selected_notes is provided, use_all_funds should be True by default
+    use_all_funds = data.get('use_all_funds', selected_note_names is not None)
+    
+    # Get all notes to select which ones to use (always fresh, also warms the cache)
+    balance_data = balance_cache.refresh()
+    if balance_data.get('error'):
+        return None, (balance_data, 500)
+    
+    notes = balance_data['notes']
+    
+    selected_notes = []
+    accumulated = 0
+    selection = None
+    
+    if selected_note_names:
+        # Use user-selected notes
+        for note in notes:
+            if note['name'] in selected_note_names:
                 selected_notes.append(note)
                 accumulated += note['value']  # Changed from note['assets']
-            
-            if accumulated < total_needed:
-                return jsonify({
-                    "error": f"Insufficient funds. Need {total_needed} nick, have {accumulated} nick."
+        
+        if not selected_notes:
+            return None, ({"error": "No valid notes found from selection."}, 400)
+        
+        if use_all_funds:
+            # When using selected notes, send all funds minus fee
+            amount_nick = accumulated - fee_nick
+            if amount_nick <= 0:
+                return None, ({
+                    "error": f"Selected notes ({accumulated} nick) don't have enough to cover the fee ({fee_nick} nick)."
                 }, 400)
+            logger.info(f"Using all funds from selected notes: {accumulated} nick - {fee_nick} fee = {amount_nick} nick to send")
+            
+            # UPDATE: Recalculate amount_nock for display purposes
+            amount_nock = amount_nick / 65536
+            logger.info(f"Adjusted amount: {amount_nock:.4f} NOCK ({amount_nick} nick)")
+            
+    else:
+        # Auto-select notes (see coin_selection for the strategies)
+        try:
+            selection = select_notes(
+                notes,
+                amount_nick + fee_nick,
+                strategy,
+                time_budget=app.config['COIN_SELECTION_TIME_BUDGET']
+            )
+        except InsufficientFunds as e:
+            return None, ({"error": str(e)}, 400)
+        
+        selected_notes = selection.notes
+        accumulated = selection.total
+        logger.info(f"Coin selection: {selection.describe()}")
 
-        # Build the names parameter like in the working script
-        # Format: "[note1],[note2],[note3]" (each note in brackets, separated by commas)
-        names_parts = []
-        for note in selected_notes:
-            note_name = note['name']
-            # Add brackets around each note name
-            names_parts.append(f"[{note_name}]")
-        
-        names_string = ",".join(names_parts)
-        
-        logger.info(f"Selected {len(selected_notes)} notes:")
-        for i, note in enumerate(selected_notes):
-            note_nock = note['value'] / 65536
-            logger.info(f"  - Note #{i+1}: {note_nock:.4f} NOCK ({note['value']} NICK)")
-            logger.info(f"    Name: {note['name'][:50]}...")
-        logger.info(f"Total notes value: {accumulated} NICK")
-        logger.info(f"Amount to send: {amount_nick} NICK (after {fee_nick} fee)")
-        logger.info(f"Names string: {names_string[:200]}...")
-
-        # Get current transaction files before creating new one
-        old_tx_files = get_tx_files_in_folder()
-        logger.info(f"Existing transaction files before creation: {len(old_tx_files)}")
-        
-        
-        # Execute create-tx command 
-        cmd = WALLET_CMD_PREFIX + [
-            "create-tx",
-            "--names", names_string,
-            "--recipients", f"[1 {data['recipient']}]",
-            "--gifts", str(amount_nick),
-            "--fee", str(fee_nick)
-        ]
-        logger.info("Creating transaction with command: %s", " ".join(cmd))
+    logger.info(f"Total notes value: {accumulated} NICK")
+    logger.info(f"Amount to send: {amount_nick} NICK (after {fee_nick} fee)")
+    
+    return {
+        "signer": signer_public_key,
+        "recipient": data['recipient'],
+        "amount_nock": amount_nock,
+        "amount_nick": amount_nick,
+        "fee_nick": fee_nick,
+        "notes": selected_notes,
+        "selection": selection
+    }, None
 
+def create_planned_transaction(plan):
+    """Run create-tx for a prepare_transaction() plan and record it in history.
+    
+    Returns (tx_name, output, history entry); raises CreateTxError.
+    """
+    tx_name, output = create_tx_file(plan['notes'], [(plan['recipient'], plan['amount_nick'])], plan['fee_nick'])
+    
+    # Add transaction to history with signer information
+    transaction = add_transaction_to_history(
+        tx_hash=tx_name,
+        recipient=plan['recipient'],
+        amount_nock=plan['amount_nock'],
+        amount_nick=plan['amount_nick'],
+        fee_nick=plan['fee_nick'],
+        notes_used=len(plan['notes']),
+        signer=plan['signer'],
+        status='created'
+    )
+    return tx_name, output, transaction
+
+@app.route("/api/create-transaction", methods=['POST'])
+def create_transaction():
+    """Create a transaction."""
+    try:
+        plan, error = prepare_transaction(request.json)
+        if error:
+            return jsonify(error[0]), error[1]
+        
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=120  # Add timeout
-            )
-            
-            # Parse output to extract transaction name (which is the hash)
-            output = result.stdout
-            logger.info("=== FULL CREATE-TX OUTPUT ===")
-            logger.info(output)
-            logger.info("=== END OUTPUT ===")
-            
-            # Let's also check stderr
-            if result.stderr:
-                logger.info("=== CREATE-TX STDERR ===")
-                logger.info(result.stderr)
-                logger.info("=== END STDERR ===")
-            
-            # Check what files exist in txs folder after command
-            current_tx_files = get_tx_files_in_folder()
-            logger.info(f"TX files after create-tx: {list(current_tx_files.keys())}")
-            
-            # Try different patterns to extract transaction name
-            patterns = [
-                r"Name: ([^\n]+)",
-                r"Transaction: ([^\n]+)", 
-                r"Hash: ([^\n]+)",
-                r"Created: ([^\n]+)",
-                r"File: ([^\n]+)",
-                r"([A-Za-z0-9]{50,})"  # Any long alphanumeric string
-            ]
-            
-            tx_name = None
-            for pattern in patterns:
-                match = re.search(pattern, output)
-                if match:
-                    tx_name = match.group(1).strip()
-                    logger.info(f"Found potential tx name with pattern '{pattern}': {tx_name}")
-                    break
-            
-            if not tx_name:
-                logger.error("Could not extract transaction name from any pattern")
-                # Return the full output for debugging
-                return jsonify({
-                    "error": "Failed to extract transaction name from output.",
-                    "debug_output": output,
-                    "debug_stderr": result.stderr,
-                    "tx_files_after": list(current_tx_files.keys())
-                }), 500
-            
-        except subprocess.TimeoutExpired:
-            logger.error("CREATE-TX TIMEOUT after 60 seconds")
-            return jsonify({"error": "Transaction creation timed out"}), 500
-            
-        except subprocess.CalledProcessError as e:
-            logger.error(f"CREATE-TX FAILED: return code {e.returncode}")
-            logger.error(f"STDOUT: {e.stdout}")
-            logger.error(f"STDERR: {e.stderr}")
-            return jsonify({
-                "error": f"Transaction creation failed: {e.stderr or e.stdout}",
-                "return_code": e.returncode
-            }), 500
-            
-        except Exception as e:
-            logger.error(f"UNEXPECTED ERROR in create-tx: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                "error": f"Unexpected error: {str(e)}"
-            }), 500
-
-        # Continue with the rest if successful...
-        logger.info(f"Transaction name extracted: {tx_name}")
-        
-        # Verify that the transaction file was created with the correct name
-        file_verified = verify_transaction_file(tx_name, old_tx_files)
-        
-        if not file_verified:
-            logger.warning(f"Transaction file {tx_name}.tx not found or not recent")
-            return jsonify({
-                "error": "Transaction was created but file verification failed.",
-                "transaction_name": tx_name
-            }, 500)
-        
-        # Add transaction to history with signer information
-        transaction = add_transaction_to_history(
-            tx_hash=tx_name,
-            recipient=data['recipient'],
-            amount_nock=amount_nock,
-            amount_nick=amount_nick,
-            fee_nick=fee_nick,
-            notes_used=len(selected_notes),
-            signer=signer_public_key,
-            status='created'
-        )
+            tx_name, output, transaction = create_planned_transaction(plan)
+        except CreateTxError as e:
+            return jsonify(e.payload), e.status
         
         return jsonify({
             "success": True,
             "transaction_hash": tx_name,
             "transaction_name": tx_name,
             "output": output,
-            "notes_used": len(selected_notes),
-            "amount_nick": amount_nick,
-            "fee_nick": fee_nick,
-            "file_verified": file_verified,
+            "notes_used": len(plan['notes']),
+            "amount_nick": plan['amount_nick'],
+            "fee_nick": plan['fee_nick'],
+            "file_verified": True,
+            "selection": plan['selection'].describe() if plan['selection'] else None,
             "history_entry": transaction
         })
     
@@ -621,6 +1022,133 @@ def create_transaction():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/create-batch-transaction", methods=['POST'])
+def create_batch_transaction():
+    """Create the transactions paying a list of recipients.
+    
+    Takes a JSON body {"payments": [{"recipient", "amount_nock"}, ...], "fee",
+    "selection_strategy"}, or a multipart upload with a CSV / NDJSON `file`
+    (format from the `format` field or the file extension) and the same
+    fields as form values. Payments are grouped into as few create-tx runs as
+    BATCH_OUTPUTS_PER_TX allows; the answer reports every payment's outcome.
+    """
+    try:
+        uploaded = request.files.get('file')
+        if uploaded:
+            data = request.form
+            fmt = data.get('format') or os.path.splitext(uploaded.filename or '')[1].lstrip('.').lower()
+            fmt = 'ndjson' if fmt in ('jsonl', 'json') else fmt
+            lines = io.TextIOWrapper(uploaded.stream, encoding='utf-8-sig', newline='')
+            payments = read_payments_file(lines, fmt, app.config['BATCH_MAX_PAYMENTS'])
+        else:
+            data = request.get_json(silent=True) or {}
+            payments = read_payments_list(data.get('payments'), app.config['BATCH_MAX_PAYMENTS'])
+    except PaymentsError as e:
+        return jsonify({"success": False, "error": "Invalid payments.", "errors": e.errors}), 400
+    except UnicodeDecodeError:
+        return jsonify({"success": False, "error": "Payments file must be UTF-8 text."}), 400
+    
+    try:
+        fee_nick = int(data.get('fee', 10))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "Fee must be an integer number of nick."}), 400
+    strategy = data.get('selection_strategy') or app.config['COIN_SELECTION_STRATEGY']
+    if strategy not in COIN_SELECTION_STRATEGIES:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown selection strategy: {strategy}. Expected one of: {', '.join(COIN_SELECTION_STRATEGIES)}"
+        }), 400
+    
+    return run_or_submit('create-batch-transaction', lambda: _create_batch_transaction(payments, fee_nick, strategy))
+
+def _create_batch_transaction(payments, fee_nick, strategy):
+    signer_public_key = get_wallet_public_key()
+    if not signer_public_key:
+        logger.warning("Could not get wallet public key, using 'Unknown'")
+        signer_public_key = "Unknown"
+    
+    # One list-notes for the whole batch
+    balance_data = balance_cache.refresh()
+    if balance_data.get('error'):
+        return balance_data, 500
+    
+    try:
+        planned = plan_batch(
+            balance_data['notes'],
+            payments,
+            fee_nick,
+            app.config['BATCH_OUTPUTS_PER_TX'],
+            strategy,
+            time_budget=app.config['COIN_SELECTION_TIME_BUDGET']
+        )
+    except InsufficientFunds as e:
+        return {"success": False, "error": str(e)}, 400
+    
+    batch_id = uuid.uuid4().hex
+    logger.info(f"Batch {batch_id}: {len(payments)} payments in {len(planned)} transaction(s)")
+    
+    transactions = []
+    outcomes = []
+    for planned_tx in planned:
+        chunk, selection = planned_tx['payments'], planned_tx['selection']
+        tx_name, error = None, planned_tx['error']
+        if selection is not None:
+            try:
+                tx_name, _ = create_tx_file(
+                    selection.notes,
+                    [(payment['recipient'], payment['amount_nick']) for payment in chunk],
+                    fee_nick
+                )
+            except CreateTxError as e:
+                error = str(e)
+        
+        if tx_name:
+            # One history row per output; the fee is counted once, on the first
+            for index, payment in enumerate(chunk):
+                add_transaction_to_history(
+                    tx_hash=tx_name,
+                    recipient=payment['recipient'],
+                    amount_nock=payment['amount_nock'],
+                    amount_nick=payment['amount_nick'],
+                    fee_nick=fee_nick if index == 0 else 0,
+                    notes_used=len(selection.notes),
+                    signer=signer_public_key,
+                    status='created',
+                    batch_id=batch_id,
+                    output_index=index,
+                    outputs=len(chunk)
+                )
+        
+        transactions.append({
+            "transaction_name": tx_name,
+            "outputs": len(chunk),
+            "amount_nick": sum(payment['amount_nick'] for payment in chunk),
+            "fee_nick": fee_nick,
+            "notes_used": len(selection.notes) if selection else 0,
+            "selection": selection.describe() if selection else None,
+            "error": error
+        })
+        for payment in chunk:
+            outcomes.append({
+                "line": payment['line'],
+                "recipient": payment['recipient'],
+                "amount_nick": payment['amount_nick'],
+                "status": 'created' if tx_name else 'failed',
+                "transaction_name": tx_name,
+                "error": error
+            })
+    
+    created = sum(1 for outcome in outcomes if outcome['status'] == 'created')
+    logger.info(f"Batch {batch_id}: {created}/{len(outcomes)} payments in created transactions")
+    return {
+        "success": created == len(outcomes),
+        "batch_id": batch_id,
+        "payments_created": created,
+        "payments_failed": len(outcomes) - created,
+        "transactions": transactions,
+        "payments": outcomes
+    }, 200 if created else 500
+
 @app.route("/api/show-transaction", methods=['POST'])
 def show_transaction():
     """Show transaction details."""
@@ -632,13 +1160,8 @@ def show_transaction():
             return jsonify({"error": "Transaction name is required."}), 400
         
         # Execute show-tx command
-        cmd = WALLET_CMD_PREFIX + ["show-tx", f"txs/{tx_name}.tx"]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        cmd = ["show-tx", f"txs/{tx_name}.tx"]
+        result = run_wallet_command(cmd)
         
         return jsonify({
             "success": True,
@@ -650,6 +1173,30 @@ def show_transaction():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def sign_tx_file(tx_name):
+    """Run sign-tx on txs/<tx_name>.tx and mark it signed; return the CLI output."""
+    # Execute sign-tx command
+    cmd = ["sign-tx", f"txs/{tx_name}.tx"]
+    result = run_wallet_command(cmd)
+    logger.info("Sign transaction output: %s", result.stdout)
+    
+    # Update transaction status in history
+    update_transaction_status(tx_name, 'signed')
+    return result.stdout
+
+def send_tx_file(tx_name):
+    """Run send-tx on txs/<tx_name>.tx, mark it sent and speed up syncing; return the CLI output."""
+    # Execute send-tx command
+    cmd = ["send-tx", f"txs/{tx_name}.tx"]
+    result = run_wallet_command(cmd)
+    logger.info("Send transaction output: %s", result.stdout)
+    
+    # Update transaction status in history
+    update_transaction_status(tx_name, 'sent')
+    balance_cache.invalidate()
+    request_wallet_sync(burst=True)
+    return result.stdout
+
 @app.route("/api/sign-transaction", methods=['POST'])
 def sign_transaction():
     """Sign a transaction."""
@@ -660,23 +1207,12 @@ def sign_transaction():
         if not tx_name:
             return jsonify({"error": "Transaction name is required."}), 400
         
-        # Execute sign-tx command
-        cmd = WALLET_CMD_PREFIX + ["sign-tx", f"txs/{tx_name}.tx"]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logger.info("Sign transaction output: %s", result.stdout)
-        
-        # Update transaction status in history
-        update_transaction_status(tx_name, 'signed')
+        output = sign_tx_file(tx_name)
 
         return jsonify({
             "success": True,
             "message": "Transaction signed successfully.",
-            "output": result.stdout
+            "output": output
         })
     
     except subprocess.CalledProcessError as e:
@@ -694,24 +1230,13 @@ def send_transaction():
         if not tx_name:
             return jsonify({"error": "Transaction name is required."}), 400
         
-        # Execute send-tx command
-        cmd = WALLET_CMD_PREFIX + ["send-tx", f"txs/{tx_name}.tx"]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logger.info("Send transaction output: %s", result.stdout)
-        
-        # Update transaction status in history
-        update_transaction_status(tx_name, 'sent')
+        output = send_tx_file(tx_name)
         
         return jsonify({
             "success": True,
             "message": "Transaction sent successfully!",
             "transaction_hash": tx_name,
-            "output": result.stdout
+            "output": output
         })
     
     except subprocess.CalledProcessError as e:
@@ -719,53 +1244,205 @@ def send_transaction():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+class PipelineStageError(Exception):
+    """A pipeline stage failed; payload is the JSON error answer."""
+    
+    def __init__(self, payload, status=500):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status = status
+
+def run_transaction_pipeline(data):
+    """Run prepare -> create -> sign -> send, yielding (event, payload) as it goes.
+    
+    With data["transaction_name"] only sign and send run. Events: `pipeline`
+    (the stages), `stage` when each stage starts and finishes, then `result`
+    or `error` (which carries the http status the failure maps to).
+    """
+    started = time.monotonic()
+    timings = {}
+    tx_name = data.get('transaction_name')
+    plan = None
+    stages = ['sign', 'send'] if tx_name else ['prepare', 'create', 'sign', 'send']
+    yield 'pipeline', {"stages": stages, "transaction_name": tx_name}
+    
+    for stage in stages:
+        yield 'stage', {"stage": stage, "status": "started"}
+        stage_started = time.monotonic()
+        try:
+            if stage == 'prepare':
+                plan, error = prepare_transaction(data)
+                if error:
+                    raise PipelineStageError(*error)
+                details = {
+                    "notes_used": len(plan['notes']),
+                    "amount_nick": plan['amount_nick'],
+                    "fee_nick": plan['fee_nick'],
+                    "selection": plan['selection'].describe() if plan['selection'] else None
+                }
+            elif stage == 'create':
+                tx_name, output, _ = create_planned_transaction(plan)
+                details = {"transaction_name": tx_name, "output": output}
+            elif stage == 'sign':
+                details = {"output": sign_tx_file(tx_name)}
+            else:
+                details = {"output": send_tx_file(tx_name)}
+        except (PipelineStageError, CreateTxError) as e:
+            payload, status = e.payload, e.status
+        except subprocess.CalledProcessError as e:
+            payload, status = {"error": f"{stage} failed.", "details": e.stderr}, 500
+        except subprocess.TimeoutExpired:
+            payload, status = {"error": f"{stage} timed out."}, 500
+        except Exception as e:
+            logger.error(f"Pipeline {stage} error: {str(e)}")
+            payload, status = {"error": str(e)}, 500
+        else:
+            timings[stage] = round((time.monotonic() - stage_started) * 1000, 1)
+            yield 'stage', {"stage": stage, "status": "done", "elapsed_ms": timings[stage], **details}
+            continue
+        
+        timings[stage] = round((time.monotonic() - stage_started) * 1000, 1)
+        timings["total"] = round((time.monotonic() - started) * 1000, 1)
+        logger.warning(f"Transaction pipeline failed at {stage}: {payload.get('error')}")
+        yield 'stage', {"stage": stage, "status": "failed", "elapsed_ms": timings[stage]}
+        yield 'error', {
+            **payload,
+            "success": False,
+            "stage": stage,
+            "status": status,
+            "transaction_name": tx_name,
+            "timings_ms": timings
+        }
+        return
+    
+    timings["total"] = round((time.monotonic() - started) * 1000, 1)
+    logger.info(f"Transaction pipeline sent {tx_name}: {timings}")
+    yield 'result', {
+        "success": True,
+        "message": "Transaction sent successfully!",
+        "transaction_hash": tx_name,
+        "transaction_name": tx_name,
+        "timings_ms": timings
+    }
+
+@app.route("/api/transaction-pipeline", methods=['POST'])
+def transaction_pipeline():
+    """Create, sign and send a transaction in one request.
+    
+    Takes the create-transaction body, or {"transaction_name"} to sign and
+    send a transaction created earlier. Clients sending
+    `Accept: text/event-stream` get the stage-by-stage progress as
+    server-sent events; others get the final result (or error) as JSON.
+    A progress stream counts against MAX_STREAMS like the other streams.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        if not stream_limit.acquire():
+            return streams_exhausted()
+        events = run_transaction_pipeline(data)
+        response = Response((sse_event(event, payload) for event, payload in events), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        response.call_on_close(stream_limit.release)
+        return response
+    
+    events = run_transaction_pipeline(data)
+    
+    for event, payload in events:
+        if event == 'result':
+            return jsonify(payload)
+        if event == 'error':
+            return jsonify(payload), payload['status']
+
+def history_bound(value, upper=False):
+    """Turn an ISO date or timestamp into the form created_at is stored in.
+
+    created_at is local time from datetime.now().isoformat() and compared as
+    text, so timestamps with an offset are converted to local time and every
+    bound is re-serialized by isoformat(). A bare date as upper bound covers
+    the whole day. Raises ValueError for anything else.
+    """
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+    else:
+        parsed = datetime.combine(day, datetime.max.time() if upper else datetime.min.time())
+    return parsed.isoformat()
+
+
 @app.route("/api/transaction-history")
 def get_transaction_history():
-    """Get transaction history filtered by current wallet's address."""
+    """Get transaction history filtered by current wallet's address, newest first.
+    
+    Query parameters (all optional):
+    - limit: page size (default 50, max 500); cursor: next_cursor of the previous page
+    - status, recipient: exact match
+    - since, until: ISO date or timestamp bounds on created_at (inclusive)
+    - min_amount_nick, max_amount_nick: amount bounds in nick
+    
+    The ETag combines the history revision, the wallet and the query, so an
+    unchanged page is answered with a 304 without being read.
+    """
     try:
-        # Load transaction history from file
-        history = load_transaction_history()
+        args = request.args
+        filters = {
+            "status": args.get('status') or None,
+            "recipient": args.get('recipient') or None
+        }
+        try:
+            limit = int(args.get('limit', HISTORY_PAGE_SIZE))
+            if not 1 <= limit <= HISTORY_MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {HISTORY_MAX_PAGE_SIZE}")
+            for name in ('since', 'until'):
+                value = args.get(name)
+                filters[name] = history_bound(value, upper=name == 'until') if value else None
+            for name in ('min_amount_nick', 'max_amount_nick'):
+                value = args.get(name)
+                filters[name] = int(value) if value else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": f"Invalid filter: {str(e)}"}), 400
         
         # Get current wallet's address
         current_address = get_wallet_public_key()
         
         if not current_address:
             logger.warning("Could not determine current wallet address, returning all transactions")
-            return jsonify({
-                "success": True,
-                "transactions": history,
-                "count": len(history),
-                "wallet_address": "Unknown",
-                "note": "Could not filter by wallet - showing all transactions"
-            })
         
-        # Filter history to only show transactions from current wallet
-        # The transaction should have 'signer' field matching our wallet address
-        filtered_history = []
-        for tx in history:
-            tx_signer = tx.get('signer', '')
-            if tx_signer == current_address:
-                filtered_history.append(tx)
+        etag = etag_for('history', history_store.revision(), current_address or '', sorted(args.items(multi=True)))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
         
-        logger.info(f"Transaction history: {len(filtered_history)} transactions found for current wallet out of {len(history)} total")
-        logger.info(f"Current wallet address: {current_address[:50]}...")
+        # Only transactions whose 'signer' matches our wallet address (indexed lookup)
+        try:
+            transactions, next_cursor = history_store.page(
+                signer=current_address or None,
+                limit=limit,
+                cursor=args.get('cursor') or None,
+                **filters
+            )
+        except InvalidCursor as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        return jsonify({
-            "success": True,
-            "transactions": filtered_history,
-            "count": len(filtered_history),
-            "total_in_file": len(history),
-            "wallet_address": current_address
-        })
+        logger.info(f"Transaction history: page of {len(transactions)} transactions for current wallet")
         
-    except FileNotFoundError:
-        logger.info("No transaction history file found")
-        return jsonify({
+        response = {
             "success": True,
-            "transactions": [],
-            "count": 0,
-            "note": "No transaction history file found"
-        })
+            "transactions": transactions,
+            "count": len(transactions),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "wallet_address": current_address or "Unknown"
+        }
+        if not current_address:
+            response["note"] = "Could not filter by wallet - showing all transactions"
+        return with_etag(jsonify(response), etag)
+        
     except Exception as e:
         logger.error(f"Transaction history error: {str(e)}")
         import traceback
@@ -775,27 +1452,6 @@ def get_transaction_history():
             "error": str(e)
         }), 500
 
-def load_transaction_history():
-    """Load transaction history from JSON file."""
-    history_file = os.path.join(os.path.dirname(__file__), 'wallet_history.json')
-    
-    if not os.path.exists(history_file):
-        logger.info(f"Transaction history file not found: {history_file}")
-        return []
-    
-    try:
-        with open(history_file, 'r') as f:
-            history = json.load(f)
-        
-        logger.info(f"Loaded {len(history)} transactions from history file")
-        return history
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing transaction history JSON: {str(e)}")
-        return []
-    except Exception as e:
-        logger.error(f"Error loading transaction history: {str(e)}")
-        return []
-
 @app.route("/api/export-keys")
 def export_keys():
     """Export keys and return the file."""
@@ -803,13 +1459,8 @@ def export_keys():
         # Create temporary file for export
         export_file = os.path.join(app.config['UPLOAD_FOLDER'], 'keys.export')
         
-        cmd = WALLET_CMD_PREFIX + ["export-keys"]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        cmd = ["export-keys"]
+        result = run_wallet_command(cmd)
         
         # Save output to file
         with open(export_file, 'w') as f:
@@ -824,7 +1475,10 @@ def export_keys():
 
 @app.route("/api/import-keys", methods=['POST'])
 def import_keys():
-    """Import keys from uploaded file."""
+    """Import keys from uploaded file.
+    
+    Pass ?async=true to get a job id (202) instead of waiting for the import.
+    """
     filepath = None
     try:
         logger.info("=== Import keys from file endpoint called ===")
@@ -858,142 +1512,127 @@ def import_keys():
         logger.info(f"Import keys file saved: {filepath}")
         logger.info(f"Container will access: {container_filepath}")
         
+        # The upload holds private keys: remove it even when the import never runs
+        return run_or_submit('import-keys', lambda: _import_keys_file(filepath, container_filepath),
+                             cleanup=lambda: _remove_upload(filepath))
+    
+    except Exception as e:
+        logger.error(f"Import keys Exception: {type(e).__name__}: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+        return jsonify({
+            "error": f"Error importing keys: {type(e).__name__}",
+            "details": str(e)
+        }), 500
+
+def _remove_upload(filepath):
+    if os.path.exists(filepath):
+        os.remove(filepath)
+        logger.info(f"Temporary file removed: {filepath}")
+
+def _import_keys_file(filepath, container_filepath):
+    """Run import-keys on a saved upload and remove it; return (payload, status)."""
+    try:
         # Execute import command
-        cmd = WALLET_CMD_PREFIX + ["import-keys", "--file", container_filepath]
+        cmd = ["import-keys", "--file", container_filepath]
         logger.info(f"Executing command: {' '.join(cmd)}")
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = run_wallet_command(cmd)
         
         logger.info(f"Import successful: {result.stdout}")
+        balance_cache.invalidate()
+        invalidate_address_state()
+        request_wallet_sync()
         
-        # Delete temporary file
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-            logger.info(f"Temporary file removed: {filepath}")
-        
-        # Force wallet sync by calling list-notes
-        logger.info("Forcing wallet synchronization...")
-        sync_cmd = WALLET_CMD_PREFIX + ["list-notes"]
-        sync_result = subprocess.run(
-            sync_cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        logger.info(f"Sync completed")
-        
-        return jsonify({
+        return {
             "success": True,
-            "message": "Keys imported and wallet synchronized successfully.",
+            "message": "Keys imported successfully. Wallet synchronization started.",
             "output": result.stdout
-        })
+        }, 200
     
-    except subprocess.TimeoutExpired:
-        logger.error("Wallet synchronization timeout")
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-        return jsonify({
-            "error": "Keys imported but synchronization took too long.",
-            "details": "Please wait a moment and refresh balance manually"
-        }), 500
     except subprocess.CalledProcessError as e:
         logger.error(f"Import keys CalledProcessError: {e.stderr}")
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-        return jsonify({
+        return {
             "error": "Error importing keys.",
             "details": e.stderr if e.stderr else str(e)
-        }), 500
+        }, 500
     except Exception as e:
         logger.error(f"Import keys Exception: {type(e).__name__}: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-        return jsonify({
+        return {
             "error": f"Error importing keys: {type(e).__name__}",
             "details": str(e)
-        }), 500
+        }, 500
+    finally:
+        # Delete temporary file
+        _remove_upload(filepath)
 
 @app.route("/api/import-seedphrase", methods=['POST'])
 def import_seedphrase():
-    """Import keys from seed phrase."""
+    """Import keys from seed phrase.
+    
+    Pass ?async=true to get a job id (202) instead of waiting for the import.
+    """
+    logger.info("=== Import keys from seedphrase endpoint called ===")
+    
+    data = request.get_json(silent=True) or {}
+    seedphrase = data.get('seedphrase') or ''
+    version = data.get('version')
+    
+    if not isinstance(seedphrase, str) or not seedphrase.strip():
+        logger.error("No seedphrase provided")
+        return jsonify({"error": "Seed phrase is required."}), 400
+    
+    if version not in [0, 1]:
+        logger.error(f"Invalid version: {version}")
+        return jsonify({"error": "Version must be 0 or 1."}), 400
+    
+    seedphrase = seedphrase.strip()
+    return run_or_submit('import-seedphrase', lambda: _import_seedphrase(seedphrase, version))
+
+def _import_seedphrase(seedphrase, version):
+    """Run import-keys with a seed phrase; return (payload, status)."""
     try:
-        logger.info("=== Import keys from seedphrase endpoint called ===")
-        
-        data = request.json
-        seedphrase = data.get('seedphrase', '').strip()
-        version = data.get('version')
-        
-        if not seedphrase:
-            logger.error("No seedphrase provided")
-            return jsonify({"error": "Seed phrase is required."}), 400
-        
-        if version not in [0, 1]:
-            logger.error(f"Invalid version: {version}")
-            return jsonify({"error": "Version must be 0 or 1."}), 400
-        
         logger.info(f"Importing seedphrase with version: {version}")
         
         # Execute import-keys command with seedphrase
-        cmd = WALLET_CMD_PREFIX + [
+        cmd = [
             "import-keys",
             "--seedphrase", seedphrase,
             "--version", str(version)
         ]
-        logger.info(f"Executing command: {' '.join([cmd[0], cmd[1], '--seedphrase', '[REDACTED]', '--version', str(version)])}")
+        logger.info(f"Executing command: {' '.join([cmd[0], '--seedphrase', '[REDACTED]', '--version', str(version)])}")
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = run_wallet_command(cmd)
         
         logger.info(f"Import successful: {result.stdout}")
+        balance_cache.invalidate()
+        invalidate_address_state()
+        request_wallet_sync()
         
-        # Force wallet sync by calling list-notes
-        logger.info("Forcing wallet synchronization...")
-        sync_cmd = WALLET_CMD_PREFIX + ["list-notes"]
-        sync_result = subprocess.run(
-            sync_cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        logger.info(f"Sync completed")
-        
-        return jsonify({
+        return {
             "success": True,
-            "message": f"Keys imported from seed phrase (version {version}) and wallet synchronized successfully.",
+            "message": f"Keys imported from seed phrase (version {version}). Wallet synchronization started.",
             "output": result.stdout
-        })
+        }, 200
     
-    except subprocess.TimeoutExpired:
-        logger.error("Wallet synchronization timeout")
-        return jsonify({
-            "error": "Keys imported but synchronization took too long.",
-            "details": "Please wait a moment and refresh balance manually"
-        }), 500
     except subprocess.CalledProcessError as e:
         logger.error(f"Import seedphrase CalledProcessError: {e.stderr}")
-        return jsonify({
+        return {
             "error": "Error importing keys from seed phrase.",
             "details": e.stderr if e.stderr else str(e)
-        }), 500
+        }, 500
     except Exception as e:
         logger.error(f"Import seedphrase Exception: {type(e).__name__}: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return jsonify({
+        return {
             "error": f"Error importing keys from seed phrase: {type(e).__name__}",
             "details": str(e)
-        }), 500
+        }, 500
 
 @app.route("/api/show-seedphrase")
 def show_seedphrase():
@@ -1002,15 +1641,10 @@ def show_seedphrase():
         logger.info("=== Show seedphrase endpoint called ===")
         
         # Execute show-seedphrase command
-        cmd = WALLET_CMD_PREFIX + ["show-seedphrase"]
+        cmd = ["show-seedphrase"]
         logger.info(f"Executing command: {' '.join(cmd)}")
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = run_wallet_command(cmd)
         
         # Extract seedphrase from output
         output = result.stdout
@@ -1047,178 +1681,109 @@ def show_seedphrase():
 
 @app.route('/api/active-address', methods=['GET'])
 def get_active_address():
-    """Get the currently active address"""
-    try:
-        cmd = WALLET_CMD_PREFIX + ["list-active-addresses"]
-        logger.info("Getting active address with command: %s", " ".join(cmd))
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=30
-        )
-        
-        output = result.stdout
-        logger.info("Active address output: %s", output)
-        
-        # Parse the output to extract active signing address
-        active_address = None
-        active_version = None
-        
-        # Look for address in "Addresses -- Signing" section
-        signing_section = re.search(r'Addresses -- Signing(.*?)(?:Addresses -- Watch only|$)', output, re.DOTALL)
-        if signing_section:
-            address_match = re.search(r'- Address:\s*([^\n]+)', signing_section.group(1))
-            version_match = re.search(r'- Version:\s*(\d+)', signing_section.group(1))
-            
-            if address_match:
-                active_address = address_match.group(1).strip()
-            if version_match:
-                active_version = int(version_match.group(1))
-        
-        if not active_address:
-            return jsonify({
-                "success": False,
-                "error": "No active address found"
-            }), 404
-        
+    """Get the currently active address (cached; ?refresh=true re-reads it)"""
+    if request.args.get('refresh', '').lower() in ('1', 'true'):
+        state = active_address_cache.refresh()
+    else:
+        state, _ = active_address_cache.get()
+    
+    if state.get('error'):
+        return jsonify({"success": False, "error": state['error']}), 500
+    
+    if not state.get('address'):
         return jsonify({
-            "success": True,
-            "active_address": active_address,
-            "version": active_version
-        })
-        
-    except subprocess.TimeoutExpired:
-        logger.error("Command timed out")
-        return jsonify({"success": False, "error": "Command timed out"}), 500
-    except subprocess.CalledProcessError as e:
-        logger.error("Command failed with error: %s", e.stderr)
-        return jsonify({"success": False, "error": e.stderr}), 500
-    except Exception as e:
-        logger.error("Error getting active address: %s", str(e))
-        return jsonify({"success": False, "error": str(e)}), 500
+            "success": False,
+            "error": "No active address found"
+        }), 404
+    
+    etag = etag_for('active-address', state['address'], state['version'])
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    return with_etag(jsonify({
+        "success": True,
+        "active_address": state['address'],
+        "version": state['version']
+    }), etag)
 
 
 @app.route('/api/list-master-addresses', methods=['GET'])
 def list_master_addresses():
-    """List all master addresses"""
-    try:
-        cmd = WALLET_CMD_PREFIX + ["list-master-addresses"]
-        logger.info("Listing master addresses with command: %s", " ".join(cmd))
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=30
-        )
-        
-        output = result.stdout
-        logger.info("Master addresses output: %s", output)
-        
-        # Parse the output to extract all addresses
-        addresses = []
-        
-        # Split by separator "―"
-        sections = output.split('―')
-        
-        for section in sections:
-            if 'Address:' in section:
-                address_match = re.search(r'- Address:\s*([^\n]+?)(?:\s*\(active\))?$', section, re.MULTILINE)
-                version_match = re.search(r'- Version:\s*(\d+)', section)
-                is_active = '(active)' in section
-                
-                if address_match:
-                    address = address_match.group(1).strip()
-                    version = int(version_match.group(1)) if version_match else None
-                    
-                    addresses.append({
-                        "address": address,
-                        "version": version,
-                        "is_active": is_active
-                    })
-        
-        return jsonify({
-            "success": True,
-            "addresses": addresses
-        })
-        
-    except subprocess.TimeoutExpired:
-        logger.error("Command timed out")
-        return jsonify({"success": False, "error": "Command timed out"}), 500
-    except subprocess.CalledProcessError as e:
-        logger.error("Command failed with error: %s", e.stderr)
-        return jsonify({"success": False, "error": e.stderr}), 500
-    except Exception as e:
-        logger.error("Error listing master addresses: %s", str(e))
-        return jsonify({"success": False, "error": str(e)}), 500
+    """List all master addresses (cached; ?refresh=true re-reads them)"""
+    if request.args.get('refresh', '').lower() in ('1', 'true'):
+        state = master_addresses_cache.refresh()
+    else:
+        state, _ = master_addresses_cache.get()
+    
+    if state.get('error'):
+        return jsonify({"success": False, "error": state['error']}), 500
+    
+    etag = etag_for('master-addresses', json.dumps(state['addresses'], sort_keys=True))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    return with_etag(jsonify({
+        "success": True,
+        "addresses": state['addresses']
+    }), etag)
 
 @app.route('/api/set-active-address', methods=['POST'])
 def set_active_address():
-    """Set an address as the active master address"""
+    """Set an address as the active master address
+    
+    Pass ?async=true to get a job id (202) instead of waiting for the command.
+    """
+    data = request.get_json(silent=True) or {}
+    address = data.get('address')
+    
+    if not address:
+        return jsonify({
+            "success": False,
+            "error": "Address is required"
+        }), 400
+    
+    return run_or_submit('set-active-address', lambda: _set_active_address(address))
+
+def _set_active_address(address):
+    """Run set-active-master-address; return (payload, status)."""
     try:
-        data = request.get_json()
-        address = data.get('address')
-        
-        if not address:
-            return jsonify({
-                "success": False,
-                "error": "Address is required"
-            }), 400
-        
-        cmd = WALLET_CMD_PREFIX + ["set-active-master-address", address]
+        cmd = ["set-active-master-address", address]
         logger.info("Setting active address with command: %s", " ".join(cmd))
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=30
-        )
+        result = run_wallet_command(cmd, timeout=30)
         
         output = result.stdout
         logger.info("Set active address output: %s", output)
+        balance_cache.invalidate()
+        invalidate_address_state()
         
-        # Force wallet sync after changing address
-        logger.info("Forcing wallet synchronization after address change...")
-        sync_cmd = WALLET_CMD_PREFIX + ["list-notes"]
-        sync_result = subprocess.run(
-            sync_cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        logger.info("Wallet synchronized after address change")
-        
-        # Get updated balance for the new active address
-        logger.info("Getting balance for new active address...")
-        balance_data = get_wallet_balance()
+        # The new address is synced in the background; /api/balance waits for it
+        request_wallet_sync()
         
-        return jsonify({
+        return {
             "success": True,
-            "message": f"Address set as active successfully",
+            "message": "Address set as active successfully",
             "output": output,
-            "balance": balance_data,
             "active_address": address
-        })
+        }, 200
         
     except subprocess.TimeoutExpired:
         logger.error("Command timed out")
-        return jsonify({"success": False, "error": "Command timed out"}), 500
+        return {"success": False, "error": "Command timed out"}, 500
     except subprocess.CalledProcessError as e:
         logger.error("Command failed with error: %s", e.stderr)
-        return jsonify({"success": False, "error": e.stderr}), 500
+        return {"success": False, "error": e.stderr}, 500
     except Exception as e:
         logger.error("Error setting active address: %s", str(e))
-        return jsonify({"success": False, "error": str(e)}), 500
+        return {"success": False, "error": str(e)}, 500
 
 if __name__ == "__main__":
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5007))
     debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
+    # With the debug reloader only the serving child process runs the worker
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_sync()
+    
     app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,149 @@
+"""Batch payments: validate a list of payments and plan the transactions paying them.
+
+Payments come as a JSON list or as an uploaded CSV / NDJSON file. Files are
+validated line by line as they are read, so a bad upload is rejected
+without being loaded whole, and reading stops at `max_payments`.
+
+CSV: `recipient,amount_nock` rows, with an optional header line naming
+those columns. NDJSON: one `{"recipient": ..., "amount_nock": ...}` object
+per line. Blank lines are ignored in both.
+
+`plan_batch()` groups the payments into transactions of at most
+`outputs_per_tx` outputs (as many as `create-tx` accepts) and gives each
+transaction its own set of notes, so the transactions can be signed and
+sent independently.
+"""
+import csv
+import json
+import math
+import re
+
+from coin_selection import InsufficientFunds, select_notes
+
+NICK_PER_NOCK = 65536
+# Recipients end up in the `[1 <pubkey>],[1 <pubkey>]` list given to create-tx
+RECIPIENT_RE = re.compile(r'^[^\s\[\],]+$')
+FORMATS = ('csv', 'ndjson')
+
+
+class PaymentsError(ValueError):
+    """The payment list is invalid; `errors` holds {"line", "error"} entries."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid payment(s)")
+
+
+def parse_payment(item, line):
+    """Validate one payment dict; return {"line", "recipient", "amount_nock", "amount_nick"}."""
+    if not isinstance(item, dict):
+        raise ValueError("expected an object with recipient and amount_nock")
+
+    recipient = str(item.get('recipient') or '').strip()
+    if not recipient:
+        raise ValueError("recipient is required")
+    if not RECIPIENT_RE.match(recipient):
+        raise ValueError(f"invalid recipient: {recipient[:60]!r}")
+
+    try:
+        amount_nock = float(item.get('amount_nock'))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid amount_nock: {item.get('amount_nock')!r}") from None
+    amount_nick = int(amount_nock * NICK_PER_NOCK) if math.isfinite(amount_nock) else 0
+    if amount_nick <= 0:
+        raise ValueError(f"amount_nock must be at least 1 nick, got {item.get('amount_nock')!r}")
+
+    return {"line": line, "recipient": recipient, "amount_nock": amount_nock, "amount_nick": amount_nick}
+
+
+def _csv_items(lines):
+    columns = ('recipient', 'amount_nock')
+    for line, row in enumerate(csv.reader(lines), 1):
+        fields = [field.strip() for field in row]
+        if not any(fields):
+            continue
+        if line == 1 and 'recipient' in fields:
+            columns = fields
+            continue
+        yield line, dict(zip(columns, fields))
+
+
+def _ndjson_items(lines):
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, ValueError(f"invalid JSON: {e.msg}")
+
+
+def read_payments(items, max_payments, max_errors=20):
+    """Validate (line, item) pairs; return the payments or raise PaymentsError.
+
+    Stops reading after `max_errors` invalid lines or once there are more
+    than `max_payments` payments.
+    """
+    payments, errors = [], []
+    for line, item in items:
+        try:
+            if isinstance(item, Exception):
+                raise item
+            payments.append(parse_payment(item, line))
+        except ValueError as e:
+            errors.append({"line": line, "error": str(e)})
+            if len(errors) >= max_errors:
+                break
+        if len(payments) > max_payments:
+            errors.append({"line": line, "error": f"too many payments (at most {max_payments})"})
+            break
+    if not payments and not errors:
+        errors.append({"line": None, "error": "no payments given"})
+    if errors:
+        raise PaymentsError(errors)
+    return payments
+
+
+def read_payments_file(lines, fmt, max_payments):
+    """Validate the lines of an uploaded CSV or NDJSON file."""
+    if fmt not in FORMATS:
+        raise PaymentsError([{"line": None, "error": f"unknown format {fmt!r}, expected csv or ndjson"}])
+    items = _csv_items(lines) if fmt == 'csv' else _ndjson_items(lines)
+    return read_payments(items, max_payments)
+
+
+def read_payments_list(items, max_payments):
+    """Validate a JSON list of payments (line = position in the list, from 1)."""
+    if not isinstance(items, list):
+        raise PaymentsError([{"line": None, "error": "payments must be a list"}])
+    return read_payments(enumerate(items, 1), max_payments)
+
+
+def plan_batch(notes, payments, fee_nick, outputs_per_tx, strategy='auto', time_budget=0.1):
+    """Split payments into transactions and choose disjoint notes for each.
+
+    Returns a list of {"payments", "selection", "error"} dicts, one per
+    transaction; a transaction the remaining notes cannot fund has
+    selection None and an error. Raises InsufficientFunds when the notes
+    cannot cover the whole batch (amounts plus one fee per transaction).
+    """
+    chunks = [payments[i:i + outputs_per_tx] for i in range(0, len(payments), outputs_per_tx)]
+    needed = sum(payment['amount_nick'] for payment in payments) + fee_nick * len(chunks)
+    available = sum(note['value'] for note in notes if note['value'] > 0)
+    if available < needed:
+        raise InsufficientFunds(needed, available)
+
+    remaining = list(notes)
+    planned = []
+    for chunk in chunks:
+        target = sum(payment['amount_nick'] for payment in chunk) + fee_nick
+        try:
+            selection = select_notes(remaining, target, strategy, time_budget=time_budget / len(chunks))
+        except InsufficientFunds as e:
+            # Enough in total, but the notes left after earlier transactions are not
+            planned.append({"payments": chunk, "selection": None, "error": str(e)})
+            continue
+        used = {id(note) for note in selection.notes}
+        remaining = [note for note in remaining if id(note) not in used]
+        planned.append({"payments": chunk, "selection": selection, "error": None})
+    return planned
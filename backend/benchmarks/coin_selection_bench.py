@@ -0,0 +1,96 @@
+"""Compare the coin selection strategies on synthetic note sets.
+
+Usage (from the backend folder):
+    python benchmarks/coin_selection_bench.py
+    python benchmarks/coin_selection_bench.py --notes 1000,10000 --targets 20 --budget 0.05
+
+For every note distribution and size, draws `--targets` random payment
+amounts and prints, per strategy, the mean number of inputs, the mean
+change, the share of exact matches (no change), the share of runs that hit
+the time budget, and the mean/max selection time.
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from coin_selection import STRATEGIES, select_notes  # noqa: E402
+
+NICK_PER_NOCK = 65536
+
+
+def mining_rewards(rng, count):
+    """Mostly identical coinbase-sized notes plus a few odd ones."""
+    reward = 2 ** 16 * 1000
+    return [reward if rng.random() < 0.9 else rng.randint(1, reward) for _ in range(count)]
+
+
+def uniform(rng, count):
+    return [rng.randint(1, 1000 * NICK_PER_NOCK) for _ in range(count)]
+
+
+def heavy_tail(rng, count):
+    """Many small notes and a few very large ones (received payments, change)."""
+    return [max(1, int(rng.paretovariate(1.2) * NICK_PER_NOCK)) for _ in range(count)]
+
+
+def dust(rng, count):
+    """Mostly tiny notes, a handful worth spending."""
+    return [rng.randint(1, 500) if rng.random() < 0.95 else rng.randint(1, 100) * NICK_PER_NOCK
+            for _ in range(count)]
+
+
+DISTRIBUTIONS = {
+    'mining': mining_rewards,
+    'uniform': uniform,
+    'heavy-tail': heavy_tail,
+    'dust': dust,
+}
+
+
+def run(distribution, count, targets, budget, rng):
+    values = DISTRIBUTIONS[distribution](rng, count)
+    notes = [{"name": f"n{i}", "value": value} for i, value in enumerate(values)]
+    total = sum(values)
+    # Payments between a tiny amount and a quarter of the balance
+    amounts = [rng.randint(1, max(1, total // 4)) for _ in range(targets)]
+
+    for strategy in STRATEGIES:
+        inputs, change, times = [], [], []
+        exact = timed_out = 0
+        for amount in amounts:
+            start = time.perf_counter()
+            selection = select_notes(notes, amount, strategy, time_budget=budget)
+            times.append((time.perf_counter() - start) * 1000)
+            inputs.append(len(selection.notes))
+            change.append(selection.change)
+            exact += selection.change == 0
+            timed_out += selection.timed_out
+        print(f"  {strategy:<11} {statistics.mean(inputs):>9.1f} {statistics.mean(change) / NICK_PER_NOCK:>14.4f} "
+              f"{exact / targets:>7.0%} {timed_out / targets:>9.0%} "
+              f"{statistics.mean(times):>9.2f} {max(times):>9.2f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', default='100,1000,10000', help="comma separated note counts")
+    parser.add_argument('--targets', type=int, default=20, help="payments per distribution and size")
+    parser.add_argument('--budget', type=float, default=0.1, help="time budget per selection (seconds)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for distribution in DISTRIBUTIONS:
+        for count in (int(n) for n in args.notes.split(',')):
+            print(f"{distribution}, {count} notes")
+            print(f"  {'strategy':<11} {'inputs':>9} {'change (NOCK)':>14} {'exact':>7} {'timed out':>9} "
+                  f"{'mean ms':>9} {'max ms':>9}")
+            run(distribution, count, args.targets, args.budget, rng)
@@ -0,0 +1,62 @@
+"""Compare per-command overhead of the wallet executors.
+
+Usage (from the backend folder, where the wallet container is reachable):
+    python benchmarks/executor_bench.py
+    python benchmarks/executor_bench.py --iterations 50 --executors docker-cli,docker-api
+
+Runs a cheap read-only subcommand (list-active-addresses by default)
+through each executor and prints latency percentiles. Executors that cannot
+run here (no local binary, no docker socket) are reported and skipped.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from wallet_runner import create_executor  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_executor(kind, command, iterations):
+    executor = create_executor(kind)
+    try:
+        # Warm-up (also opens the pooled connection for docker-api)
+        executor.run(command, timeout=30)
+    except Exception as e:
+        print(f"{kind:<12} skipped: {type(e).__name__}: {e}")
+        return
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        executor.run(command, timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"{kind:<12} {statistics.mean(samples):>9.1f} {percentile(samples, 50):>9.1f} "
+          f"{percentile(samples, 95):>9.1f} {min(samples):>9.1f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--executors', default='local,docker-cli,docker-api')
+    parser.add_argument('--command', default='list-active-addresses',
+                        help="wallet subcommand to run (space separated)")
+    args = parser.parse_args()
+
+    print(f"{args.iterations} x `{args.command}` (milliseconds)")
+    print(f"{'executor':<12} {'mean':>9} {'p50':>9} {'p95':>9} {'min':>9}")
+    for kind in args.executors.split(','):
+        bench_executor(kind.strip(), args.command.split(), args.iterations)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Stand-in `nockchain-wallet` for load tests without a wallet or a chain.
+
+Usage (from the backend folder):
+    WALLET_CMD_PREFIX="python benchmarks/fake_wallet.py" FAKE_WALLET_NOTES=5000 python app.py
+    python benchmarks/fake_wallet.py list-notes
+
+Implements list-notes (synthetic notes from list_notes_generator.py),
+list-active-addresses, list-master-addresses, create-tx (writes
+txs/<name>.tx relative to the working directory, like the real CLI),
+sign-tx, send-tx and show-tx. Other subcommands fail with exit code 2.
+
+Configured through the environment:
+- FAKE_WALLET_NOTES, FAKE_WALLET_VERSION (v0, v1, mixed), FAKE_WALLET_ANSI,
+  FAKE_WALLET_SEED: the notes list-notes prints;
+- FAKE_WALLET_LATENCY: seconds each command takes, either one number or
+  `command=seconds` entries plus a default, e.g. `list-notes=0.5,create-tx=1,0.05`;
+  FAKE_WALLET_JITTER adds up to that fraction of random extra latency;
+- FAKE_WALLET_FAIL_RATE: share of commands that exit 1 with an error on
+  stderr, limited to the subcommands in FAKE_WALLET_FAIL_COMMANDS if set;
+- FAKE_WALLET_HANG_RATE: share of commands that sleep FAKE_WALLET_HANG_SECONDS
+  (to hit the backend's timeouts);
+- FAKE_WALLET_STATE_DIR: with a directory, send-tx spends notes (the oldest
+  notes are replaced by as many new ones, see `first` in the generator) and
+  list-notes outputs are cached there between runs.
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.list_notes_generator import _base58, generate  # noqa: E402
+
+TX_DIR = 'txs'
+SEPARATOR = '―' * 80
+
+
+class WalletError(Exception):
+    """Ends the command with the message on stderr and exit_code."""
+
+    def __init__(self, message, exit_code=1):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def _env_float(name, default):
+    return float(os.getenv(name) or default)
+
+
+def _latency(command):
+    """Seconds `command` takes according to FAKE_WALLET_LATENCY."""
+    default = 0.0
+    for entry in filter(None, (os.getenv('FAKE_WALLET_LATENCY') or '').split(',')):
+        name, _, seconds = entry.rpartition('=')
+        if not name:
+            default = float(seconds)
+        elif name.strip() == command:
+            return float(seconds)
+    return default
+
+
+def _hash_base58(data, width):
+    """Base58 string of `width` characters derived from data."""
+    digest = hashlib.sha512(data + b'0').digest() + hashlib.sha512(data + b'1').digest()
+    return _base58(int.from_bytes(digest, 'big'), width)
+
+
+def _address():
+    seed = os.getenv('FAKE_WALLET_SEED') or '0'
+    return os.getenv('FAKE_WALLET_ADDRESS') or _hash_base58(f'address {seed}'.encode(), 132)
+
+
+@contextlib.contextmanager
+def _state():
+    """Yield the persistent state dict (empty without FAKE_WALLET_STATE_DIR) and save it."""
+    directory = os.getenv('FAKE_WALLET_STATE_DIR')
+    if not directory:
+        yield {}
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'state.json')
+    with open(path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        before = dict(state)
+        yield state
+        if state != before:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.replace(path + '.tmp', path)
+
+
+def _read_tx(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise WalletError(f"Error: transaction file not found: {path}")
+    except ValueError:
+        raise WalletError(f"Error: could not decode transaction file: {path}")
+
+
+def _write_tx(path, tx):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(tx, f)
+    os.replace(path + '.tmp', path)
+
+
+def _option(args, name):
+    try:
+        return args[args.index(name) + 1]
+    except (ValueError, IndexError):
+        raise WalletError(f"error: the argument '{name} <{name[2:].upper()}>' is required", exit_code=2)
+
+
+def list_notes(args):
+    count = int(os.getenv('FAKE_WALLET_NOTES') or 1000)
+    version = os.getenv('FAKE_WALLET_VERSION') or 'mixed'
+    ansi = (os.getenv('FAKE_WALLET_ANSI') or 'false').lower() == 'true'
+    seed = int(os.getenv('FAKE_WALLET_SEED') or 0)
+    with _state() as state:
+        first = state.get('spent', 0)
+
+    directory = os.getenv('FAKE_WALLET_STATE_DIR')
+    if not directory:
+        return generate(count, version, ansi, seed=seed, first=first, expected=False)[0]
+    key = hashlib.sha1(repr((count, version, ansi, seed, first)).encode()).hexdigest()[:16]
+    path = os.path.join(directory, f'list-notes-{key}.txt')
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        output = generate(count, version, ansi, seed=seed, first=first, expected=False)[0]
+        with open(path + f'.{os.getpid()}', 'w') as f:
+            f.write(output)
+        os.replace(path + f'.{os.getpid()}', path)
+        return output
+
+
+def list_active_addresses(args):
+    return f"Addresses -- Signing\n- Address: {_address()}\n- Version: 1\n\nAddresses -- Watch only\n"
+
+
+def list_master_addresses(args):
+    return f"{SEPARATOR}\n- Address: {_address()} (active)\n- Version: 1\n{SEPARATOR}\n"
+
+
+def create_tx(args):
+    names = re.findall(r'\[([^\]]*)\]', _option(args, '--names'))
+    recipients = re.findall(r'\[1 ([^\]]*)\]', _option(args, '--recipients'))
+    gifts = [int(gift) for gift in _option(args, '--gifts').split(',')]
+    fee = int(_option(args, '--fee'))
+    if not names or len(recipients) != len(gifts):
+        raise WalletError("Error: invalid transaction: every recipient needs one gift and at least one note")
+
+    name = _hash_base58(uuid.uuid4().bytes, 52)
+    os.makedirs(TX_DIR, exist_ok=True)
+    _write_tx(os.path.join(TX_DIR, f'{name}.tx'), {
+        "name": name,
+        "names": names,
+        "outputs": [[recipient, gift] for recipient, gift in zip(recipients, gifts)],
+        "fee": fee,
+        "signed": False,
+        "sent": False
+    })
+    return f"Transaction created\nName: {name}\nFile: {TX_DIR}/{name}.tx\n"
+
+
+def sign_tx(args):
+    path = args[0] if args else ''
+    tx = _read_tx(path)
+    tx['signed'] = True
+    _write_tx(path, tx)
+    return f"Signed transaction {tx['name']}\n"
+
+
+def send_tx(args):
+    path = args[0] if args else ''
+    tx = _read_tx(path)
+    if not tx['signed']:
+        raise WalletError(f"Error: transaction {tx['name']} is not signed")
+    if not tx['sent']:
+        tx['sent'] = True
+        _write_tx(path, tx)
+        with _state() as state:
+            state['spent'] = state.get('spent', 0) + len(tx['names'])
+    return f"Sent transaction {tx['name']}\n"
+
+
+def show_tx(args):
+    tx = _read_tx(args[0] if args else '')
+    lines = [
+        f"Transaction: {tx['name']}",
+        f"- Signed: {str(tx['signed']).lower()}",
+        f"- Inputs: {len(tx['names'])}",
+    ]
+    lines += [f"  - [{name}]" for name in tx['names']]
+    lines.append("- Outputs:")
+    lines += [f"  - {gift} nicks to {recipient}" for recipient, gift in tx['outputs']]
+    lines.append(f"- Fee: {tx['fee']} nicks")
+    return '\n'.join(lines) + '\n'
+
+
+COMMANDS = {
+    'list-notes': list_notes,
+    'list-active-addresses': list_active_addresses,
+    'list-master-addresses': list_master_addresses,
+    'create-tx': create_tx,
+    'sign-tx': sign_tx,
+    'send-tx': send_tx,
+    'show-tx': show_tx,
+}
+
+
+def main(argv):
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write(f"error: unrecognized subcommand '{argv[0] if argv else ''}'\n")
+        return 2
+    command, args = argv[0], argv[1:]
+
+    latency = _latency(command)
+    time.sleep(latency * (1 + random.random() * _env_float('FAKE_WALLET_JITTER', 0)))
+    if random.random() < _env_float('FAKE_WALLET_HANG_RATE', 0):
+        time.sleep(_env_float('FAKE_WALLET_HANG_SECONDS', 600))
+    fail_commands = set(filter(None, (os.getenv('FAKE_WALLET_FAIL_COMMANDS') or '').split(',')))
+    if (not fail_commands or command in fail_commands) and random.random() < _env_float('FAKE_WALLET_FAIL_RATE', 0):
+        sys.stderr.write(f"Error: injected failure in {command}\n")
+        return 1
+
+    try:
+        sys.stdout.write(COMMANDS[command](args))
+    except WalletError as e:
+        sys.stderr.write(f"{e}\n")
+        return e.exit_code
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,100 @@
+"""The regex `list-notes` parser note_parser.py replaced, kept as a reference.
+
+This is the section-by-section regex parsing that get_wallet_balance() did
+before the single-pass parser, without the CLI call and the logging. The
+benchmark reports its throughput next to the current parser's, and the
+corpus `.json` files hold what it produces.
+"""
+import re
+
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*m')
+V1_SIGNER_PATTERNS = [
+    r'- Signers:\s*\n\s*-\s*([A-Za-z0-9]{50,})',
+    r'- Signers:\s*\n\s*([A-Za-z0-9]{50,})',
+    r'Signers:\s*\n\s*-?\s*([A-Za-z0-9]{50,})',
+]
+V0_SIGNER_PATTERNS = [
+    r'- Signers:\s*\n\s*([A-Za-z0-9]{50,})',
+    r'Signers:\s*\n\s*([A-Za-z0-9]{50,})',
+    r'- Signers:\s*\n\s*-?\s*([A-Za-z0-9]{50,})',
+]
+
+
+def _first_match(patterns, text):
+    for pattern in patterns:
+        signer_match = re.search(pattern, text)
+        if signer_match:
+            return signer_match.group(1).strip()
+    return "Unknown"
+
+
+def parse_list_notes(output):
+    """Parse a full `list-notes` output into the `/api/balance` payload."""
+    output = ANSI_ESCAPE_RE.sub('', output)
+    if "Wallet Notes" not in output:
+        return {"notes": [], "notes_count": 0, "total_assets": 0}
+
+    notes = []
+    note_number = 0
+    for section in re.split(r'[―\-]{50,}', output):
+        section = section.strip()
+        if not section or "Wallet Notes" in section:
+            continue
+
+        is_v1 = "Note Information" in section
+        is_v0 = "Details" in section and "Lock" in section
+        if not is_v0 and not is_v1:
+            continue
+        note_number += 1
+
+        name_match = re.search(r'- Name:\s*\[(.*?)\]', section, re.DOTALL)
+        name = name_match.group(1).strip().replace('\n', ' ') if name_match else "Unknown"
+
+        version_match = re.search(r'- Version:\s*(\d+)', section)
+        version = int(version_match.group(1)) if version_match else 0
+
+        if is_v1:
+            assets_match = re.search(r'- Assets \(nicks\):\s*(\d+)', section)
+        else:
+            assets_match = re.search(r'- Assets:\s*(\d+)', section)
+        value = int(assets_match.group(1)) if assets_match else 0
+
+        marker = 'Note Information' if is_v1 else 'Details'
+        block_match = re.search(marker + r'.*?- Block Height:\s*(\d+)', section, re.DOTALL)
+        block_height = int(block_match.group(1)) if block_match else 0
+
+        source = None
+        if is_v0:
+            source_match = re.search(r'- Source:\s*(\S+)', section)
+            source = source_match.group(1) if source_match else "Unknown"
+
+        signer = "Unknown"
+        if is_v1:
+            if "Lock Information: N/A" in section:
+                signer = "N/A"
+            else:
+                lock_info_match = re.search(r'- Lock Information:(.*?)(?:$)', section, re.DOTALL)
+                if lock_info_match:
+                    signer = _first_match(V1_SIGNER_PATTERNS, lock_info_match.group(1))
+        else:
+            lock_match = re.search(r'Lock\s*\n(.*?)(?:\n\n|$)', section, re.DOTALL)
+            if lock_match:
+                signer = _first_match(V0_SIGNER_PATTERNS, lock_match.group(1))
+
+        note = {
+            'number': note_number,
+            'name': name,
+            'value': value,
+            'block_height': block_height,
+            'version': version,
+            'signer': signer
+        }
+        if source:
+            note['source'] = source
+        notes.append(note)
+
+    return {
+        "notes": notes,
+        "notes_count": len(notes),
+        "total_assets": sum(note["value"] for note in notes)
+    }
@@ -0,0 +1,196 @@
+"""Synthetic `nockchain-wallet list-notes` output.
+
+Usage (from the backend folder):
+    python benchmarks/list_notes_generator.py --notes 1000 > notes.txt
+    python benchmarks/list_notes_generator.py --notes 50 --version v1 --ansi --expected notes.json
+
+Generates any number of v0, v1 or mixed notes in the formats the parser
+handles (see note_parser.py), with the variations real outputs have:
+- ANSI colored section titles and v1 signers (`ansi=True`);
+- em-dash or hyphen separator lines;
+- v1 notes whose `Lock Information` is `N/A` (`na_ratio`);
+- names wrapped onto a second, indented line (`multiline_ratio`).
+
+`generate()` returns the output together with the `/api/balance` payload
+the parser must produce for it, so generated outputs double as test cases.
+Output is deterministic for a given seed, and notes are numbered from
+`first`, so two outputs overlap exactly where their ranges do (e.g. to
+simulate spending and receiving notes between two syncs).
+"""
+import argparse
+import io
+import json
+import random
+import sys
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+VERSIONS = ('v0', 'v1', 'mixed')
+SEPARATORS = {'em-dash': '―' * 80, 'hyphen': '-' * 80}
+# Distinct random strings to build names, sources and signers from; picking
+# from a pool keeps generating a million notes fast
+POOL_SIZE = 1024
+SIGNER_COUNT = 3
+MASK64 = (1 << 64) - 1
+
+ANSI_TITLE = '\x1b[1;36m{}\x1b[0m'
+ANSI_SIGNER = '\x1b[33m{}\x1b[0m'
+
+
+def _random_string(rng, length):
+    return ''.join(rng.choices(BASE58, k=length))
+
+
+def _mix(seed, index, field):
+    """Deterministic pseudo-random 64-bit integer for one field of one note (splitmix64)."""
+    x = (seed * 0x9E3779B97F4A7C15 + index * 0xBF58476D1CE4E5B9 + field * 0x94D049BB133111EB) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def _chance(seed, index, field, ratio):
+    return _mix(seed, index, field) % 1_000_000 < ratio * 1_000_000
+
+
+def _base58(number, width):
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 58)
+        digits.append(BASE58[digit])
+    return ''.join(reversed(digits))
+
+
+def generate_notes(count, version='mixed', seed=0, na_ratio=0.1, multiline_ratio=0.25, first=0):
+    """Yield note specs: the parsed note fields plus how to render them."""
+    if version not in VERSIONS:
+        raise ValueError(f"version must be one of {', '.join(VERSIONS)}")
+    rng = random.Random(seed)
+    pool = [_random_string(rng, 52) for _ in range(POOL_SIZE)]
+    signers = [_random_string(rng, 132) for _ in range(SIGNER_COUNT)]
+
+    for index in range(first, first + count):
+        # Per-note values depend on the seed and index only, so overlapping
+        # ranges render identical notes
+        is_v1 = version == 'v1' or (version == 'mixed' and index % 2)
+        # The index makes every name unique
+        first_part = pool[index % POOL_SIZE][:44] + _base58(index, 8)
+        second_part = pool[(index * 7 + 1) % POOL_SIZE]
+        spec = {
+            'version': 1 if is_v1 else 0,
+            'first_part': first_part,
+            'second_part': second_part,
+            'multiline': _chance(seed, index, 1, multiline_ratio),
+            'value': 1 + _mix(seed, index, 2) % 2_000_000_000,
+            'block_height': 1 + _mix(seed, index, 3) % 60_000,
+            'signer': signers[index % SIGNER_COUNT],
+            'lock_na': is_v1 and _chance(seed, index, 4, na_ratio),
+            'source': pool[(index * 13 + 5) % POOL_SIZE] if not is_v1 else None,
+        }
+        yield spec
+
+
+def _name_lines(spec, indent):
+    if spec['multiline']:
+        return [f"- Name: [{spec['first_part']}", f"{indent}{spec['second_part']}]"]
+    return [f"- Name: [{spec['first_part']} {spec['second_part']}]"]
+
+
+def _expected_name(spec, indent):
+    # The parser joins wrapped name lines with a space, keeping the indent
+    separator = ' ' + indent if spec['multiline'] else ' '
+    return spec['first_part'] + separator + spec['second_part']
+
+
+def _render_note(spec, ansi):
+    title = (lambda text: ANSI_TITLE.format(text)) if ansi else (lambda text: text)
+    if spec['version'] == 1:
+        lines = [title('Note Information')] + _name_lines(spec, '    ') + [
+            "- Version: 1",
+            f"- Assets (nicks): {spec['value']}",
+            f"- Block Height: {spec['block_height']}",
+        ]
+        if spec['lock_na']:
+            lines.append("- Lock Information: N/A")
+        else:
+            signer = ANSI_SIGNER.format(spec['signer']) if ansi else spec['signer']
+            lines += ["- Lock Information:", "  - Required Signatures: 1", "  - Signers:", f"    - {signer}"]
+        return lines
+    return [title('Details')] + _name_lines(spec, '  ') + [
+        "- Version: 0",
+        f"- Assets: {spec['value']}",
+        f"- Block Height: {spec['block_height']}",
+        f"- Source: {spec['source']}",
+        "",
+        title('Lock'),
+        "- Required Signatures: 1",
+        "- Signers:",
+        f"  {spec['signer']}",
+    ]
+
+
+def render(specs, ansi=False, separator='em-dash'):
+    """Return the list-notes output for note specs (any iterable, consumed once)."""
+    separator_line = SEPARATORS[separator] + '\n'
+    # Written note by note: a million notes' lines would not fit in a list
+    out = io.StringIO()
+    out.write('Wallet Notes\n')
+    for spec in specs:
+        out.write(separator_line)
+        out.write('\n'.join(_render_note(spec, ansi)))
+        out.write('\n')
+    out.write(separator_line)
+    return out.getvalue()
+
+
+def expected_balance(specs):
+    """Return the /api/balance payload parse_list_notes() gives for the specs' output."""
+    notes = []
+    for number, spec in enumerate(specs, 1):
+        is_v1 = spec['version'] == 1
+        note = {
+            'number': number,
+            'name': _expected_name(spec, '    ' if is_v1 else '  '),
+            'value': spec['value'],
+            'block_height': spec['block_height'],
+            'version': spec['version'],
+            'signer': 'N/A' if spec['lock_na'] else spec['signer'],
+        }
+        if not is_v1:
+            note['source'] = spec['source']
+        notes.append(note)
+    return {
+        "notes": notes,
+        "notes_count": len(notes),
+        "total_assets": sum(note['value'] for note in notes)
+    }
+
+
+def generate(count, version='mixed', ansi=False, separator='em-dash', seed=0,
+             na_ratio=0.1, multiline_ratio=0.25, first=0, expected=True):
+    """Return (output, expected balance or None) for `count` synthetic notes."""
+    specs = generate_notes(count, version, seed, na_ratio, multiline_ratio, first)
+    if not expected:
+        return render(specs, ansi, separator), None
+    specs = list(specs)
+    return render(specs, ansi, separator), expected_balance(specs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=100)
+    parser.add_argument('--version', choices=VERSIONS, default='mixed')
+    parser.add_argument('--ansi', action='store_true', help="color titles and v1 signers")
+    parser.add_argument('--separator', choices=sorted(SEPARATORS), default='em-dash')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first', type=int, default=0, help="index of the first note")
+    parser.add_argument('--na-ratio', type=float, default=0.1, help="share of v1 notes with `Lock Information: N/A`")
+    parser.add_argument('--multiline-ratio', type=float, default=0.25, help="share of names wrapped onto two lines")
+    parser.add_argument('--expected', metavar='PATH', help="also write the expected /api/balance payload here")
+    args = parser.parse_args()
+
+    output, balance = generate(args.notes, args.version, args.ansi, args.separator, args.seed,
+                               args.na_ratio, args.multiline_ratio, args.first, expected=bool(args.expected))
+    sys.stdout.write(output)
+    if args.expected:
+        with open(args.expected, 'w') as f:
+            json.dump(balance, f, indent=2)
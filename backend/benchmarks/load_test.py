@@ -0,0 +1,255 @@
+"""End-to-end load test of the API against the fake wallet.
+
+Usage (from the backend folder):
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenario sends --burst-size 10 --fail-rate 0.05
+    python benchmarks/load_test.py --server gunicorn --notes 20000 --latency "list-notes=1,0.05"
+    python benchmarks/load_test.py --url http://localhost:5007 --scenario dashboard
+
+Unless --url points at a running server, starts the backend (`dev` or
+`gunicorn`) with WALLET_CMD_PREFIX running benchmarks/fake_wallet.py, so
+no wallet or chain is needed; --notes, --latency, --jitter, --fail-rate
+and --hang-rate configure the fake wallet (see its docstring). Scenarios:
+- `dashboard`: --dashboards clients refresh the balance, active address and
+  transaction history every --refresh seconds, revalidating with the ETags
+  they got like a browser does;
+- `sends`: every --burst-interval seconds, --burst-size clients create,
+  sign and send a transaction at once through /api/transaction-pipeline;
+- `mixed` (default): both at the same time.
+
+Prints requests, errors, throughput and latency percentiles per endpoint.
+Transaction files created under txs/ are removed afterwards.
+"""
+import argparse
+import collections
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.serving_bench import free_port, percentile, wait_until_up  # noqa: E402
+
+FAKE_WALLET = os.path.join(BACKEND_DIR, 'benchmarks', 'fake_wallet.py')
+TX_FOLDER = os.path.join(BACKEND_DIR, 'txs')
+SCENARIOS = ('dashboard', 'sends', 'mixed')
+DASHBOARD_ENDPOINTS = (
+    '/api/balance',
+    '/api/active-address',
+    '/api/transaction-history?limit=20',
+)
+PIPELINE_ENDPOINT = '/api/transaction-pipeline'
+SERVERS = {
+    'dev': [sys.executable, 'app.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+}
+
+
+class Results:
+    """Latencies and outcomes per endpoint, shared by the client threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+
+    def record(self, endpoint, status, milliseconds):
+        with self._lock:
+            self.latencies[endpoint].append(milliseconds)
+            self.statuses[endpoint][status] += 1
+
+    def report(self, duration):
+        print(f"{'endpoint':<36} {'requests':>8} {'errors':>7} {'304':>6} {'req/s':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for endpoint in sorted(self.latencies):
+            samples = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if status not in (200, 304))
+            print(f"{endpoint:<36} {len(samples):>8} {errors:>7} {statuses[304]:>6} {len(samples) / duration:>8.1f} "
+                  f"{percentile(samples, 50):>9.1f} {percentile(samples, 95):>9.1f} {percentile(samples, 99):>9.1f}")
+        failures = collections.Counter()
+        for endpoint, statuses in self.statuses.items():
+            for status, count in statuses.items():
+                if status not in (200, 304):
+                    failures[(endpoint, status)] += count
+        for (endpoint, status), count in sorted(failures.items(), key=str):
+            print(f"  {endpoint}: {count} x {status}")
+
+
+def request(host, port, method, path, body=None, headers=None, timeout=300):
+    """Send one request on a new connection; return (status, headers, body)."""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        headers = dict(headers or {})
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        conn.close()
+
+
+def timed(results, endpoint, fn):
+    start = time.perf_counter()
+    try:
+        status, headers, body = fn()
+    except (OSError, http.client.HTTPException) as e:
+        results.record(endpoint, type(e).__name__, (time.perf_counter() - start) * 1000)
+        return None, None
+    results.record(endpoint, status, (time.perf_counter() - start) * 1000)
+    return status, headers
+
+
+def dashboard_client(host, port, results, stop_at, refresh):
+    etags = {}
+    # Spread the clients' refreshes over the interval
+    time.sleep(random.random() * refresh)
+    while time.monotonic() < stop_at:
+        for path in DASHBOARD_ENDPOINTS:
+            headers = {'Accept-Encoding': 'gzip, br'}
+            if path in etags:
+                headers['If-None-Match'] = etags[path]
+            status, response_headers = timed(results, f"GET {path.split('?')[0]}",
+                                             lambda: request(host, port, 'GET', path, headers=headers))
+            if status == 200 and response_headers.get('ETag'):
+                etags[path] = response_headers['ETag']
+        time.sleep(refresh * (0.5 + random.random()))
+
+
+def send_bursts(host, port, results, stop_at, args):
+    def send(n):
+        body = {
+            "recipient": f"LOADTEST{n}",
+            "amount_nock": args.amount,
+            "fee": 10
+        }
+        timed(results, f"POST {PIPELINE_ENDPOINT}", lambda: request(host, port, 'POST', PIPELINE_ENDPOINT, body))
+
+    sent = 0
+    bursts = []
+    while time.monotonic() < stop_at:
+        burst = [threading.Thread(target=send, args=(sent + i,)) for i in range(args.burst_size)]
+        sent += args.burst_size
+        for thread in burst:
+            thread.start()
+        bursts.extend(burst)
+        time.sleep(args.burst_interval)
+    for thread in bursts:
+        thread.join()
+
+
+def run_load(host, port, args):
+    results = Results()
+    stop_at = time.monotonic() + args.duration
+    threads = []
+    if args.scenario in ('dashboard', 'mixed'):
+        threads += [threading.Thread(target=dashboard_client, args=(host, port, results, stop_at, args.refresh))
+                    for _ in range(args.dashboards)]
+    if args.scenario in ('sends', 'mixed'):
+        threads.append(threading.Thread(target=send_bursts, args=(host, port, results, stop_at, args)))
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Slow requests may outlive --duration; rates use the real run time
+    return results, time.monotonic() - start
+
+
+def start_server(args, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        FLASK_HOST='127.0.0.1',
+        FLASK_PORT=str(port),
+        FLASK_DEBUG='False',
+        WALLET_EXECUTOR='local',
+        WALLET_CMD_PREFIX=f"{sys.executable} {FAKE_WALLET}",
+        NOCKCHAIN_WALLET_HOST='',
+        HISTORY_DB=os.path.join(workdir, 'history.db'),
+        SHARED_STATE_DIR=os.path.join(workdir, 'shared'),
+        SYNC_WORKER_ENABLED=str(not args.no_sync),
+        FAKE_WALLET_NOTES=str(args.notes),
+        FAKE_WALLET_LATENCY=args.latency,
+        FAKE_WALLET_JITTER=str(args.jitter),
+        FAKE_WALLET_FAIL_RATE=str(args.fail_rate),
+        FAKE_WALLET_HANG_RATE=str(args.hang_rate),
+        FAKE_WALLET_STATE_DIR=os.path.join(workdir, 'wallet'),
+    )
+    server = subprocess.Popen(SERVERS[args.server], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_until_up(port):
+        stop_server(server)
+        raise RuntimeError(f"{args.server} server did not start")
+    return server, port
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def tx_files():
+    try:
+        return set(name for name in os.listdir(TX_FOLDER) if name.endswith('.tx'))
+    except FileNotFoundError:
+        return set()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=SCENARIOS, default='mixed')
+    parser.add_argument('--duration', type=float, default=30, help="seconds of load")
+    parser.add_argument('--url', help="test this running server instead of starting one")
+    parser.add_argument('--server', choices=sorted(SERVERS), default='dev')
+    parser.add_argument('--no-sync', action='store_true', help="run the server without the sync worker")
+    parser.add_argument('--dashboards', type=int, default=20, help="dashboard clients")
+    parser.add_argument('--refresh', type=float, default=2, help="seconds between dashboard refreshes")
+    parser.add_argument('--burst-size', type=int, default=5, help="transactions sent at once")
+    parser.add_argument('--burst-interval', type=float, default=5, help="seconds between send bursts")
+    parser.add_argument('--amount', type=float, default=0.01, help="NOCK per transaction")
+    parser.add_argument('--notes', type=int, default=2000, help="notes in the fake wallet")
+    parser.add_argument('--latency', default='list-notes=0.5,create-tx=0.3,0.05',
+                        help="fake wallet latency (FAKE_WALLET_LATENCY)")
+    parser.add_argument('--jitter', type=float, default=0.2, help="fake wallet latency jitter fraction")
+    parser.add_argument('--fail-rate', type=float, default=0, help="share of wallet commands failing")
+    parser.add_argument('--hang-rate', type=float, default=0, help="share of wallet commands hanging")
+    args = parser.parse_args()
+
+    print(f"{args.scenario}: {args.duration:g}s, {args.dashboards} dashboards every {args.refresh:g}s, "
+          f"bursts of {args.burst_size} sends every {args.burst_interval:g}s")
+    if args.url:
+        target = urlsplit(args.url)
+        results, elapsed = run_load(target.hostname, target.port or 80, args)
+        results.report(elapsed)
+        sys.exit(0)
+
+    print(f"{args.server} server, fake wallet with {args.notes} notes, latency {args.latency}, "
+          f"fail rate {args.fail_rate:g}, hang rate {args.hang_rate:g}")
+    existing_tx_files = tx_files()
+    with tempfile.TemporaryDirectory(prefix='load-test-') as workdir:
+        server, port = start_server(args, workdir)
+        try:
+            results, elapsed = run_load('127.0.0.1', port, args)
+        finally:
+            stop_server(server)
+            for name in tx_files() - existing_tx_files:
+                os.remove(os.path.join(TX_FOLDER, name))
+    results.report(elapsed)
@@ -0,0 +1,278 @@
+"""Verify and benchmark the `list-notes` parser.
+
+Usage (from the backend folder):
+    python benchmarks/note_parser_bench.py                     # verify, benchmark, compare to baseline
+    python benchmarks/note_parser_bench.py --verify            # correctness checks only
+    python benchmarks/note_parser_bench.py --sizes 10,1000000  # up to a million notes (takes minutes)
+    python benchmarks/note_parser_bench.py --update-baseline   # record this machine's numbers
+
+Verification checks the parser against every captured output in `corpus/`
+(each `.txt` has a `.json` sibling holding the `/api/balance` payload the
+regex parser produced for it) and against synthetic outputs from
+list_notes_generator.py in every format variant.
+
+The suite parses synthetic v0, v1 and mixed outputs (VARIANTS) of each size
+and reports throughput and the parser's peak memory (tracemalloc, measured
+in a separate run since tracing slows parsing down), next to the
+throughput of the regex parser it replaced (legacy_note_parser.py) on the
+same output as a reference (--no-reference skips it). Throughput is the
+median of TIMING_SAMPLES samples, each parsing the output as many times as
+it takes to last at least MIN_SAMPLE_SECONDS, so timer resolution and
+one-off stalls do not move it.
+Results are compared with `baselines/note_parser.json`: the run fails when
+throughput drops or peak memory grows by more than --threshold. Sizes
+below GATE_MIN_SIZE are reported but never fail the run, their timings
+being dominated by per-call overhead that varies between runs. Baselines
+are machine specific; record them on the machine that runs the comparison.
+
+The incremental part re-parses a listing with NoteSetTracker after 1% of
+the notes were spent and as many received, the common case between syncs.
+"""
+import argparse
+import gc
+import glob
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.legacy_note_parser import parse_list_notes as parse_list_notes_regex  # noqa: E402
+from benchmarks.list_notes_generator import SEPARATORS, VERSIONS, generate  # noqa: E402
+from note_parser import NoteSetTracker, parse_list_notes  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'note_parser.json')
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+INCREMENTAL_SIZES = [1_000, 10_000, 100_000]
+# name -> generate() arguments; together they cover every format variation
+VARIANTS = {
+    'v0': {'version': 'v0', 'separator': 'hyphen'},
+    'v1': {'version': 'v1', 'ansi': True},
+    'mixed': {'version': 'mixed'},
+}
+# Throughput is the median of this many samples, each at least this long
+TIMING_SAMPLES = 5
+MIN_SAMPLE_SECONDS = 0.1
+# Smaller sizes are compared with the baseline but cannot fail the run
+GATE_MIN_SIZE = 1_000
+
+
+def verify_corpus():
+    """Check the parser against every captured output. Returns True on success."""
+    ok = True
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, '*.txt'))):
+        with open(path) as f:
+            output = f.read()
+        with open(path[:-4] + '.json') as f:
+            expected = json.load(f)
+
+        result = parse_list_notes(output)
+        status = "ok" if result == expected else "MISMATCH"
+        if result != expected:
+            ok = False
+        print(f"  {os.path.basename(path):<32} {result['notes_count']:>4} notes  {status}")
+    return ok
+
+
+def verify_generated(count=500):
+    """Check the parser against synthetic outputs in every variant. Returns True on success."""
+    ok = True
+    for version in VERSIONS:
+        for separator in SEPARATORS:
+            for ansi in (False, True):
+                output, expected = generate(count, version, ansi, separator, seed=1)
+                result = parse_list_notes(output)
+                label = f"{version} {separator}{' ansi' if ansi else ''}"
+                if result != expected:
+                    ok = False
+                print(f"  {label:<32} {count:>4} notes  {'ok' if result == expected else 'MISMATCH'}")
+    return ok
+
+
+def time_parse(output, parse=parse_list_notes):
+    """Median seconds per parse of output over TIMING_SAMPLES samples."""
+    # Calibrate how many parses make a sample of MIN_SAMPLE_SECONDS
+    start = time.perf_counter()
+    parse(output)
+    once = time.perf_counter() - start
+    repeats = max(1, math.ceil(MIN_SAMPLE_SECONDS / max(once, 1e-9)))
+
+    samples = []
+    for _ in range(TIMING_SAMPLES):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            parse(output)
+        samples.append((time.perf_counter() - start) / repeats)
+    return statistics.median(samples)
+
+
+def peak_parse_memory(output):
+    """Peak bytes allocated while parsing output (the output itself not included)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = parse_list_notes(output)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def run_suite(sizes, variants, measure_memory, reference=True):
+    """Benchmark every variant and size; return {"<variant>/<size>": metrics}.
+
+    With reference, the regex parser is timed on the same outputs; its
+    throughput is recorded but never compared with the baseline.
+    """
+    results = {}
+    print(f"{'variant':<8} {'notes':>9} {'bytes':>12} {'seconds':>9} {'notes/s':>12} {'peak memory':>12} "
+          f"{'regex n/s':>10} {'speedup':>8}")
+    for name in variants:
+        for count in sizes:
+            output, _ = generate(count, expected=False, **VARIANTS[name])
+            seconds = time_parse(output)
+            peak = peak_parse_memory(output) if measure_memory else None
+            regex_seconds = time_parse(output, parse_list_notes_regex) if reference else None
+            results[f"{name}/{count}"] = {
+                "notes_per_second": round(count / seconds),
+                "peak_memory_bytes": peak,
+                "regex_notes_per_second": round(count / regex_seconds) if regex_seconds else None
+            }
+            memory = f"{peak / 1e6:>10.1f}MB" if peak is not None else f"{'-':>12}"
+            if regex_seconds is not None:
+                regex = f"{count / regex_seconds:>10,.0f} {regex_seconds / seconds:>7.2f}x"
+            else:
+                regex = f"{'-':>10} {'-':>8}"
+            print(f"{name:<8} {count:>9} {len(output):>12} {seconds:>9.4f} {count / seconds:>12,.0f} {memory} {regex}")
+            del output
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Print the change against the baseline; return the keys that regressed."""
+    regressions = []
+    print(f"{'benchmark':<16} {'notes/s':>10} {'baseline':>10} {'change':>8} {'memory':>8} {'status':>11}")
+    for key, metrics in results.items():
+        recorded = baseline.get(key)
+        if recorded is None:
+            print(f"{key:<16} {metrics['notes_per_second']:>10,} {'-':>10} {'':>8} {'':>8} {'no baseline':>11}")
+            continue
+        speed_change = metrics['notes_per_second'] / recorded['notes_per_second'] - 1
+        regressed = speed_change < -threshold
+        memory_change = ''
+        if metrics['peak_memory_bytes'] is not None and recorded.get('peak_memory_bytes'):
+            change = metrics['peak_memory_bytes'] / recorded['peak_memory_bytes'] - 1
+            memory_change = f"{change:+.0%}"
+            regressed = regressed or change > threshold
+        gated = int(key.split('/')[1]) >= GATE_MIN_SIZE
+        if regressed and gated:
+            regressions.append(key)
+        status = ('REGRESSION' if gated else 'slower') if regressed else ('ok' if gated else 'not gated')
+        print(f"{key:<16} {metrics['notes_per_second']:>10,} {recorded['notes_per_second']:>10,} "
+              f"{speed_change:>+8.0%} {memory_change:>8} {status:>11}")
+    return regressions
+
+
+def run_incremental_benchmark(sizes):
+    print(f"{'notes':>8} {'full (s)':>9} {'incr (s)':>9} {'speedup':>8} {'added':>6} {'spent':>6}")
+    for count in sizes:
+        churn = max(1, count // 100)
+        before, _ = generate(count, expected=False)
+        after, _ = generate(count, first=churn, expected=False)
+
+        tracker = NoteSetTracker()
+        tracker.parse(before)
+
+        start = time.perf_counter()
+        expected = parse_list_notes(after)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        balance, delta = tracker.parse(after)
+        incremental = time.perf_counter() - start
+
+        assert balance == expected
+        assert len(delta['added']) == churn and len(delta['spent']) == churn and not delta['changed']
+        print(f"{count:>8} {full:>9.3f} {incremental:>9.3f} {full / incremental:>7.1f}x "
+              f"{len(delta['added']):>6} {len(delta['spent']):>6}")
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    baseline = load_baseline(path) or {}
+    merged = dict(baseline.get('results', {}))
+    merged.update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            "recorded_with": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "system": platform.system()
+            },
+            "results": dict(sorted(merged.items(), key=lambda item: (item[0].split('/')[0], int(item[0].split('/')[1]))))
+        }, f, indent=2)
+        f.write('\n')
+    print(f"Baseline written to {os.path.relpath(path, BACKEND_DIR)}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verify', action='store_true', help="run the correctness checks only")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES), help="note counts to benchmark")
+    parser.add_argument('--variants', default=','.join(VARIANTS))
+    parser.add_argument('--no-memory', action='store_true', help="skip the (slow) peak memory runs")
+    parser.add_argument('--no-reference', action='store_true', help="skip timing the regex parser")
+    parser.add_argument('--no-incremental', action='store_true')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed throughput drop / memory growth against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    print("Corpus verification:")
+    corpus_ok = verify_corpus()
+    print("Generated output verification:")
+    if not (verify_generated() and corpus_ok):
+        sys.exit(1)
+    if args.verify:
+        sys.exit(0)
+
+    print()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run_suite(sizes, args.variants.split(','), not args.no_memory, not args.no_reference)
+
+    if not args.no_incremental:
+        print()
+        run_incremental_benchmark([size for size in INCREMENTAL_SIZES if size <= max(sizes)])
+
+    print()
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        sys.exit(0)
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+        sys.exit(0)
+    regressions = compare_with_baseline(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
@@ -0,0 +1,123 @@
+"""Replay a recorded wallet session through the scheduler, coalescing and parser.
+
+Usage (from the backend folder):
+    WALLET_RECORD_FILE=/tmp/session.jsonl python app.py   # record (any executor)
+    python benchmarks/replay_bench.py /tmp/session.jsonl
+    python benchmarks/replay_bench.py /tmp/session.jsonl --speed 10
+
+Every recorded command is issued again at its recorded offset (divided by
+--speed) through wallet_runner.run_wallet_command() with the replay
+executor, so commands that overlapped in the recording overlap again and
+queue, coalesce and get parsed like they did in the server; the answers
+take the recorded time divided by --speed. list-notes outputs are parsed
+with NoteSetTracker as the balance loader does. Prints per-command latency
+percentiles against the recorded durations, the scheduler's queueing and
+the parse time, so a change in any of them can be measured on the same
+traffic offline.
+
+To replay against the whole server instead, start it with
+WALLET_EXECUTOR=replay WALLET_REPLAY_FILE=... and drive it with
+load_test.py --url.
+"""
+import argparse
+import collections
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.serving_bench import percentile  # noqa: E402
+from executors import load_recording  # noqa: E402
+
+
+def replay(entries, speed, wallet_runner, tracker):
+    latencies = collections.defaultdict(list)
+    parse_seconds = []
+    lock = threading.Lock()
+    start_time = entries[0]['time']
+
+    def issue(entry):
+        start = time.perf_counter()
+        result = wallet_runner.run_wallet_command(entry['args'], check=False)
+        elapsed = time.perf_counter() - start
+        if entry['args'][0] == 'list-notes' and result.returncode == 0:
+            parse_start = time.perf_counter()
+            with lock:
+                tracker.parse(result.stdout)
+                parse_seconds.append(time.perf_counter() - parse_start)
+        with lock:
+            latencies[entry['args'][0]].append(elapsed)
+
+    threads = []
+    started = time.monotonic()
+    for entry in entries:
+        if speed:
+            delay = started + (entry['time'] - start_time) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        thread = threading.Thread(target=issue, args=(entry,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return latencies, parse_seconds, time.monotonic() - started
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help="JSON-lines file written with WALLET_RECORD_FILE")
+    parser.add_argument('--speed', type=float, default=1, help="replay this many times faster (0: no delays)")
+    args = parser.parse_args()
+
+    recording = os.path.abspath(args.recording)
+    entries = load_recording(recording)
+    if not entries:
+        sys.exit(f"{args.recording} holds no commands")
+    # wallet_runner builds its executor on import
+    os.environ.update(WALLET_EXECUTOR='replay', WALLET_REPLAY_FILE=recording,
+                      WALLET_REPLAY_SPEED=str(args.speed), SHARED_STATE_DIR='')
+    os.environ.pop('WALLET_RECORD_FILE', None)
+    import wallet_runner  # noqa: E402
+    from note_parser import NoteSetTracker  # noqa: E402
+
+    recorded = collections.defaultdict(list)
+    for entry in entries:
+        recorded[entry['args'][0]].append(entry['duration'])
+    span = entries[-1]['time'] - entries[0]['time']
+    print(f"{len(entries)} commands over {span:.1f}s, replayed at {args.speed:g}x")
+
+    # create-tx replays recreate their .tx files in ./txs
+    with tempfile.TemporaryDirectory(prefix='replay-bench-') as workdir:
+        os.chdir(workdir)
+        latencies, parse_seconds, elapsed = replay(entries, args.speed, wallet_runner, NoteSetTracker())
+
+    scale = args.speed or 1
+    print(f"{'command':<24} {'count':>6} {'recorded p50':>13} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for command in sorted(latencies):
+        samples = [seconds * 1000 for seconds in latencies[command]]
+        # Recorded durations scaled to the replay speed, for comparison
+        expected = percentile(recorded[command], 50) * 1000 / scale
+        print(f"{command:<24} {len(samples):>6} {expected:>13.1f} {percentile(samples, 50):>9.1f} "
+              f"{percentile(samples, 95):>9.1f} {percentile(samples, 99):>9.1f}")
+
+    stats = wallet_runner.runner_stats()
+    scheduler = stats['scheduler']
+    print(f"replay took {elapsed:.1f}s; max queue depth {scheduler['max_queue_depth']}, "
+          f"queue timeouts {scheduler['queue_timeouts']}, "
+          f"coalesced commands {stats['commands']['coalesced']}")
+    for priority, waits in scheduler['wait_ms'].items():
+        if waits:
+            print(f"  {priority} wait: p50 {waits['p50']:.1f} ms, p95 {waits['p95']:.1f} ms, max {waits['max']:.1f} ms")
+    if parse_seconds:
+        print(f"list-notes parsing: {len(parse_seconds)} outputs, {sum(parse_seconds) * 1000:.1f} ms total, "
+              f"{max(parse_seconds) * 1000:.1f} ms max")
+    replay_stats = wallet_runner.executor.stats()
+    if replay_stats['fallbacks'] or replay_stats['misses']:
+        print(f"  {replay_stats['fallbacks']} commands matched by subcommand only, {replay_stats['misses']} unmatched")
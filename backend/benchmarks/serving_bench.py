@@ -0,0 +1,203 @@
+"""Compare request throughput of the development server and gunicorn.
+
+Usage (from the backend folder, gunicorn installed):
+    python benchmarks/serving_bench.py
+    python benchmarks/serving_bench.py --clients 32 --duration 15 --cli-delay 0.5
+
+Each server configuration is started on a free port against a stand-in
+`nockchain-wallet` (a script printing a corpus file after --cli-delay
+seconds) and hammered by --clients keep-alive clients for --duration
+seconds, cycling through the read endpoints and reconnecting every
+REQUESTS_PER_CONNECTION requests so connections spread over the workers.
+Prints requests per second, latency percentiles and how many wallet
+processes the server ran: with SHARED_STATE_DIR, adding workers should not
+add wallet processes.
+"""
+import argparse
+import http.client
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'corpus')
+
+REQUESTS_PER_CONNECTION = 10
+ENDPOINTS = (
+    '/api/balance',
+    '/api/active-address',
+    '/api/list-master-addresses',
+    '/api/transaction-history?limit=20',
+)
+
+# name -> (command, extra environment)
+SERVERS = {
+    'dev': ([sys.executable, 'app.py'], {'FLASK_DEBUG': 'False'}),
+    'gunicorn-1x32': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                      {'WEB_WORKERS': '1', 'WEB_THREADS': '32'}),
+    'gunicorn-4x8': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                     {'WEB_WORKERS': '4', 'WEB_THREADS': '8'}),
+    # An empty SHARED_STATE_DIR turns sharing off: every worker runs its own wallet commands
+    'gunicorn-4x8-unshared': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              {'WEB_WORKERS': '4', 'WEB_THREADS': '8', 'SHARED_STATE_DIR': ''}),
+}
+
+FAKE_WALLET = '''#!{python}
+import sys, time
+with open({calls!r}, 'a') as f:
+    f.write(' '.join(sys.argv[1:2]) + '\\n')
+command = sys.argv[1] if len(sys.argv) > 1 else ''
+time.sleep({delay})
+if command == 'list-notes':
+    sys.stdout.write(open({corpus!r}).read())
+elif command == 'list-active-addresses':
+    print('Addresses -- Signing')
+    print('- Address: BENCHSIGNER')
+    print('- Version: 1')
+elif command == 'list-master-addresses':
+    print('- Address: BENCHSIGNER (active)')
+    print('- Version: 1')
+'''
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def write_fake_wallet(directory, corpus, delay):
+    calls = os.path.join(directory, 'calls.log')
+    path = os.path.join(directory, 'nockchain-wallet')
+    with open(path, 'w') as f:
+        f.write(FAKE_WALLET.format(python=sys.executable, calls=calls, delay=delay, corpus=corpus))
+    os.chmod(path, 0o755)
+    return calls
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/wallet-info')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_clients(port, clients, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine, failed, i = [], 0, offset
+        while time.monotonic() < stop_at:
+            path = ENDPOINTS[i % len(ENDPOINTS)]
+            i += 1
+            if i % REQUESTS_PER_CONNECTION == 0:
+                conn.close()
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                continue
+            mine.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def bench_server(name, args, workdir):
+    command, extra_env = SERVERS[name]
+    if name != 'dev' and shutil.which('gunicorn') is None:
+        print(f"{name:<22} skipped: gunicorn is not installed")
+        return
+
+    bench_dir = tempfile.mkdtemp(prefix=f'serving-bench-{name}-', dir=workdir)
+    calls = write_fake_wallet(bench_dir, os.path.join(CORPUS_DIR, f'{args.corpus}.txt'), args.cli_delay)
+    port = free_port()
+    env = dict(
+        os.environ,
+        PATH=f"{bench_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        FLASK_HOST='127.0.0.1',
+        FLASK_PORT=str(port),
+        WALLET_EXECUTOR='local',
+        NOCKCHAIN_WALLET_HOST='',
+        HISTORY_DB=os.path.join(bench_dir, 'history.db'),
+        BALANCE_CACHE_TTL=str(args.cache_ttl),
+        SYNC_WORKER_ENABLED='False',
+        SHARED_STATE_DIR=os.path.join(bench_dir, 'shared'),
+    )
+    env.update(extra_env)
+
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_up(port):
+            print(f"{name:<22} skipped: server did not start")
+            return
+        open(calls, 'w').close()  # Count only the calls made under load
+        latencies, errors = run_clients(port, args.clients, args.duration)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    with open(calls) as f:
+        cli_runs = sum(1 for _ in f)
+    print(f"{name:<22} {len(latencies) / args.duration:>9.0f} {percentile(latencies, 50):>9.1f} "
+          f"{percentile(latencies, 95):>9.1f} {percentile(latencies, 99):>9.1f} {errors:>7} {cli_runs:>9}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help="seconds of load per server")
+    parser.add_argument('--cli-delay', type=float, default=0.2, help="seconds each wallet command takes")
+    parser.add_argument('--cache-ttl', type=float, default=2, help="BALANCE_CACHE_TTL for the run")
+    parser.add_argument('--corpus', default='mixed_v0_v1', help="list-notes output from benchmarks/corpus")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients x {args.duration:g}s, wallet commands take {args.cli_delay:g}s, "
+          f"balance TTL {args.cache_ttl:g}s")
+    print(f"{'server':<22} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'cli runs':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.servers.split(','):
+            bench_server(name.strip(), args, workdir)
@@ -0,0 +1,158 @@
+"""Snapshot cache with TTL and stale-while-revalidate, optionally shared between processes."""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """Hold the last good result of an expensive loader.
+
+    `get()` answers from the cached snapshot right away. Once the snapshot is
+    older than `ttl` seconds a background refresh is started and the stale
+    snapshot keeps being served until it completes; only an empty cache
+    blocks on the loader. Results rejected by `is_valid` (e.g. CLI errors)
+    are returned to the caller but never cached. With `ttl=None` the snapshot
+    never goes stale and only `invalidate()` replaces it.
+
+    When something else keeps the cache fresh (the background sync worker),
+    set `refresher` to a callable that asks it for a refresh; stale reads
+    then call it instead of starting their own refresh thread.
+
+    With `shared` (a shared_state.SharedSnapshot) the cache cooperates with
+    the other server processes: loads reuse a snapshot another process
+    stored within the TTL, refresh() always runs the loader, and
+    invalidate() reaches every process.
+    """
+
+    def __init__(self, name, loader, ttl, is_valid=None, refresher=None, shared=None):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.is_valid = is_valid or (lambda value: value is not None)
+        self.refresher = refresher
+        self.shared = shared
+        self._shared_generation = shared.generation() if shared else None
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._refreshing = False
+        # Bumped on invalidate() so in-flight loads started before a
+        # mutation never overwrite the cache with pre-mutation data
+        self._generation = 0
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations": 0
+        }
+
+    def get(self):
+        """Return (value, age_seconds), loading synchronously only on a miss."""
+        self._check_shared_generation()
+        with self._lock:
+            if self._value is not None:
+                age = time.monotonic() - self._loaded_at
+                if self.ttl is None or age < self.ttl:
+                    self._stats["hits"] += 1
+                    return self._value, age
+
+                self._stats["stale_hits"] += 1
+                if self.refresher is not None:
+                    self.refresher()
+                elif not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_in_background,
+                        args=(self._generation,),
+                        name=f"{self.name}-cache-refresh",
+                        daemon=True
+                    ).start()
+                return self._value, age
+
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        return self._load(generation)
+
+    def peek(self):
+        """Return (value, age_seconds) without loading or counting a lookup; (None, None) if empty."""
+        with self._lock:
+            if self._value is None:
+                return None, None
+            return self._value, time.monotonic() - self._loaded_at
+
+    def refresh(self):
+        """Load a fresh value synchronously, store it if valid and return it."""
+        with self._lock:
+            generation = self._generation
+        return self._load(generation, force=True)[0]
+
+    def invalidate(self):
+        """Drop the snapshot so the next get() loads fresh data."""
+        shared_generation = self.shared.invalidate() if self.shared is not None else None
+        with self._lock:
+            if shared_generation is not None:
+                self._shared_generation = shared_generation
+            self._value = None
+            self._loaded_at = None
+            self._generation += 1
+            self._stats["invalidations"] += 1
+        logger.info(f"{self.name} cache invalidated")
+
+    def stats(self):
+        """Return the cache counters and the current snapshot age."""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+            stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else None
+            stats["ttl_seconds"] = self.ttl
+            stats["age_seconds"] = round(time.monotonic() - self._loaded_at, 3) if self._value is not None else None
+            stats["refreshing"] = self._refreshing
+        return stats
+
+    def _check_shared_generation(self):
+        # Another process invalidated the snapshot: drop ours too
+        if self.shared is None:
+            return
+        shared_generation = self.shared.generation()
+        with self._lock:
+            if shared_generation != self._shared_generation:
+                self._shared_generation = shared_generation
+                self._value = None
+                self._loaded_at = None
+                self._generation += 1
+                self._stats["invalidations"] += 1
+
+    def _load(self, generation, force=False):
+        """Load (or reuse a shared snapshot), store it if valid; return (value, age)."""
+        if self.shared is not None:
+            value, age = self.shared.load(self.loader, self.is_valid, max_age=self.ttl, force=force)
+        else:
+            value, age = self.loader(), 0.0
+        if self.is_valid(value):
+            with self._lock:
+                if generation == self._generation:
+                    self._value = value
+                    self._loaded_at = time.monotonic() - age
+        return value, age
+
+    def _refresh_in_background(self, generation):
+        try:
+            with self._lock:
+                self._stats["refreshes"] += 1
+            value, _ = self._load(generation)
+            if not self.is_valid(value):
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+                logger.warning(f"{self.name} cache refresh failed, keeping stale snapshot")
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+            logger.error(f"{self.name} cache refresh error: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
@@ -0,0 +1,241 @@
+"""Coin selection: pick which notes fund a transaction.
+
+Strategies (see STRATEGIES):
+- `greedy`: largest notes first until the target is covered; never fails
+  on a solvable target and is the fallback for every other strategy.
+- `bnb`: branch-and-bound search for a set whose change is at most
+  `tolerance` nick (an exact match by default), so no change output is left.
+- `min-inputs`: the fewest possible notes, and among those the set with the
+  least change.
+- `min-change`: the least change whatever the number of notes (optionally
+  capped with `max_inputs`).
+- `auto` (default): `bnb` limited to AUTO_EXTRA_INPUTS more notes than the
+  minimum (an exact match made of dust is not worth it), then `min-inputs`
+  when no such match exists. Each step gets half of the time budget.
+
+Searches start from the greedy solution and only ever replace it with a
+better one, and they stop at the `time_budget` deadline: a search that runs
+out of time returns the best set found so far, at worst the greedy one.
+`max_inputs` is a hard cap for every strategy: the greedy set has the fewest
+notes possible, so when it is over the cap no set fits and `select_notes`
+raises TooManyInputs rather than returning a larger set.
+Fewer inputs keep `create-tx`/`sign-tx` fast and the `--names` argument short.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_BUDGET = 0.1  # Seconds
+AUTO_EXTRA_INPUTS = 2
+# Checking the clock on every step would slow the search down noticeably
+CLOCK_CHECK_STEPS = 1024
+
+
+class InsufficientFunds(ValueError):
+    """The notes cannot cover the target."""
+
+    def __init__(self, needed, available):
+        self.needed = needed
+        self.available = available
+        super().__init__(f"Insufficient funds. Need {needed} nick, have {available} nick.")
+
+
+class TooManyInputs(ValueError):
+    """No set of at most max_inputs notes covers the target."""
+
+    def __init__(self, needed_inputs, max_inputs):
+        self.needed_inputs = needed_inputs
+        self.max_inputs = max_inputs
+        super().__init__(f"Covering the amount takes at least {needed_inputs} notes, "
+                         f"more than the maximum of {max_inputs}.")
+
+
+class Selection:
+    """Notes chosen for a target, and how they were found."""
+
+    def __init__(self, notes, target, strategy, elapsed, timed_out=False, fallback=False):
+        self.notes = notes
+        self.target = target
+        self.total = sum(note['value'] for note in notes)
+        self.change = self.total - target
+        self.strategy = strategy
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+        self.fallback = fallback
+
+    def describe(self):
+        return {
+            "strategy": self.strategy,
+            "inputs": len(self.notes),
+            "total_nick": self.total,
+            "change_nick": self.change,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "timed_out": self.timed_out,
+            "fallback": self.fallback
+        }
+
+
+def _greedy(values, target):
+    """Indexes of the largest values (values sorted descending) covering target."""
+    total = 0
+    for count, value in enumerate(values, 1):
+        total += value
+        if total >= target:
+            return list(range(count))
+    return None
+
+
+def _search(values, target, best, stop_change, max_inputs, deadline):
+    """Depth-first branch and bound over values (sorted descending).
+
+    Looks for the covering set with the smallest total (then the fewest
+    inputs), starting from `best` (a list of indexes). Returns (indexes,
+    timed_out); stops early once the change is at most `stop_change`.
+    """
+    count = len(values)
+    # prefix[i] = sum(values[:i]); sum(values[i:j]) = prefix[j] - prefix[i]
+    prefix = [0]
+    for value in values:
+        prefix.append(prefix[-1] + value)
+    # skip[i] = first index after i holding a smaller value
+    skip = [count] * count
+    for i in range(count - 2, -1, -1):
+        skip[i] = skip[i + 1] if values[i] == values[i + 1] else i + 1
+
+    best_total = sum(values[i] for i in best)
+    if best_total - target <= stop_change:
+        return best, False
+
+    selected = []
+    total = 0
+    index = 0
+    steps = 0
+    while True:
+        steps += 1
+        if steps % CLOCK_CHECK_STEPS == 0 and time.monotonic() > deadline:
+            return best, True
+
+        if total >= target:
+            if total < best_total or (total == best_total and len(selected) < len(best)):
+                best, best_total = list(selected), total
+                if best_total - target <= stop_change:
+                    return best, False
+            backtrack = True
+        else:
+            slots = count - index
+            if max_inputs is not None:
+                slots = min(slots, max_inputs - len(selected))
+            # Even the largest remaining values cannot reach the target
+            backtrack = slots <= 0 or total + prefix[index + slots] - prefix[index] < target
+
+        if backtrack:
+            if not selected:
+                return best, False
+            # Leave the last included value out and move on to smaller ones,
+            # skipping equal values: they would repeat the same subtree
+            last = selected.pop()
+            total -= values[last]
+            index = skip[last]
+        elif total + values[index] > best_total:
+            # Cannot beat the best set with this value; try the smaller ones
+            index += 1
+        else:
+            selected.append(index)
+            total += values[index]
+            index += 1
+
+
+def select_greedy(values, target, deadline, tolerance=0, max_inputs=None):
+    return _greedy(values, target), False
+
+
+def select_bnb(values, target, deadline, tolerance=0, max_inputs=None):
+    greedy = _greedy(values, target)
+    if max_inputs is not None and len(greedy) > max_inputs:
+        return None, False
+    best, timed_out = _search(values, target, greedy, tolerance, max_inputs, deadline)
+    if sum(values[i] for i in best) - target > tolerance:
+        return None, timed_out
+    return best, timed_out
+
+
+def select_min_inputs(values, target, deadline, tolerance=0, max_inputs=None):
+    # The k largest notes are the best k-note set, so greedy finds the
+    # minimum count; the search only lowers the change at that count
+    greedy = _greedy(values, target)
+    return _search(values, target, greedy, 0, len(greedy), deadline)
+
+
+def select_min_change(values, target, deadline, tolerance=0, max_inputs=None):
+    greedy = _greedy(values, target)
+    if max_inputs is not None and len(greedy) > max_inputs:
+        return None, False
+    return _search(values, target, greedy, 0, max_inputs, deadline)
+
+
+def select_auto(values, target, deadline, tolerance=0, max_inputs=None):
+    now = time.monotonic()
+    limit = len(_greedy(values, target)) + AUTO_EXTRA_INPUTS
+    if max_inputs is not None:
+        limit = min(limit, max_inputs)
+    best, bnb_timed_out = select_bnb(values, target, now + (deadline - now) / 2, tolerance, limit)
+    if best is not None:
+        return best, bnb_timed_out
+    best, timed_out = select_min_inputs(values, target, deadline, tolerance, max_inputs)
+    return best, timed_out or bnb_timed_out
+
+
+# name -> fn(values sorted descending, target, deadline, tolerance, max_inputs)
+#   -> (indexes or None, timed_out)
+STRATEGIES = {
+    'auto': select_auto,
+    'bnb': select_bnb,
+    'min-inputs': select_min_inputs,
+    'min-change': select_min_change,
+    'greedy': select_greedy,
+}
+
+
+def select_notes(notes, target, strategy='auto', time_budget=DEFAULT_TIME_BUDGET, tolerance=0, max_inputs=None):
+    """Choose notes whose values cover `target` nick; return a Selection.
+
+    Raises InsufficientFunds when all notes together are not enough,
+    TooManyInputs when no set within max_inputs covers the target and
+    ValueError for an unknown strategy. When the strategy finds no set (e.g.
+    `bnb` without an exact match) the greedy set is used and the Selection
+    is marked as a fallback.
+    """
+    try:
+        select = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown coin selection strategy: {strategy}. "
+                         f"Expected one of: {', '.join(STRATEGIES)}") from None
+
+    start = time.monotonic()
+    candidates = sorted((note for note in notes if note['value'] > 0), key=lambda note: note['value'], reverse=True)
+    values = [note['value'] for note in candidates]
+    available = sum(values)
+    if available < target:
+        raise InsufficientFunds(target, available)
+    if max_inputs is not None:
+        needed_inputs = len(_greedy(values, target))
+        if needed_inputs > max_inputs:
+            raise TooManyInputs(needed_inputs, max_inputs)
+
+    indexes, timed_out = select(values, target, start + time_budget, tolerance, max_inputs)
+    fallback = indexes is None
+    if fallback:
+        indexes = _greedy(values, target)
+
+    selection = Selection(
+        [candidates[i] for i in indexes],
+        target,
+        strategy,
+        time.monotonic() - start,
+        timed_out=timed_out,
+        fallback=fallback
+    )
+    if timed_out:
+        logger.info(f"Coin selection ({strategy}) hit its {time_budget}s budget, using the best set found")
+    return selection
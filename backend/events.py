@@ -0,0 +1,205 @@
+"""In-process event bus behind the `/api/events` server-sent events stream.
+
+The backend publishes what it discovers - note-set deltas from syncs,
+transaction status transitions, active address switches - and every open
+stream receives it, so open dashboards cost nothing beyond the one sync the
+worker runs anyway.
+
+Events get increasing ids and the last `history` of them are kept: a client
+reconnecting with `Last-Event-ID` gets what it missed. When that id is no
+longer kept, or a client reads so slowly that its queue fills up, the
+client gets a `resync` event instead and should reload its state.
+
+With several worker processes, `follow()` makes the bus go through the
+shared event log (shared_state.SharedEventLog): `publish()` appends there,
+and every process delivers what the log holds, checking it every
+RELAY_INTERVAL seconds, so a stream gets the events of all processes under
+ids that are the same in each of them.
+
+Every open stream holds a server thread, so `StreamLimit` caps how many
+streaming responses are open at once; past the cap they are refused (503)
+and the remaining threads stay free for ordinary requests and probes.
+"""
+import collections
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the shared event log for other processes' events
+RELAY_INTERVAL = 0.5
+
+
+def sse_event(event, payload, event_id=None):
+    """Format one server-sent event."""
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class Subscription:
+    """One client's queue of (id, event, payload) tuples."""
+
+    def __init__(self, bus, queue_size):
+        self._bus = bus
+        self._queue_size = queue_size
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._overflowed = False
+
+    def _put(self, item):
+        with self._cond:
+            if len(self._items) >= self._queue_size:
+                # Too slow a reader: drop the backlog and ask it to reload
+                self._items.clear()
+                self._overflowed = True
+            else:
+                self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Return the next (id, event, payload), or None after `timeout` seconds."""
+        with self._cond:
+            if not self._items and not self._overflowed:
+                self._cond.wait(timeout)
+            if self._overflowed:
+                self._overflowed = False
+                return None, 'resync', {"reason": "client too slow, events were dropped"}
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+
+class EventBus:
+    """Fan published events out to every subscription."""
+
+    def __init__(self, history=256, queue_size=256):
+        self._lock = threading.Lock()
+        self._history = collections.deque(maxlen=history)
+        self._queue_size = queue_size
+        self._subscriptions = set()
+        self._next_id = 1
+        self._published = 0
+        self._shared_log = None
+        self._relay_lock = threading.Lock()
+        self._relay_stamp = None
+
+    def follow(self, shared_log):
+        """Publish through shared_log and deliver every process's events from it."""
+        self._shared_log = shared_log
+        self._relay()  # Earlier events become the history for Last-Event-ID
+        threading.Thread(target=self._relay_forever, name='event-relay', daemon=True).start()
+
+    def publish(self, event, payload):
+        """Send an event to every subscriber; return its id."""
+        if self._shared_log is not None:
+            try:
+                event_id = self._shared_log.append(event, payload)
+            except OSError as e:
+                logger.error(f"Cannot store event {event} in the shared log: {e}")
+                return None
+            self._relay()
+            return event_id
+        return self._deliver(None, event, payload)
+
+    def _deliver(self, event_id, event, payload):
+        """Send an event to every subscriber under event_id (None: the next id)."""
+        with self._lock:
+            if event_id is None:
+                event_id = self._next_id
+            self._next_id = event_id + 1
+            self._published += 1
+            item = (event_id, event, payload)
+            self._history.append(item)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._put(item)
+        logger.debug(f"Event {event_id} ({event}) sent to {len(subscriptions)} subscriber(s)")
+        return event_id
+
+    def _relay(self):
+        """Deliver the shared log's events this process has not delivered yet."""
+        with self._relay_lock:
+            stamp = self._shared_log.stamp()
+            if stamp == self._relay_stamp:
+                return
+            self._relay_stamp = stamp
+            with self._lock:
+                last_id = self._next_id - 1
+            for item in self._shared_log.read_after(last_id):
+                self._deliver(*item)
+
+    def _relay_forever(self):
+        while True:
+            time.sleep(RELAY_INTERVAL)
+            try:
+                self._relay()
+            except Exception as e:
+                logger.error(f"Event relay error: {e}")
+
+    def subscribe(self, last_event_id=None):
+        """Open a subscription, replaying the events after last_event_id if given."""
+        if self._shared_log is not None:
+            # Ids other processes handed out must not look like future ones
+            self._relay()
+        subscription = Subscription(self, self._queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is None:
+                return subscription
+            try:
+                last_event_id = int(last_event_id)
+            except (TypeError, ValueError):
+                last_event_id = -1
+            oldest = self._history[0][0] if self._history else self._next_id
+            if last_event_id < oldest - 1 or last_event_id >= self._next_id:
+                # Missed events are gone (or the id is from before a restart)
+                subscription._put((None, 'resync', {"reason": "missed events are no longer available"}))
+            else:
+                for item in self._history:
+                    if item[0] > last_event_id:
+                        subscription._put(item)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscriptions),
+                "published": self._published,
+                "last_event_id": self._next_id - 1
+            }
+
+
+class StreamLimit:
+    """Count open streaming responses and refuse new ones past `limit`."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._open = 0
+        self._refused = 0
+
+    def acquire(self):
+        """Take a slot for a new stream; return False when all are in use."""
+        with self._lock:
+            if self._open >= self.limit:
+                self._refused += 1
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"open": self._open, "limit": self.limit, "refused": self._refused}
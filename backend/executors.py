@@ -0,0 +1,799 @@
+"""Executors that run nockchain-wallet subcommands.
+
+- `SubprocessExecutor`: forks the CLI, either the local binary or through
+  `docker exec` (one Go docker client process per command).
+- `DockerApiExecutor`: talks to the Docker Engine API over the unix socket
+  directly (exec create, exec start with a demultiplexed attach stream, exec
+  inspect), reusing pooled keep-alive connections for the JSON calls.
+
+Both return `subprocess.CompletedProcess` objects and raise
+`CalledProcessError`/`TimeoutExpired` like `subprocess.run(check=True)`, so
+callers do not care which one is configured. `probe()` tells whether the
+wallet can be reached without running a wallet command.
+
+- `RecordingExecutor` wraps another executor and appends every command
+  (argv with secrets redacted, stdout, stderr, exit code, wall time) to a
+  JSON-lines file.
+- `ReplayExecutor` answers commands from such a recording, at the recorded
+  speed or accelerated, without any wallet.
+
+Commands run inside a `cancel_scope()` can be cancelled from another thread:
+`CancelScope.cancel()` kills the local process (or drops the Docker API
+attach connection) and the command raises `Cancelled`. The Engine API
+cannot signal an exec, so Docker API commands run under `sh`, which prints
+its in-container PID before exec'ing the wallet: a command given up on
+(timeout, cancellation, stream closed early) is killed with a second exec
+running `kill -9 <pid>`, and its scheduler slot is only released once the
+wallet process is gone, or after the command's remaining timeout plus
+EXEC_STOP_GRACE seconds if it cannot be stopped.
+"""
+import codecs
+import contextlib
+import fcntl
+import http.client
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between exec inspections while waiting for an abandoned exec to end,
+# and how long past its caller's timeout to wait before giving up on it
+EXEC_STOP_POLL_INTERVAL = 0.5
+EXEC_STOP_GRACE = 10
+# Prints the shell's PID (the wallet's, once exec'd) as the first stdout line
+EXEC_PID_WRAPPER = ['sh', '-c', 'echo $$; exec "$@"', 'sh']
+
+STDOUT_STREAM = 1
+STDERR_STREAM = 2
+
+
+class Cancelled(Exception):
+    """The wallet command was killed by CancelScope.cancel()."""
+
+
+class CancelScope:
+    """Cancellation handle for the wallet commands run by one thread."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._kills = set()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            kills = list(self._kills)
+        for kill in kills:
+            try:
+                kill()
+            except OSError:
+                pass
+
+    @contextlib.contextmanager
+    def track(self, kill):
+        """Register kill() for the duration of a command; raise Cancelled if cancelled."""
+        with self._lock:
+            if self.cancelled:
+                raise Cancelled("wallet command cancelled")
+            self._kills.add(kill)
+        try:
+            yield
+        except Exception:
+            # Whatever the killed command failed with, report the cancellation
+            if self.cancelled:
+                raise Cancelled("wallet command cancelled")
+            raise
+        finally:
+            with self._lock:
+                self._kills.discard(kill)
+        if self.cancelled:
+            raise Cancelled("wallet command cancelled")
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def cancel_scope(scope):
+    """Make commands run by the current thread cancellable through scope."""
+    previous = getattr(_local, 'scope', None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+
+def _tracked(kill):
+    scope = getattr(_local, 'scope', None)
+    return scope.track(kill) if scope is not None else contextlib.nullcontext()
+
+
+class SubprocessExecutor:
+    """Run the wallet CLI as a child process.
+
+    probe() runs probe_cmd if given (it must print `true`, like
+    `docker inspect --format {{.State.Running}}`), otherwise it looks the
+    command up on PATH.
+    """
+
+    def __init__(self, name, prefix, probe_cmd=None):
+        self.name = name
+        self.prefix = list(prefix)
+        self.probe_cmd = list(probe_cmd) if probe_cmd else None
+
+    def run(self, args, timeout=None, check=True):
+        cmd = self.prefix + list(args)
+        # Same as subprocess.run(capture_output=True, text=True), but the
+        # process stays reachable for cancellation
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+            with _tracked(process.kill):
+                try:
+                    stdout, stderr = process.communicate(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.communicate()
+                    raise
+        if check and process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def stream(self, args, timeout=None):
+        return SubprocessStream(self.prefix + list(args), timeout)
+
+    def describe(self):
+        return {"executor": self.name, "command": " ".join(self.prefix)}
+
+    def probe(self, timeout=5):
+        """Return {"reachable", "detail"} without running a wallet command."""
+        if self.probe_cmd is None:
+            path = shutil.which(self.prefix[0])
+            return {"reachable": path is not None, "detail": path or f"{self.prefix[0]} not found on PATH"}
+        try:
+            result = subprocess.run(self.probe_cmd, capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return {"reachable": False, "detail": str(e)}
+        reachable = result.returncode == 0 and result.stdout.strip() == 'true'
+        return {"reachable": reachable, "detail": (result.stdout or result.stderr).strip()[:200]}
+
+
+class SubprocessStream:
+    """Iterate over the stdout lines of a running wallet process.
+
+    After iteration `returncode` and `stderr` are set; `timed_out` tells
+    whether the process was killed by the timeout. Closing the stream early
+    (e.g. the HTTP client went away) kills the process.
+    """
+
+    def __init__(self, cmd, timeout):
+        self.cmd = cmd
+        self.returncode = None
+        self.stderr = ''
+        self.timed_out = False
+        self._stderr_file = tempfile.TemporaryFile(mode='w+')
+        self._process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr_file,
+            text=True,
+            bufsize=1
+        )
+        self._timer = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self._kill_on_timeout)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _kill_on_timeout(self):
+        self.timed_out = True
+        self._process.kill()
+
+    def __iter__(self):
+        for line in self._process.stdout:
+            yield line.rstrip('\n')
+        self.returncode = self._process.wait()
+        self._stderr_file.seek(0)
+        self.stderr = self._stderr_file.read()
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._process.stdout.close()
+        self._stderr_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DockerApiError(Exception):
+    """Non-2xx answer from the Docker Engine API."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        super().__init__(f"Docker API error {status}: {body[:200]!r}")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix domain socket."""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        # http.client drops self.sock once a `Connection: close` response
+        # starts; keep a handle so the stream can still be shut down
+        self.sock = self.unix_sock = sock
+
+
+def _read_exact(response, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = response.read(size - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    return bytes(buf)
+
+
+def _iter_frames(response):
+    """Demultiplex a non-TTY attach stream into (stream type, payload) frames.
+
+    Each frame is an 8-byte header - stream type, 3 padding bytes, big-endian
+    payload size - followed by the payload.
+    """
+    while True:
+        header = _read_exact(response, 8)
+        if len(header) < 8:
+            return
+        stream_type = header[0]
+        size = struct.unpack('>I', header[4:])[0]
+        yield stream_type, _read_exact(response, size)
+
+
+def _iter_output_frames(response, pids):
+    """_iter_frames() without the PID line of EXEC_PID_WRAPPER, appended to pids."""
+    frames = _iter_frames(response)
+    head = b''
+    for stream_type, payload in frames:
+        if stream_type == STDERR_STREAM:
+            yield stream_type, payload
+            continue
+        head += payload
+        if b'\n' in head:
+            line, rest = head.split(b'\n', 1)
+            try:
+                pids.append(int(line))
+            except ValueError:
+                logger.warning(f"Unexpected exec PID line: {line[:50]!r}")
+            if rest:
+                yield STDOUT_STREAM, rest
+            break
+    yield from frames
+
+
+class DockerApiExecutor:
+    """Run the wallet CLI inside a container through the Docker Engine API."""
+
+    name = 'docker-api'
+
+    def __init__(self, container, socket_path='/var/run/docker.sock', binary='nockchain-wallet', pool_size=4):
+        self.container = container
+        self.socket_path = socket_path
+        self.binary = binary
+        self.pool_size = pool_size
+        self._pool = []
+        self._pool_lock = threading.Lock()
+
+    def describe(self):
+        return {"executor": self.name, "container": self.container, "socket": self.socket_path}
+
+    def probe(self, timeout=5):
+        """Return {"reachable", "detail"}: whether the wallet container is running."""
+        try:
+            info = self._api('GET', f'/containers/{self.container}/json')
+        except (OSError, http.client.HTTPException, DockerApiError) as e:
+            return {"reachable": False, "detail": str(e)[:200]}
+        state = info.get('State') or {}
+        return {"reachable": bool(state.get('Running')), "detail": state.get('Status')}
+
+    def _acquire(self):
+        with self._pool_lock:
+            if self._pool:
+                return self._pool.pop()
+        return UnixHTTPConnection(self.socket_path, timeout=30)
+
+    def _release(self, conn):
+        with self._pool_lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append(conn)
+                return
+        conn.close()
+
+    def _api(self, method, path, body=None):
+        """Make a JSON API call on a pooled keep-alive connection."""
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Idle keep-alive connection closed by the daemon; retry on a fresh one
+                conn.close()
+                if attempt:
+                    raise
+                continue
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            if response.status >= 400:
+                raise DockerApiError(response.status, data)
+            return json.loads(data) if data else None
+
+    def _start(self, args, timeout):
+        """Create and start an exec instance; return (exec id, connection, response)."""
+        created = self._api('POST', f'/containers/{self.container}/exec', {
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Tty": False,
+            "Cmd": EXEC_PID_WRAPPER + [self.binary] + list(args)
+        })
+        exec_id = created['Id']
+
+        # The attach stream hijacks its connection, so it never comes from the pool
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout)
+        conn.request(
+            'POST',
+            f'/exec/{exec_id}/start',
+            body=json.dumps({"Detach": False, "Tty": False}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        response = conn.getresponse()
+        if response.status >= 400:
+            data = response.read()
+            conn.close()
+            raise DockerApiError(response.status, data)
+        return exec_id, conn, response
+
+    def _exit_code(self, exec_id):
+        # The stream can end a moment before the daemon records the exit code
+        for _ in range(100):
+            info = self._api('GET', f'/exec/{exec_id}/json')
+            if not info.get('Running'):
+                return info.get('ExitCode')
+            time.sleep(0.005)
+        return info.get('ExitCode')
+
+    def _stop(self, exec_id, pids, wait=None):
+        """Kill an exec whose output is no longer read and return once it ended.
+
+        pids holds its in-container PID when the wrapper's line was read;
+        without it (or when the kill exec fails) the host PID is killed if
+        visible from here. Gives up after `wait` plus EXEC_STOP_GRACE
+        seconds; returns whether the exec ended.
+        """
+        deadline = time.monotonic() + (wait or 0) + EXEC_STOP_GRACE
+        tried_kill = False
+        while True:
+            try:
+                info = self._api('GET', f'/exec/{exec_id}/json')
+            except (OSError, http.client.HTTPException, DockerApiError) as e:
+                logger.warning(f"Cannot inspect abandoned exec {exec_id[:12]}: {e}")
+                return False
+            if not info.get('Running'):
+                return True
+            if not tried_kill:
+                tried_kill = True
+                if not ((pids and self._kill_in_container(pids[0])) or self._kill(info.get('Pid'))):
+                    logger.warning(f"Cannot kill exec {exec_id[:12]}, waiting for it to exit")
+            if time.monotonic() >= deadline:
+                logger.error(f"Exec {exec_id[:12]} still running, giving up on it")
+                return False
+            time.sleep(EXEC_STOP_POLL_INTERVAL)
+
+    def _kill_in_container(self, pid):
+        """SIGKILL an in-container PID with a second exec; return whether it ran."""
+        try:
+            created = self._api('POST', f'/containers/{self.container}/exec', {
+                "AttachStdout": False,
+                "AttachStderr": False,
+                "Tty": False,
+                "Cmd": ['kill', '-9', str(pid)]
+            })
+            self._api('POST', f'/exec/{created["Id"]}/start', {"Detach": True, "Tty": False})
+        except (OSError, http.client.HTTPException, DockerApiError) as e:
+            logger.warning(f"Cannot run kill in {self.container}: {e}")
+            return False
+        return True
+
+    def _kill(self, pid):
+        """SIGKILL pid if it is our wallet binary as seen from here; return whether it was."""
+        # The daemon reports host PIDs: in another PID namespace the same
+        # number may be an unrelated process, so check what it runs first
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                argv0 = f.read().split(b'\0')[0]
+        except (OSError, TypeError):
+            return False
+        if os.path.basename(os.fsdecode(argv0)) != os.path.basename(self.binary):
+            return False
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return True
+
+    def run(self, args, timeout=None, check=True):
+        cmd = [self.binary] + list(args)
+        exec_id, conn, response = self._start(args, timeout)
+        stdout, stderr = [], []
+        pids = []
+        finished = False
+        deadline = time.monotonic() + timeout if timeout else None
+        # Cancelling drops the attach connection so the caller stops waiting;
+        # _stop() then gets rid of the exec itself
+        try:
+            with _tracked(lambda: conn.unix_sock.shutdown(socket.SHUT_RDWR)):
+                for stream_type, payload in _iter_output_frames(response, pids):
+                    (stderr if stream_type == STDERR_STREAM else stdout).append(payload)
+                    if deadline and time.monotonic() > deadline:
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+            finished = True
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        finally:
+            conn.close()
+            if not finished:
+                self._stop(exec_id, pids, deadline and max(0, deadline - time.monotonic()))
+
+        returncode = self._exit_code(exec_id)
+        out = b''.join(stdout).decode('utf-8', errors='replace').replace('\r\n', '\n')
+        err = b''.join(stderr).decode('utf-8', errors='replace').replace('\r\n', '\n')
+        if check and returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, out, err)
+        return subprocess.CompletedProcess(cmd, returncode, out, err)
+
+    def stream(self, args, timeout=None):
+        return DockerApiStream(self, args, timeout)
+
+
+class DockerApiStream:
+    """Iterate over stdout lines of an exec instance as frames arrive.
+
+    Same interface as SubprocessStream. Closing before the output ended
+    (or after a timeout) drops the attach connection and stops the exec
+    with DockerApiExecutor._stop(), waiting at most the remaining timeout
+    plus EXEC_STOP_GRACE seconds.
+    """
+
+    def __init__(self, executor, args, timeout):
+        self.returncode = None
+        self.stderr = ''
+        self.timed_out = False
+        self._executor = executor
+        self._deadline = time.monotonic() + timeout if timeout else None
+        self._pids = []
+        self._exec_id, self._conn, self._response = executor._start(args, timeout)
+
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        stderr = []
+        pending = ''
+        deadline = self._deadline
+        try:
+            for stream_type, payload in _iter_output_frames(self._response, self._pids):
+                if stream_type == STDERR_STREAM:
+                    stderr.append(payload)
+                    continue
+                pending += decoder.decode(payload)
+                *lines, pending = pending.split('\n')
+                for line in lines:
+                    yield line.rstrip('\r')
+                if deadline and time.monotonic() > deadline:
+                    self.timed_out = True
+                    return
+        except socket.timeout:
+            self.timed_out = True
+            return
+
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+        self.stderr = b''.join(stderr).decode('utf-8', errors='replace')
+        self.returncode = self._executor._exit_code(self._exec_id)
+
+    def close(self):
+        self._conn.close()
+        if self.returncode is None:
+            remaining = self._deadline and max(0, self._deadline - time.monotonic())
+            self._executor._stop(self._exec_id, self._pids, remaining)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Arguments followed by a secret, and commands whose output is one
+REDACTED = '[REDACTED]'
+SECRET_OPTIONS = {'--seedphrase'}
+SECRET_OUTPUT_COMMANDS = {'export-keys', 'show-seedphrase'}
+
+
+def redact_args(args):
+    """Return args with the values of SECRET_OPTIONS replaced by REDACTED."""
+    args = list(args)
+    for i, arg in enumerate(args[:-1]):
+        if arg in SECRET_OPTIONS:
+            args[i + 1] = REDACTED
+    return args
+
+
+class RecordingExecutor:
+    """Run commands with another executor and append them to a recording.
+
+    Each line of the recording is a JSON object: `time` (epoch seconds the
+    command started), `args` (redacted), `exit_code` (None after a timeout
+    or a stream closed early), `timed_out`, `duration`, `stdout`, `stderr`
+    and `tx_files`, the .tx files that appeared in tx_folder meanwhile (the
+    replay recreates them, as create-tx callers wait for them).
+    """
+
+    def __init__(self, inner, path, tx_folder='txs'):
+        self.inner = inner
+        self.path = path
+        self.tx_folder = tx_folder
+        self.name = inner.name
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return {**self.inner.describe(), "recording": self.path}
+
+    def probe(self, timeout=5):
+        return self.inner.probe(timeout)
+
+    def _tx_files(self):
+        try:
+            return set(name for name in os.listdir(self.tx_folder) if name.endswith('.tx'))
+        except FileNotFoundError:
+            return set()
+
+    def _write(self, args, started, start, tx_files_before, exit_code, timed_out, stdout, stderr):
+        # TimeoutExpired may carry bytes or None
+        stdout = stdout if isinstance(stdout, str) else ''
+        stderr = stderr if isinstance(stderr, str) else ''
+        entry = {
+            "time": round(started, 6),
+            "args": redact_args(args),
+            "exit_code": exit_code,
+            "timed_out": timed_out,
+            "duration": round(time.monotonic() - start, 6),
+            "stdout": REDACTED if args and args[0] in SECRET_OUTPUT_COMMANDS else stdout,
+            "stderr": stderr,
+            "tx_files": sorted(self._tx_files() - tx_files_before)
+        }
+        line = json.dumps(entry) + '\n'
+        # Other server processes may append to the same file
+        with self._lock, open(self.path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+
+    def run(self, args, timeout=None, check=True):
+        args = list(args)
+        started, start, tx_files = time.time(), time.monotonic(), self._tx_files()
+        try:
+            result = self.inner.run(args, timeout=timeout, check=check)
+        except subprocess.CalledProcessError as e:
+            self._write(args, started, start, tx_files, e.returncode, False, e.stdout, e.stderr)
+            raise
+        except subprocess.TimeoutExpired as e:
+            self._write(args, started, start, tx_files, None, True, e.stdout, e.stderr)
+            raise
+        self._write(args, started, start, tx_files, result.returncode, False, result.stdout, result.stderr)
+        return result
+
+    def stream(self, args, timeout=None):
+        return RecordingStream(self, list(args), self.inner.stream(args, timeout=timeout))
+
+
+class RecordingStream:
+    """Pass a stream's lines through and record the command when it is closed."""
+
+    def __init__(self, recorder, args, inner):
+        self._recorder = recorder
+        self._args = args
+        self._inner = inner
+        self._lines = []
+        self._started, self._start, self._tx_files = time.time(), time.monotonic(), recorder._tx_files()
+
+    @property
+    def returncode(self):
+        return self._inner.returncode
+
+    @property
+    def stderr(self):
+        return self._inner.stderr
+
+    @property
+    def timed_out(self):
+        return self._inner.timed_out
+
+    def __iter__(self):
+        for line in self._inner:
+            self._lines.append(line)
+            yield line
+
+    def close(self):
+        self._inner.close()
+        stdout = ''.join(line + '\n' for line in self._lines)
+        self._recorder._write(self._args, self._started, self._start, self._tx_files,
+                              self.returncode, self.timed_out, stdout, self.stderr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_recording(path):
+    """Return the entries of a recording in the order the commands started."""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry['time'])
+
+
+class ReplayExecutor:
+    """Answer wallet commands from a recording made by RecordingExecutor.
+
+    A command gets the next recorded run of the same (redacted) argv, or
+    failing that of the same subcommand, starting over once all were used:
+    create-tx answers with the recorded transaction names, so the sign-tx
+    and send-tx that follow match their recordings exactly. Each answer
+    takes the recorded duration divided by `speed` (0: no delay).
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, speed=1.0, tx_folder='txs'):
+        self.path = path
+        self.speed = speed
+        self.tx_folder = tx_folder
+        self.entries = load_recording(path)
+        self._by_args = {}
+        self._by_command = {}
+        for entry in self.entries:
+            self._by_args.setdefault(tuple(entry['args']), []).append(entry)
+            self._by_command.setdefault(entry['args'][0] if entry['args'] else '', []).append(entry)
+        self._next = {}
+        self._lock = threading.Lock()
+        self._stats = {"replayed": 0, "fallbacks": 0, "misses": 0}
+
+    def describe(self):
+        return {"executor": self.name, "recording": self.path, "entries": len(self.entries), "speed": self.speed}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def probe(self, timeout=5):
+        return {"reachable": True, "detail": f"{len(self.entries)} recorded commands"}
+
+    def _take(self, args):
+        """Next recorded entry for args, or None."""
+        key = tuple(redact_args(args))
+        with self._lock:
+            if key in self._by_args:
+                candidates, counter = self._by_args[key], ('args', key)
+            elif args and args[0] in self._by_command:
+                candidates, counter = self._by_command[args[0]], ('command', args[0])
+                self._stats["fallbacks"] += 1
+            else:
+                self._stats["misses"] += 1
+                return None
+            index = self._next.get(counter, 0)
+            self._next[counter] = index + 1
+            self._stats["replayed"] += 1
+            return candidates[index % len(candidates)]
+
+    def _wait(self, entry, timeout):
+        """Sleep for the entry's (scaled) duration; return True if timeout ran out first."""
+        delay = entry['duration'] / self.speed if self.speed else 0
+        expired = entry['timed_out'] or (timeout is not None and delay > timeout)
+        if timeout is not None:
+            delay = min(delay, timeout)
+        # Cancelling ends the wait early, like killing a process
+        wakeup = threading.Event()
+        with _tracked(wakeup.set):
+            wakeup.wait(delay)
+        return expired
+
+    def _create_tx_files(self, entry):
+        for name in entry['tx_files']:
+            os.makedirs(self.tx_folder, exist_ok=True)
+            path = os.path.join(self.tx_folder, name)
+            with open(path, 'a'):
+                pass
+            # Callers wait for the file's mtime to move, also when it exists
+            os.utime(path)
+
+    def run(self, args, timeout=None, check=True):
+        cmd = ['nockchain-wallet'] + list(args)
+        entry = self._take(list(args))
+        if entry is None:
+            if check:
+                raise subprocess.CalledProcessError(1, cmd, '', f"replay: no recording of {args[0]}\n")
+            return subprocess.CompletedProcess(cmd, 1, '', f"replay: no recording of {args[0]}\n")
+        if self._wait(entry, timeout):
+            raise subprocess.TimeoutExpired(cmd, timeout, entry['stdout'], entry['stderr'])
+        self._create_tx_files(entry)
+        if check and entry['exit_code']:
+            raise subprocess.CalledProcessError(entry['exit_code'], cmd, entry['stdout'], entry['stderr'])
+        return subprocess.CompletedProcess(cmd, entry['exit_code'], entry['stdout'], entry['stderr'])
+
+    def stream(self, args, timeout=None):
+        return ReplayStream(self, list(args), timeout)
+
+
+class ReplayStream:
+    """Same interface as SubprocessStream, fed from a recorded entry."""
+
+    def __init__(self, executor, args, timeout):
+        self.returncode = None
+        self.stderr = ''
+        self.timed_out = False
+        self._executor = executor
+        self._command = args[0] if args else ''
+        self._timeout = timeout
+        self._entry = executor._take(args)
+
+    def __iter__(self):
+        entry = self._entry
+        if entry is None:
+            self.returncode = 1
+            self.stderr = f"replay: no recording of {self._command}\n"
+            return
+        if self._executor._wait(entry, self._timeout):
+            self.timed_out = True
+            return
+        yield from entry['stdout'].splitlines()
+        self.returncode = entry['exit_code']
+        self.stderr = entry['stderr']
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,33 @@
+"""Gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Request handlers mostly wait on wallet processes, so one process with many
+threads (gthread) is the default: all threads share the snapshot caches,
+command coalescing, event bus and jobs. WEB_WORKERS > 1 adds processes for
+CPU-heavy work (large note sets, compression); they then share the caches
+and the wallet lock through SHARED_STATE_DIR (see shared_state.py), and
+relay events to each other's streams through it, but each keeps its own
+async jobs, so put a sticky load balancer in front or keep one worker if
+you poll job status.
+"""
+import os
+import tempfile
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5007)}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_WORKERS', 1))
+# Each open /api/events or streaming response holds a thread for its lifetime;
+# the app refuses streams past MAX_STREAMS (half of these by default) so the
+# rest always serve requests and health probes
+threads = int(os.getenv('WEB_THREADS', 32))
+# gthread workers heartbeat from their main loop, so this only catches a
+# stuck worker, not a long create-tx; keep it above the CLI timeouts anyway
+timeout = int(os.getenv('WEB_TIMEOUT', 180))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-' if os.getenv('WEB_ACCESS_LOG', 'False').lower() == 'true' else None
+# Not preloaded: every worker imports the app after the fork, so its
+# threads (tx watcher, job pool, sync worker) belong to that worker
+preload_app = False
+
+if workers > 1:
+    os.environ.setdefault('SHARED_STATE_DIR', os.path.join(tempfile.gettempdir(), 'nockchain-wallet-backend-state'))
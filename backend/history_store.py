@@ -0,0 +1,259 @@
+"""Transaction history stored in SQLite.
+
+One row per transaction, indexed on hash, signer, status and created_at, so
+adding a transaction or changing its status touches a single row and
+per-wallet history queries do not read the whole history. The database runs
+in WAL mode: readers never wait for the writer.
+
+`page()` serves newest-first keyset pages: the cursor is the (created_at,
+id) of the last row returned, so fetching any page is an index range scan
+whatever the size of the history.
+
+The legacy `wallet_history.json` is imported once, the first time the store
+opens a database that has not seen it yet; the JSON file is left in place.
+
+Every write bumps the `revision` kept in the `meta` table, so readers can
+tell whether anything changed (it backs the history ETag) with one lookup,
+from any process sharing the database.
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Transaction fields with their own column; anything else a legacy entry
+# carries is kept in the `extra` JSON column
+COLUMNS = (
+    'hash',
+    'recipient',
+    'amount_nock',
+    'amount_nick',
+    'fee_nick',
+    'notes_used',
+    'signer',
+    'status',
+    'created_at',
+    'updated_at',
+    'sent_at',
+)
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor was not produced by page()."""
+
+
+def encode_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(row_id, int):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return created_at, row_id
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL,
+    recipient TEXT,
+    amount_nock REAL,
+    amount_nick INTEGER,
+    fee_nick INTEGER,
+    notes_used INTEGER,
+    signer TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    sent_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_hash ON transactions (hash);
+CREATE INDEX IF NOT EXISTS idx_transactions_signer_created ON transactions (signer, created_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status);
+CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions (created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class HistoryStore:
+    """Read and write transaction history rows; safe to share between threads."""
+
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self._connection()
+            conn.executescript(SCHEMA)
+            with conn:
+                # Start from the clock, not 1: a recreated database must not
+                # reuse revisions a client may still hold
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', ?)",
+                    (int(time.time() * 1000),)
+                )
+            if legacy_json:
+                self._import_legacy_json(conn, legacy_json)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_json(self, conn, json_path):
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+            return
+
+        history = []
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, 'r') as f:
+                    history = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Could not read {json_path}, skipping history import: {str(e)}")
+                return
+
+        with conn:
+            conn.executemany(self._insert_sql(), [self._to_row(tx) for tx in history])
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('legacy_json_imported', ?)",
+                (datetime.now().isoformat(),)
+            )
+            self._bump_revision(conn)
+        logger.info(f"Imported {len(history)} transactions from {json_path} into {self.path}")
+
+    @staticmethod
+    def _bump_revision(conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+
+    @staticmethod
+    def _insert_sql():
+        return (f"INSERT INTO transactions ({', '.join(COLUMNS)}, extra) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?)")
+
+    @staticmethod
+    def _to_row(transaction):
+        extra = {key: value for key, value in transaction.items() if key not in COLUMNS}
+        return tuple(transaction.get(column) for column in COLUMNS) + (json.dumps(extra) if extra else None,)
+
+    @staticmethod
+    def _to_dict(row):
+        transaction = {column: row[column] for column in COLUMNS if column != 'sent_at'}
+        if row['sent_at'] is not None:
+            transaction['sent_at'] = row['sent_at']
+        if row['extra']:
+            transaction.update(json.loads(row['extra']))
+        return transaction
+
+    def add(self, transaction):
+        """Insert a transaction dict and return it."""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(self._insert_sql(), self._to_row(transaction))
+                self._bump_revision(conn)
+        return transaction
+
+    def update_status(self, tx_hash, new_status):
+        """Set the status of a transaction (all its rows, one per output); return False if unknown."""
+        now = datetime.now().isoformat()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    """UPDATE transactions
+                       SET status = ?, updated_at = ?,
+                           sent_at = CASE WHEN ? = 'sent' THEN ? ELSE sent_at END
+                       WHERE hash = ?""",
+                    (new_status, now, new_status, now, tx_hash)
+                )
+                if cursor.rowcount:
+                    self._bump_revision(conn)
+        return cursor.rowcount > 0
+
+    def revision(self):
+        """Return a number that changes whenever the history is written to."""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0])
+
+    def get(self, tx_hash):
+        row = self._connection().execute(
+            "SELECT * FROM transactions WHERE hash = ? ORDER BY id LIMIT 1", (tx_hash,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def page(self, signer=None, limit=50, cursor=None, status=None, recipient=None,
+             since=None, until=None, min_amount_nick=None, max_amount_nick=None):
+        """Return (transactions, next_cursor), newest first.
+
+        Filters are optional and combined with AND; since/until are ISO
+        timestamps (inclusive) compared against created_at. next_cursor is
+        None on the last page.
+        """
+        where, params = [], []
+        if signer is not None:
+            where.append("signer = ?")
+            params.append(signer)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if recipient is not None:
+            where.append("recipient = ?")
+            params.append(recipient)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at <= ?")
+            params.append(until)
+        if min_amount_nick is not None:
+            where.append("amount_nick >= ?")
+            params.append(min_amount_nick)
+        if max_amount_nick is not None:
+            where.append("amount_nick <= ?")
+            params.append(max_amount_nick)
+        if cursor is not None:
+            created_at, row_id = decode_cursor(cursor)
+            # Row-value comparison lets SQLite seek the index instead of skipping rows
+            where.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, row_id])
+
+        sql = "SELECT * FROM transactions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # One extra row tells whether another page follows
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._connection().execute(sql, params + [limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return [self._to_dict(row) for row in rows], next_cursor
+
+    def count(self, signer=None):
+        if signer is None:
+            return self._connection().execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM transactions WHERE signer = ?", (signer,)
+        ).fetchone()[0]
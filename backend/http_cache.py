@@ -0,0 +1,86 @@
+"""Conditional GET and response compression for the JSON API.
+
+Read endpoints derive a strong ETag from the version of the data behind
+them (balance snapshot version, history revision, cached address state) and
+call `not_modified()` before building their body: a client that already has
+that version gets `304 Not Modified` without the payload being serialized,
+let alone the wallet CLI being run. Responses say `Cache-Control: no-cache`,
+so browsers keep them and revalidate with `If-None-Match` on every request
+(this is what axios gets for free in the frontend).
+
+`compress_response()` is an after_request hook: JSON and text bodies above
+`min_size` bytes are compressed with brotli when the client accepts it and
+the `brotli` package is installed, otherwise with gzip. A compressed body is
+a different representation, so its ETag gets a `-br` / `-gzip` suffix, and
+`not_modified()` accepts all three forms.
+"""
+import gzip
+import hashlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv')
+ENCODING_SUFFIXES = ('', '-gzip', '-br')
+
+
+def etag_for(*parts):
+    """Strong ETag value (unquoted) for the given version parts."""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+
+def not_modified(etag):
+    """Return a 304 response if the request's If-None-Match covers etag, else None."""
+    if_none_match = request.if_none_match
+    if if_none_match and any(if_none_match.contains(etag + suffix) for suffix in ENCODING_SUFFIXES):
+        return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    return None
+
+
+def with_etag(response, etag):
+    """Mark a response with its ETag and ask clients to revalidate before reusing it."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _accepted_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, min_size=1024, gzip_level=6, brotli_quality=5):
+    """Compress a finished response in place when worthwhile; return it."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=brotli_quality)
+    else:
+        compressed = gzip.compress(body, compresslevel=gzip_level)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
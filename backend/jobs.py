@@ -0,0 +1,172 @@
+"""Background jobs for long-running wallet operations.
+
+Endpoints called with `?async=true` hand their work to `JobManager.submit()`
+and answer `202 Accepted` with a job id right away; clients poll
+`/api/jobs/<id>` for status, timings and the result. Jobs run on a bounded
+thread pool with a bounded queue, and cancelling a running job kills the
+wallet processes it started (see executors.CancelScope).
+
+A job's optional `cleanup()` runs when fn() never will: the job was
+rejected because the queue is full, or cancelled before it started. fn()
+is responsible for cleaning up after itself once it runs.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from executors import CancelScope, cancel_scope
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when the pool already has too many pending jobs."""
+
+
+class Job:
+    """One submitted operation; `fn()` returns (payload dict, http status)."""
+
+    def __init__(self, kind, fn, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.cleanup = cleanup
+        self.status = QUEUED
+        self.result = None
+        self.http_status = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.scope = CancelScope()
+        self.future = None
+
+    def to_dict(self):
+        queued_seconds = None
+        run_seconds = None
+        if self.started_at:
+            queued_seconds = round(self.started_at - self.created_at, 3)
+            run_seconds = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": queued_seconds,
+            "run_seconds": run_seconds,
+            "http_status": self.http_status,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+def _run_cleanup(kind, cleanup):
+    if cleanup is None:
+        return
+    try:
+        cleanup()
+    except Exception as e:
+        logger.error(f"Cleanup of {kind} job failed: {type(e).__name__}: {str(e)}")
+
+
+class JobManager:
+    """Run jobs on `max_workers` threads, keeping at most `max_pending` waiting or running."""
+
+    def __init__(self, max_workers=2, max_pending=32, keep_finished=200):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wallet-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, kind, fn, cleanup=None):
+        """Queue fn(); raise JobQueueFull (after running cleanup) when too many jobs are pending."""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                rejected = True
+            else:
+                rejected = False
+                job = Job(kind, fn, cleanup)
+                self._jobs[job.id] = job
+                self._prune()
+        if rejected:
+            _run_cleanup(kind, cleanup)
+            raise JobQueueFull(f"{pending} jobs already pending")
+        job.future = self._pool.submit(self._run, job)
+        logger.info(f"Job {job.id} ({kind}) queued")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; return it, or None if unknown. Finished jobs are left as they are."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            cancelled_queued = job.status == QUEUED and job.future.cancel()
+            if cancelled_queued:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        if cancelled_queued:
+            logger.info(f"Job {job.id} cancelled before it started")
+            _run_cleanup(job.kind, job.cleanup)
+            return job
+        # Running: kill its wallet processes, _run() records the outcome
+        job.scope.cancel()
+        logger.info(f"Job {job.id} cancellation requested")
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        status, result, http_status, error = FAILED, None, None, None
+        try:
+            with cancel_scope(job.scope):
+                result, http_status = job.fn()
+            status = SUCCEEDED if http_status < 400 else FAILED
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) error: {type(e).__name__}: {str(e)}")
+            error = str(e)
+
+        if job.scope.cancelled:
+            status = CANCELLED
+
+        with self._lock:
+            job.status = status
+            job.result = result
+            job.http_status = http_status
+            job.error = error
+            job.finished_at = time.time()
+        logger.info(f"Job {job.id} ({job.kind}) {status} in {job.finished_at - job.started_at:.1f}s")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,787 @@
+"""Single-pass parser for `nockchain-wallet list-notes` output.
+
+The output is a "Wallet Notes" header followed by note sections separated by
+lines of 50+ dashes or em-dashes. Two section formats exist:
+
+v1 notes::
+
+    Note Information
+    - Name: [<first> <last>]
+    - Version: 1
+    - Assets (nicks): 65536
+    - Block Height: 12345
+    - Lock Information:
+      - Required Signatures: 1
+      - Signers:
+        - <address>
+
+v0 notes::
+
+    Details
+    - Name: [<first> <last>]
+    - Version: 0
+    - Assets: 65536
+    - Block Height: 12345
+    - Source: <hash>
+
+    Lock
+    - Required Signatures: 1
+    - Signers:
+      <address>
+
+Lines are fed one at a time and every section is parsed while its lines
+arrive, so a note is available as soon as the separator that closes it has
+been read. A label that ends its line without a value (the CLI wraps long
+lines) takes it from the next non-empty line, as the regex parser this
+replaced did. When a whole block of output is available (`feed()`, and
+`NoteSetTracker`), complete sections in exactly the layout above, with
+base58 names, sources and signers, are matched by a single pattern instead;
+every other section goes through the line-by-line path. All patterns are
+compiled once at import time.
+
+`NoteSetTracker` parses consecutive syncs incrementally: sections whose
+content hash was seen in the previous sync reuse the parsed note, and each
+sync yields a delta (added / spent / changed notes) against the previous one.
+Every note set whose content differs from the current version's gets a new
+version, and the recent deltas are kept (shared between server processes
+when they share state) so `changes_since()` can tell a client holding an
+older version what changed.
+"""
+import contextlib
+import hashlib
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*m')
+SEPARATOR_RE = re.compile(r'[―\-]{50,}')
+VERSION_RE = re.compile(r'- Version:\s*(\d+)')
+ASSETS_V1_RE = re.compile(r'- Assets \(nicks\):\s*(\d+)')
+ASSETS_V0_RE = re.compile(r'- Assets:\s*(\d+)')
+BLOCK_HEIGHT_RE = re.compile(r'- Block Height:\s*(\d+)')
+SOURCE_RE = re.compile(r'- Source:\s*(\S+)')
+SIGNER_RE = re.compile(r'[A-Za-z0-9]{50,}')
+# A value wrapped onto the line after its label
+WRAPPED_NUMBER_RE = re.compile(r'\s*(\d+)')
+WRAPPED_SOURCE_RE = re.compile(r'\s*(\S+)')
+# Every marker and label a section line can carry, found in one scan per line
+TOKEN_RE = re.compile(
+    r'Wallet Notes|Note Information|Details|- Lock Information:|Lock'
+    r'|- Version:|- Assets|- Block Height:|- Source:|Signers:'
+)
+NON_SPACE_RE = re.compile(r'\S')
+# Complete sections laid out exactly as the CLI prints them, with base58
+# names, sources and signers: one match replaces the line state machine
+_BASE58 = r'[1-9A-HJ-NP-Za-km-z]'
+_CANONICAL_NAME = rf'- Name: \[({_BASE58}+(?: |\n *){_BASE58}+)\]\n- Version: (\d+)\n'
+CANONICAL_V1_RE = re.compile(
+    rf'\nNote Information\n{_CANONICAL_NAME}- Assets \(nicks\): (\d+)\n- Block Height: (\d+)\n'
+    rf'- Lock Information:(?: (N/A)|\n  - Required Signatures: \d+\n  - Signers:\n    - ({_BASE58}{{50,}}))\n'
+)
+CANONICAL_V0_RE = re.compile(
+    rf'\nDetails\n{_CANONICAL_NAME}- Assets: (\d+)\n- Block Height: (\d+)\n- Source: ({_BASE58}+)\n'
+    rf'\nLock\n- Required Signatures: \d+\n- Signers:\n  ({_BASE58}{{50,}})\n'
+)
+
+HEADER = "Wallet Notes"
+NOTE_INFO_MARKER = "Note Information"
+DETAILS_MARKER = "Details"
+LOCK_MARKER = "Lock"
+# Note-set digests are sums of SHA-1 note digests, kept to SHA-1 width
+DIGEST_MODULUS = 1 << 160
+LOCK_INFO_MARKER = "- Lock Information:"
+LOCK_INFO_NA = "Lock Information: N/A"
+NAME_LABEL = "- Name:"
+SIGNERS_LABEL = "Signers:"
+PREFIXED_SIGNERS_LABEL = "- Signers:"
+
+# Name scanner states
+_NAME_SEARCH, _NAME_AWAIT_BRACKET, _NAME_INSIDE, _NAME_DONE = range(4)
+# v0 "Lock" block states
+_LOCK_SEARCH, _LOCK_AWAIT_BODY, _LOCK_BODY, _LOCK_DONE = range(4)
+
+
+def _ends_line(line, pos):
+    """True when nothing but whitespace follows pos in line."""
+    return not line[pos:].strip()
+
+
+def empty_balance():
+    """Return the balance payload for a wallet without notes."""
+    return {"notes": [], "notes_count": 0, "total_assets": 0}
+
+
+class _SignerScanner:
+    """Collect `Signers:` candidates from the lines of a lock block."""
+
+    __slots__ = ('pending', 'candidates')
+
+    def __init__(self):
+        # (label has "- " prefix, dash seen before address) while waiting
+        # for the address line that follows a `Signers:` label
+        self.pending = None
+        self.candidates = []
+
+    def feed(self, text):
+        if self.pending is not None:
+            rest = text.lstrip()
+            if rest:
+                prefixed, dash = self.pending
+                self.pending = None
+                if not dash and rest[0] == '-':
+                    dash = True
+                    rest = rest[1:].lstrip()
+                    if not rest:
+                        # `-` alone on its line, address follows on the next one
+                        self.pending = (prefixed, True)
+                        return
+                match = SIGNER_RE.match(rest)
+                if match:
+                    self.candidates.append((prefixed, dash, match.group()))
+
+        stripped = text.rstrip()
+        if stripped.endswith(SIGNERS_LABEL):
+            self.pending = (stripped.endswith(PREFIXED_SIGNERS_LABEL), False)
+
+    def first(self, prefixed=None, dash=None):
+        """Return the first candidate matching the given label/dash shape."""
+        for cand_prefixed, cand_dash, address in self.candidates:
+            if prefixed is not None and cand_prefixed != prefixed:
+                continue
+            if dash is not None and cand_dash != dash:
+                continue
+            return address
+        return None
+
+
+class _NoteSection:
+    """Incremental state for a single note section."""
+
+    __slots__ = (
+        'has_header', 'has_note_info', 'has_details', 'has_lock', 'lock_na',
+        'name_state', 'name_parts', 'name', 'version', 'assets_v1', 'assets_v0',
+        'block_height_v1', 'block_height_v0', 'source', 'lock_info_signers',
+        'lock_state', 'lock_signers', 'wrapped',
+    )
+
+    def __init__(self):
+        self.has_header = False
+        self.has_note_info = False
+        self.has_details = False
+        self.has_lock = False
+        self.lock_na = False
+        self.name_state = _NAME_SEARCH
+        self.name_parts = None
+        self.name = None
+        self.version = None
+        self.assets_v1 = None
+        self.assets_v0 = None
+        self.block_height_v1 = None
+        self.block_height_v0 = None
+        self.source = None
+        self.lock_info_signers = None
+        self.lock_state = _LOCK_SEARCH
+        self.lock_signers = None
+        # Fields whose label ended a line without a value; the value is on
+        # the next non-empty line (the CLI wraps long lines)
+        self.wrapped = None
+
+    def feed(self, line):
+        """Consume one line (without its trailing newline) of the section."""
+        if self.wrapped is not None and line.strip():
+            self._take_wrapped(line)
+        if self.name_state != _NAME_DONE and (self.name_state != _NAME_SEARCH or NAME_LABEL in line):
+            self._scan_name(line)
+
+        signers_in_line = False
+        lock_in_line = False
+        v1_start = v0_start = 0
+        lock_info_rest = None
+
+        for match in TOKEN_RE.finditer(line):
+            token = match.group()
+            if token == SIGNERS_LABEL:
+                signers_in_line = True
+            elif token == '- Block Height:':
+                # Block height is only taken after the v1/v0 marker of the section
+                if self.block_height_v1 is None and self.has_note_info:
+                    found = BLOCK_HEIGHT_RE.search(line, v1_start)
+                    if found:
+                        self.block_height_v1 = int(found.group(1))
+                    elif _ends_line(line, match.end()):
+                        self._wrap('block_height_v1')
+                if self.block_height_v0 is None and self.has_details:
+                    found = BLOCK_HEIGHT_RE.search(line, v0_start)
+                    if found:
+                        self.block_height_v0 = int(found.group(1))
+                    elif _ends_line(line, match.end()):
+                        self._wrap('block_height_v0')
+            elif token == '- Version:':
+                if self.version is None:
+                    found = VERSION_RE.search(line)
+                    if found:
+                        self.version = int(found.group(1))
+                    elif _ends_line(line, match.end()):
+                        self._wrap('version')
+            elif token == '- Assets':
+                end = match.end()
+                if self.assets_v1 is None:
+                    found = ASSETS_V1_RE.search(line)
+                    if found:
+                        self.assets_v1 = int(found.group(1))
+                    elif line.startswith(' (nicks):', end) and _ends_line(line, end + 9):
+                        self._wrap('assets_v1')
+                if self.assets_v0 is None:
+                    found = ASSETS_V0_RE.search(line)
+                    if found:
+                        self.assets_v0 = int(found.group(1))
+                    elif line.startswith(':', end) and _ends_line(line, end + 1):
+                        self._wrap('assets_v0')
+            elif token == '- Source:':
+                if self.source is None:
+                    found = SOURCE_RE.search(line)
+                    if found:
+                        self.source = found.group(1)
+                    elif _ends_line(line, match.end()):
+                        self._wrap('source')
+            elif token == LOCK_MARKER:
+                lock_in_line = True
+                if line.startswith(' Information: N/A', match.end()):
+                    self.lock_na = True
+            elif token == LOCK_INFO_MARKER:
+                lock_in_line = True
+                if line.startswith(' N/A', match.end()):
+                    self.lock_na = True
+                if self.lock_info_signers is None:
+                    # v1 signers: everything after the first "- Lock Information:"
+                    self.lock_info_signers = _SignerScanner()
+                    lock_info_rest = line[match.end():]
+            elif token == NOTE_INFO_MARKER:
+                if not self.has_note_info:
+                    self.has_note_info = True
+                    v1_start = match.end()
+            elif token == DETAILS_MARKER:
+                if not self.has_details:
+                    self.has_details = True
+                    v0_start = match.end()
+            else:
+                self.has_header = True
+
+        if lock_in_line:
+            self.has_lock = True
+
+        scanner = self.lock_info_signers
+        if lock_info_rest is not None:
+            scanner.feed(lock_info_rest)
+        elif scanner is not None and (signers_in_line or scanner.pending is not None):
+            scanner.feed(line)
+
+        # v0 signers: the block after a "Lock" line, up to the first empty line
+        if self.lock_state == _LOCK_BODY:
+            if not line:
+                self.lock_state = _LOCK_DONE
+            elif signers_in_line or self.lock_signers.pending is not None:
+                self.lock_signers.feed(line)
+        elif self.lock_state == _LOCK_AWAIT_BODY:
+            if line.strip():
+                self.lock_state = _LOCK_BODY
+                self.lock_signers = _SignerScanner()
+                if signers_in_line:
+                    self.lock_signers.feed(line)
+        elif lock_in_line and self.lock_state == _LOCK_SEARCH:
+            if line.rstrip().endswith(LOCK_MARKER):
+                self.lock_state = _LOCK_AWAIT_BODY
+
+    def _wrap(self, field):
+        if self.wrapped is None:
+            self.wrapped = [field]
+        elif field not in self.wrapped:
+            self.wrapped.append(field)
+
+    def _take_wrapped(self, line):
+        """Fill the fields waiting for a wrapped value from this non-empty line."""
+        for field in self.wrapped:
+            if getattr(self, field) is not None:
+                continue
+            if field == 'source':
+                found = WRAPPED_SOURCE_RE.match(line)
+                if found:
+                    self.source = found.group(1)
+            else:
+                found = WRAPPED_NUMBER_RE.match(line)
+                if found:
+                    setattr(self, field, int(found.group(1)))
+        self.wrapped = None
+
+    def _scan_name(self, line):
+        pos = 0
+        while True:
+            if self.name_state == _NAME_SEARCH:
+                idx = line.find(NAME_LABEL, pos)
+                if idx < 0:
+                    return
+                pos = idx + len(NAME_LABEL)
+                self.name_state = _NAME_AWAIT_BRACKET
+
+            if self.name_state == _NAME_AWAIT_BRACKET:
+                match = NON_SPACE_RE.search(line, pos)
+                if not match:
+                    return
+                pos = match.start()
+                if line[pos] != '[':
+                    self.name_state = _NAME_SEARCH
+                    continue
+                pos += 1
+                self.name_parts = []
+                self.name_state = _NAME_INSIDE
+
+            end = line.find(']', pos)
+            if end < 0:
+                self.name_parts.append(line[pos:])
+                return
+            self.name_parts.append(line[pos:end])
+            self.name = '\n'.join(self.name_parts).strip().replace('\n', ' ')
+            self.name_parts = None
+            self.name_state = _NAME_DONE
+            return
+
+    def build(self, number):
+        """Return the note dict for this section, or None if it is not a note."""
+        if self.has_header:
+            return None
+
+        is_v1 = self.has_note_info
+        is_v0 = self.has_details and self.has_lock
+        if not is_v0 and not is_v1:
+            return None
+
+        name = self.name if self.name is not None else "Unknown"
+        if is_v1:
+            value = self.assets_v1 or 0
+            block_height = self.block_height_v1 or 0
+        else:
+            value = self.assets_v0 or 0
+            block_height = self.block_height_v0 or 0
+
+        source = None
+        if is_v0:
+            source = self.source if self.source is not None else "Unknown"
+
+        signer = "Unknown"
+        if is_v1:
+            if self.lock_na:
+                signer = "N/A"
+            elif self.lock_info_signers is not None:
+                scanner = self.lock_info_signers
+                signer = (scanner.first(prefixed=True, dash=True)
+                          or scanner.first(prefixed=True, dash=False)
+                          or scanner.first()
+                          or "Unknown")
+                if signer == "Unknown":
+                    logger.warning(f"V1 Signer not found for note {number}: {name[:50]}")
+        elif self.lock_signers is not None:
+            scanner = self.lock_signers
+            signer = (scanner.first(prefixed=True, dash=False)
+                      or scanner.first(dash=False)
+                      or scanner.first(prefixed=True)
+                      or "Unknown")
+            if signer == "Unknown":
+                logger.warning(f"V0 Signer not found for note {number}: {name[:50]}")
+        else:
+            logger.warning(f"V0 Lock section not found for note {number}: {name[:50]}")
+
+        note = {
+            'number': number,
+            'name': name,
+            'value': value,
+            'block_height': block_height,
+            'version': self.version or 0,
+            'signer': signer
+        }
+
+        # Add source only for v0 notes
+        if source:
+            note['source'] = source
+
+        return note
+
+
+class ListNotesParser:
+    """Line-oriented state machine over `list-notes` output.
+
+    `feed_line()` returns the notes completed by that line. Notes are held
+    back until the "Wallet Notes" header has been seen, since output without
+    the header is not a note listing; `close()` flushes the last section.
+    """
+
+    def __init__(self):
+        self.header_seen = False
+        self.notes_count = 0
+        self.total_assets = 0
+        self._section = _NoteSection()
+        self._pending = []
+
+    def feed_line(self, line):
+        """Consume one line of output and return the notes it completed."""
+        if '\x1b' in line:
+            line = ANSI_ESCAPE_RE.sub('', line)
+        if not self.header_seen and HEADER in line:
+            self.header_seen = True
+
+        if not (('-----' in line or '―' in line) and SEPARATOR_RE.search(line)):
+            self._section.feed(line)
+            return ()
+
+        completed = []
+        pieces = SEPARATOR_RE.split(line)
+        if pieces[0]:
+            self._section.feed(pieces[0])
+        self._finish_section(completed)
+        for piece in pieces[1:-1]:
+            if piece:
+                self._section.feed(piece)
+            self._finish_section(completed)
+        if pieces[-1]:
+            self._section.feed(pieces[-1])
+        return self._release(completed)
+
+    def feed(self, text):
+        """Consume a complete block of output and return the completed notes.
+
+        Same result as feeding its lines one by one, but ANSI codes, the
+        header and separators are handled once for the whole block.
+        """
+        if '\x1b' in text:
+            text = ANSI_ESCAPE_RE.sub('', text)
+        if not self.header_seen and HEADER in text:
+            self.header_seen = True
+
+        completed = []
+        pieces = SEPARATOR_RE.split(text)
+        last = len(pieces) - 1
+        for index, piece in enumerate(pieces):
+            if index:
+                self._finish_section(completed)
+            if 0 < index < last:
+                # A whole section: try the one-match path first
+                note = _canonical_note(piece)
+                if note is not None:
+                    note['number'] = len(self._pending) + self.notes_count + len(completed) + 1
+                    completed.append(note)
+                    continue
+            for line in _section_lines(piece, index == 0, index == last):
+                self._section.feed(line)
+        return self._release(completed)
+
+    def close(self):
+        """Finish the last section and return any remaining notes."""
+        completed = []
+        self._finish_section(completed)
+        if not self.header_seen:
+            # Without the header nothing in the output counts as a note
+            self._pending = []
+            return []
+        return self._release(completed)
+
+    def totals(self):
+        """Return the counters for the notes emitted so far."""
+        return {"notes_count": self.notes_count, "total_assets": self.total_assets}
+
+    def _finish_section(self, completed):
+        note = self._section.build(len(self._pending) + self.notes_count + len(completed) + 1)
+        if note is not None:
+            completed.append(note)
+        self._section = _NoteSection()
+
+    def _release(self, completed):
+        if not self.header_seen:
+            self._pending.extend(completed)
+            return []
+        if self._pending:
+            completed = self._pending + completed
+            self._pending = []
+        for note in completed:
+            self.notes_count += 1
+            self.total_assets += note['value']
+        return completed
+
+
+def iter_notes(lines):
+    """Yield notes from an iterable of output lines as soon as they complete."""
+    parser = ListNotesParser()
+    for line in lines:
+        yield from parser.feed_line(line.rstrip('\n'))
+    yield from parser.close()
+
+
+def parse_list_notes(output):
+    """Parse a full `list-notes` output into the `/api/balance` payload."""
+    parser = ListNotesParser()
+    notes = parser.feed(output)
+    notes.extend(parser.close())
+
+    if not parser.header_seen:
+        logger.warning("No 'Wallet Notes' section found in output")
+        return empty_balance()
+
+    return {
+        "notes": notes,
+        "notes_count": len(notes),
+        "total_assets": parser.total_assets
+    }
+
+
+def split_sections(output):
+    """Split output into (header_seen, sections) on separators, as raw section texts.
+
+    Separators never span lines, so splitting the whole text once gives the
+    same boundaries ListNotesParser finds line by line.
+    """
+    if '\x1b' in output:
+        output = ANSI_ESCAPE_RE.sub('', output)
+    return HEADER in output, SEPARATOR_RE.split(output)
+
+
+def _section_lines(text, first, last):
+    """Return the strings ListNotesParser feeds for one section text.
+
+    A section that follows (or precedes) a separator starts (or ends) with
+    the rest of the separator's line, which is only fed when not empty.
+    """
+    lines = text.split('\n')
+    if not first and not lines[0]:
+        lines = lines[1:]
+    if not last and lines and not lines[-1]:
+        lines = lines[:-1]
+    return lines
+
+
+def _canonical_note(text):
+    """Return the note for a complete section text (between two separators)
+    in the CLI's exact layout, or None when it needs the line parser.
+
+    "Lock" is the only marker that can occur inside base58 text; sections
+    where it does are left to the line parser, so a match always gives
+    the note the line parser would build.
+    """
+    match = CANONICAL_V1_RE.fullmatch(text)
+    if match is not None:
+        name, version, value, block_height, lock_na, signer = match.groups()
+        if 'Lock' in name or (signer and 'Lock' in signer):
+            return None
+        return {
+            'number': None,
+            'name': name.replace('\n', ' '),
+            'value': int(value),
+            'block_height': int(block_height),
+            'version': int(version),
+            'signer': 'N/A' if lock_na else signer
+        }
+    match = CANONICAL_V0_RE.fullmatch(text)
+    if match is not None:
+        name, version, value, block_height, source, signer = match.groups()
+        if 'Lock' in name or 'Lock' in source or 'Lock' in signer:
+            return None
+        return {
+            'number': None,
+            'name': name.replace('\n', ' '),
+            'value': int(value),
+            'block_height': int(block_height),
+            'version': int(version),
+            'signer': signer,
+            'source': source
+        }
+    return None
+
+
+def _note_key(note):
+    """Compare notes by content, ignoring their position in the listing."""
+    return tuple(sorted((key, value) for key, value in note.items() if key != 'number'))
+
+
+def _without_number(note):
+    return {key: value for key, value in note.items() if key != 'number'}
+
+
+def _note_digest(note):
+    """Digest of one note's content; summed over a note set it ignores order."""
+    return int.from_bytes(hashlib.sha1(repr(_note_key(note)).encode()).digest(), 'big')
+
+
+class _LocalNoteHistory:
+    """In-process stand-in for shared_state.SharedNoteHistory."""
+
+    def __init__(self):
+        self._history = {}
+
+    def read(self):
+        return self._history
+
+    @contextlib.contextmanager
+    def update(self):
+        yield self._history
+
+
+class NoteSetTracker:
+    """Parse successive `list-notes` outputs, re-parsing only changed sections.
+
+    Parsed notes are cached by section text (the dict hashes it) and kept
+    only while the section is still present, so the cache never outgrows
+    one listing. `parse()` returns the balance payload (same as
+    parse_list_notes) and the delta against the previous parse; notes are
+    matched by name and delta notes carry no `number` (it is a position in
+    one listing, not part of the note).
+
+    The version counter and the recent deltas live in `history` (a
+    shared_state.SharedNoteHistory when several processes serve the API,
+    in memory otherwise). A note set gets a new version only when its
+    content digest differs from the one of the current version, so every
+    process gives the same notes the same version; deltas are stored as
+    (from_version, to_version) steps and only chained when they connect.
+    Versions start from the first parse time in milliseconds, so they keep
+    increasing across restarts and a version from an earlier run is never
+    mistaken for a current one.
+    """
+
+    def __init__(self, keep_versions=64, history=None):
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._previous = None
+        self._previous_version = None
+        self.last_delta = None
+        self.keep_versions = keep_versions
+        self._history = history if history is not None else _LocalNoteHistory()
+
+    @property
+    def version(self):
+        """The current note-set version (None before the first parse)."""
+        with self._lock:
+            return self._history.read().get("version")
+
+    def parse(self, output):
+        """Return (balance, delta) for one full `list-notes` output."""
+        header_seen, sections = split_sections(output)
+        last = len(sections) - 1
+
+        with self._lock:
+            notes = []
+            cache = {}
+            templates = {}
+            digest = 0
+            reused = 0
+            for index, text in enumerate(sections):
+                # Where the section sits changes which of its edge lines are fed
+                key = (text, index == 0, index == last)
+                cached = self._cache.get(key)
+                if cached is None:
+                    template = _canonical_note(text) if 0 < index < last else None
+                    if template is None:
+                        section = _NoteSection()
+                        for line in _section_lines(text, index == 0, index == last):
+                            section.feed(line)
+                        template = section.build(len(notes) + 1)
+                    cached = (template, _note_digest(template) if template is not None else 0)
+                else:
+                    reused += 1
+                cache[key] = cached
+                template, note_digest = cached
+                if template is not None:
+                    note = template.copy()
+                    note['number'] = len(notes) + 1
+                    notes.append(note)
+                    templates[template['name']] = template
+                    digest += note_digest
+            self._cache = cache
+
+            if not header_seen:
+                logger.warning("No 'Wallet Notes' section found in output")
+                balance = empty_balance()
+                digest = 0
+            else:
+                balance = {
+                    "notes": notes,
+                    "notes_count": len(notes),
+                    "total_assets": sum(note['value'] for note in notes)
+                }
+
+            current = templates if header_seen else {}
+            delta = self._diff(self._previous, current)
+            delta["reused_sections"] = reused
+            delta["parsed_sections"] = len(sections) - reused
+            delta["version"] = self._record_version(f"{digest % DIGEST_MODULUS:040x}", delta)
+            self._previous = current
+            self._previous_version = delta["version"]
+            self.last_delta = delta
+        return balance, delta
+
+    def changes_since(self, since, until):
+        """Return {"added", "removed"} turning note set `since` into `until`.
+
+        `removed` holds note names to drop and `added` the notes to insert or
+        replace (matched by name). Returns None when the deltas in between
+        are no longer kept (or `since` is unknown).
+        """
+        if since == until:
+            return {"added": [], "removed": []}
+        with self._lock:
+            steps = {to_version: (from_version, changes)
+                     for from_version, to_version, changes in list(self._history.read().get("deltas", []))}
+
+        chain = []
+        version = until
+        while version != since:
+            if version not in steps:
+                return None
+            version, changes = steps[version]
+            chain.append(changes)
+
+        added = {}
+        removed = set()
+        for changes in reversed(chain):
+            for name in changes["removed"]:
+                if added.pop(name, None) is None:
+                    removed.add(name)
+            for note in changes["added"]:
+                added[note["name"]] = note
+        return {"added": list(added.values()), "removed": sorted(removed)}
+
+    def _record_version(self, digest, delta):
+        """Return the version of the note set with this digest, storing the delta if it is new."""
+        with self._history.update() as history:
+            if history.get("digest") == digest:
+                return history["version"]
+            version = history["version"] + 1 if "version" in history else int(time.time() * 1000)
+            deltas = list(history.get("deltas", []))
+            # An initial parse has nothing to diff against, so it leaves a gap
+            if not delta["initial"] and self._previous_version is not None:
+                deltas.append([self._previous_version, version, {
+                    "added": delta["added"] + delta["changed"],
+                    "removed": [note["name"] for note in delta["spent"]]
+                }])
+            history.update(version=version, digest=digest, deltas=deltas[-self.keep_versions:])
+            return version
+
+    @staticmethod
+    def _diff(previous, current):
+        if previous is None:
+            added = [_without_number(note) for note in current.values()]
+            return {"initial": True, "added": added, "spent": [], "changed": [], "unchanged_count": 0}
+
+        added = [_without_number(note) for name, note in current.items() if name not in previous]
+        spent = [_without_number(note) for name, note in previous.items() if name not in current]
+        changed = []
+        unchanged = 0
+        for name, note in current.items():
+            before = previous.get(name)
+            if before is None or before is note:
+                # Same cached template: the section did not change
+                unchanged += before is not None
+                continue
+            if _note_key(before) != _note_key(note):
+                changed.append(_without_number(note))
+            else:
+                unchanged += 1
+        return {"initial": False, "added": added, "spent": spent, "changed": changed, "unchanged_count": unchanged}
@@ -0,0 +1,160 @@
+"""Admission control for wallet commands.
+
+All commands against the wallet go through one `CommandScheduler`:
+- read-only commands share the wallet, at most `max_readers` at a time;
+- mutating commands (create-tx, sign-tx, send-tx, imports, ...) run alone;
+- waiting commands are admitted by priority, then in arrival order.
+  Request handlers run at INTERACTIVE priority; code wrapped in
+  `background_priority()` (the sync worker) runs at BACKGROUND priority, so
+  a queued sync never delays a request. A waiting mutating command blocks
+  the commands queued behind it, so a stream of reads cannot starve it.
+
+Commands that wait longer than `queue_timeout` seconds raise QueueTimeout,
+a subprocess.TimeoutExpired, so callers handle it like a command timeout.
+"""
+import collections
+import contextlib
+import heapq
+import itertools
+import subprocess
+import threading
+import time
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+# Waits kept per priority for the percentiles in stats()
+WAIT_SAMPLES = 512
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def background_priority():
+    """Run the wallet commands issued by this thread inside the block at BACKGROUND priority."""
+    previous = getattr(_local, 'priority', INTERACTIVE)
+    _local.priority = BACKGROUND
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority():
+    return getattr(_local, 'priority', INTERACTIVE)
+
+
+class QueueTimeout(subprocess.TimeoutExpired):
+    """A wallet command waited too long for its turn."""
+
+    def __str__(self):
+        return f"Command {self.cmd!r} waited more than {self.timeout} seconds for the wallet"
+
+
+class _Ticket:
+    __slots__ = ('exclusive', 'priority', 'granted')
+
+    def __init__(self, exclusive, priority):
+        self.exclusive = exclusive
+        self.priority = priority
+        self.granted = False
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class CommandScheduler:
+    """Reader/writer admission with priorities for one wallet."""
+
+    def __init__(self, max_readers=4, queue_timeout=None):
+        self.max_readers = max_readers
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, arrival, ticket)
+        self._arrivals = itertools.count()
+        self._readers = 0
+        self._writer = False
+        self._waits = {priority: collections.deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+        self._stats = {
+            "admitted_reads": 0,
+            "admitted_writes": 0,
+            "queue_timeouts": 0,
+            "max_queue_depth": 0
+        }
+
+    @contextlib.contextmanager
+    def slot(self, cmd, exclusive):
+        """Wait for a turn to run cmd (a list, for QueueTimeout) and hold it inside the block."""
+        ticket = _Ticket(exclusive, current_priority())
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, (ticket.priority, next(self._arrivals), ticket))
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+            self._admit()
+            while not ticket.granted:
+                remaining = None
+                if self.queue_timeout is not None:
+                    remaining = start + self.queue_timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._withdraw(ticket)
+                        raise QueueTimeout(cmd, self.queue_timeout)
+                self._cond.wait(remaining)
+            self._waits[ticket.priority].append(time.monotonic() - start)
+            self._stats["admitted_writes" if exclusive else "admitted_reads"] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                if exclusive:
+                    self._writer = False
+                else:
+                    self._readers -= 1
+                self._admit()
+
+    def _admit(self):
+        # Caller holds self._cond
+        admitted = False
+        while self._queue and not self._writer:
+            ticket = self._queue[0][2]
+            if ticket.exclusive:
+                if self._readers:
+                    break
+                self._writer = True
+            elif self._readers < self.max_readers:
+                self._readers += 1
+            else:
+                break
+            heapq.heappop(self._queue)
+            ticket.granted = True
+            admitted = True
+        if admitted:
+            self._cond.notify_all()
+
+    def _withdraw(self, ticket):
+        self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+        heapq.heapify(self._queue)
+        self._stats["queue_timeouts"] += 1
+        # The withdrawn ticket may have been holding back the ones behind it
+        self._admit()
+
+    def stats(self):
+        """Return occupancy, queue depth per priority and wait-time percentiles in ms."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["max_readers"] = self.max_readers
+            stats["active_readers"] = self._readers
+            stats["writer_active"] = self._writer
+            queued = collections.Counter(entry[0] for entry in self._queue)
+            stats["queued"] = {name: queued[priority] for priority, name in PRIORITY_NAMES.items()}
+            waits = {priority: sorted(samples) for priority, samples in self._waits.items()}
+        stats["wait_ms"] = {
+            PRIORITY_NAMES[priority]: {
+                "samples": len(samples),
+                "p50": round(_percentile(samples, 50) * 1000, 3),
+                "p95": round(_percentile(samples, 95) * 1000, 3),
+                "max": round(samples[-1] * 1000, 3)
+            } if samples else None
+            for priority, samples in waits.items()
+        }
+        return stats
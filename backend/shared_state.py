@@ -0,0 +1,251 @@
+"""State shared between the worker processes of a multi-process server.
+
+Each WSGI worker process has its own caches, so without coordination every
+worker would run `list-notes` and the address commands on its own and
+mutating commands in one worker could overlap reads in another. When
+SHARED_STATE_DIR names a directory every worker can reach:
+
+- wallet commands take a lock file (`wallet.lock`): read-only commands hold
+  it shared, mutating ones exclusively, across all workers;
+- each snapshot cache keeps its last snapshot in `<name>.json`. A worker that
+  needs a snapshot takes `<name>.lock`, and uses the file when another
+  worker wrote it recently enough (within the cache TTL) instead of running
+  the CLI, so concurrent misses in several workers cost one CLI run;
+- `invalidate()` writes a new token to `<name>.generation`: every worker
+  drops its copy on its next read, and snapshots loaded before the
+  invalidation are not reused;
+- only the worker holding `sync.lock` runs the background sync worker;
+- the note-set version counter and the recent note deltas live in
+  `note_history.json` (updated under `note_history.lock`), so every worker
+  hands out the same version for the same notes and can answer
+  `?since=` from deltas another worker computed;
+- published events are appended to `events.jsonl` (under `events.lock`)
+  and every worker's event bus delivers them from there, so a stream
+  receives the events of every worker, with the same ids in all of them.
+
+Locks are `flock()` locks, so they are released when a worker dies.
+"""
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """An flock()-based lock; every acquisition opens its own descriptor,
+    so it also excludes threads of the same process."""
+
+    def __init__(self, path):
+        self.path = path
+        self._held_fd = None
+
+    @contextlib.contextmanager
+    def hold(self, shared=False):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # Closing releases the lock
+
+    def try_hold_forever(self):
+        """Take the lock without waiting and keep it for the life of the process.
+
+        Returns False if another process holds it.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # Deliberately never closed: the lock goes away with the process
+        self._held_fd = fd
+        return True
+
+
+class SharedSnapshot:
+    """One snapshot cache's value as seen by all workers."""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self._path = os.path.join(directory, f"{name}.json")
+        self._generation_path = os.path.join(directory, f"{name}.generation")
+        self._lock = FileLock(os.path.join(directory, f"{name}.lock"))
+
+    def generation(self):
+        """Return the current invalidation token ('' before the first invalidation)."""
+        try:
+            with open(self._generation_path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ''
+
+    def invalidate(self):
+        """Make every worker drop its copy and stop reusing the stored snapshot.
+
+        Returns the new generation token.
+        """
+        generation = uuid.uuid4().hex
+        _write_atomic(self._generation_path, generation)
+        return generation
+
+    def load(self, loader, is_valid, max_age=None, force=False):
+        """Return (value, age_seconds): the stored snapshot if recent enough, else loader().
+
+        max_age=None accepts a stored snapshot of any age; force skips the
+        stored snapshot. Workers asking at the same time wait for the one
+        running the loader and use what it stored.
+        """
+        with self._lock.hold():
+            generation = self.generation()
+            if not force:
+                stored = self._read(generation, max_age)
+                if stored is not None:
+                    return stored
+            value = loader()
+            # Not stored when an invalidation happened while loading
+            if is_valid(value) and self.generation() == generation:
+                _write_atomic(self._path, json.dumps({
+                    "generation": generation,
+                    "saved_at": time.time(),
+                    "value": value
+                }))
+            return value, 0.0
+
+    def _read(self, generation, max_age):
+        try:
+            with open(self._path) as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        age = max(0.0, time.time() - stored["saved_at"])
+        if stored["generation"] != generation or (max_age is not None and age >= max_age):
+            return None
+        logger.debug(f"{self.name}: using the snapshot stored {age:.1f}s ago by another worker")
+        return stored["value"], age
+
+
+class SharedNoteHistory:
+    """NoteSetTracker's version counter and recent deltas, as seen by all workers."""
+
+    def __init__(self, directory):
+        self._path = os.path.join(directory, 'note_history.json')
+        self._lock = FileLock(os.path.join(directory, 'note_history.lock'))
+
+    def read(self):
+        """Return the stored history ({} before the first parse)."""
+        try:
+            with open(self._path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextlib.contextmanager
+    def update(self):
+        """Yield the history for changing in place; it is stored on exit.
+
+        Workers updating at the same time take turns.
+        """
+        with self._lock.hold():
+            history = self.read()
+            before = json.dumps(history, sort_keys=True)
+            yield history
+            text = json.dumps(history, sort_keys=True)
+            if text != before:
+                _write_atomic(self._path, text)
+
+
+class SharedEventLog:
+    """The last `keep` published events, as seen by all workers.
+
+    One JSON line per event: {"id", "event", "payload"}, ids increasing.
+    """
+
+    def __init__(self, directory, keep=256):
+        self.keep = keep
+        self._path = os.path.join(directory, 'events.jsonl')
+        self._lock = FileLock(os.path.join(directory, 'events.lock'))
+
+    def append(self, event, payload):
+        """Store an event; return its id."""
+        with self._lock.hold():
+            items = self._read()
+            event_id = items[-1]["id"] + 1 if items else 1
+            line = json.dumps({"id": event_id, "event": event, "payload": payload}) + '\n'
+            if len(items) >= 2 * self.keep:
+                # Rewritten now and then rather than on every append
+                _write_atomic(self._path, ''.join(json.dumps(item) + '\n' for item in items[-self.keep:]) + line)
+            else:
+                with open(self._path, 'a') as f:
+                    f.write(line)
+            return event_id
+
+    def stamp(self):
+        """Value that changes whenever an event is stored (None before the first)."""
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def read_after(self, event_id):
+        """Return the stored (id, event, payload) tuples with an id above event_id."""
+        return [(item["id"], item["event"], item["payload"]) for item in self._read() if item["id"] > event_id]
+
+    def _read(self):
+        items = []
+        try:
+            with open(self._path) as f:
+                for line in f:
+                    try:
+                        items.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A line still being appended by another worker
+                        break
+        except FileNotFoundError:
+            pass
+        return items
+
+
+class SharedState:
+    """The files under SHARED_STATE_DIR."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.wallet_lock = FileLock(os.path.join(directory, 'wallet.lock'))
+        self.sync_lock = FileLock(os.path.join(directory, 'sync.lock'))
+
+    def snapshot(self, name):
+        return SharedSnapshot(self.directory, name)
+
+    def note_history(self):
+        return SharedNoteHistory(self.directory)
+
+    def event_log(self):
+        return SharedEventLog(self.directory)
+
+
+def _write_atomic(path, text):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def from_env():
+    """SharedState for SHARED_STATE_DIR, or None when the workers share nothing."""
+    directory = os.getenv('SHARED_STATE_DIR')
+    return SharedState(directory) if directory else None
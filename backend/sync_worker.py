@@ -0,0 +1,132 @@
+"""Background wallet sync worker.
+
+A single thread owns `list-notes`: it re-syncs the wallet on an adaptive
+interval through `sync()` (in app.py, a balance cache refresh, which also
+publishes the note-set deltas), so request handlers never wait for a sync
+they did not ask for.
+
+Scheduling:
+- the interval resets to `min_interval` whenever the note set changes and
+  doubles (up to `max_interval`) after every sync that finds no change;
+- after a mutation (e.g. send-tx) `request_sync(burst=True)` runs the next
+  `burst_syncs` syncs every `fast_interval` seconds to pick up the change
+  as soon as it lands;
+- `request_sync()` wakes the worker right away.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def balance_fingerprint(balance):
+    """Identify a note set so unchanged syncs can be detected cheaply."""
+    return (
+        balance.get('notes_count'),
+        balance.get('total_assets'),
+        frozenset(note['name'] for note in balance.get('notes', []))
+    )
+
+
+class SyncWorker:
+    """Periodically run `sync()` in a daemon thread."""
+
+    def __init__(self, sync, min_interval=15, max_interval=300, fast_interval=5, burst_syncs=12):
+        self.sync = sync
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fast_interval = fast_interval
+        self.burst_syncs = burst_syncs
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._interval = min_interval
+        self._burst_remaining = 0
+        self._fingerprint = None
+        self._status = {
+            "syncs": 0,
+            "errors": 0,
+            "changes": 0,
+            "last_sync_at": None,
+            "last_duration_seconds": None,
+            "last_error": None,
+            "next_sync_in_seconds": None
+        }
+
+    def start(self):
+        """Start the worker thread (no-op if it is already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="wallet-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"Sync worker started (interval {self.min_interval}-{self.max_interval}s)")
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def request_sync(self, burst=False):
+        """Wake the worker now; with burst, also switch to the fast interval for a while."""
+        if burst:
+            with self._lock:
+                self._burst_remaining = self.burst_syncs
+        self._wake.set()
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+            status["running"] = self.running
+            status["interval_seconds"] = self._interval
+            status["burst_remaining"] = self._burst_remaining
+        return status
+
+    def _run(self):
+        while True:
+            # Cleared before syncing so a request arriving mid-sync triggers another one
+            self._wake.clear()
+            wait = self._sync_once()
+            self._wake.wait(wait)
+
+    def _sync_once(self):
+        start = time.monotonic()
+        try:
+            balance = self.sync()
+        except Exception as e:
+            balance = {"error": str(e)}
+        duration = time.monotonic() - start
+
+        changed = False
+        with self._lock:
+            self._status["syncs"] += 1
+            self._status["last_sync_at"] = time.time()
+            self._status["last_duration_seconds"] = round(duration, 3)
+
+            if balance.get('error'):
+                self._status["errors"] += 1
+                self._status["last_error"] = balance['error']
+                self._interval = min(self._interval * 2, self.max_interval)
+            else:
+                fingerprint = balance_fingerprint(balance)
+                changed = fingerprint != self._fingerprint
+                self._fingerprint = fingerprint
+                if changed:
+                    self._status["changes"] += 1
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self._interval * 2, self.max_interval)
+
+            if self._burst_remaining > 0:
+                self._burst_remaining -= 1
+                wait = self.fast_interval
+            else:
+                wait = self._interval
+            self._status["next_sync_in_seconds"] = wait
+
+        if balance.get('error'):
+            logger.warning(f"Background sync failed after {duration:.1f}s: {balance['error']}")
+            return wait
+
+        logger.info(f"Background sync: {balance['notes_count']} notes in {duration:.1f}s "
+                    f"({'changed' if changed else 'unchanged'}), next in {wait}s")
+        return wait
@@ -0,0 +1,242 @@
+"""Watch the txs folder and keep an in-memory index of transaction files.
+
+The folder is scanned once at start; after that the index follows
+filesystem events, so listing transaction files never touches the disk and
+`wait_for()` wakes as soon as the wallet finishes writing a file.
+
+Backends:
+- `inotify` (Linux): a thread reads IN_CLOSE_WRITE / IN_MOVED_TO / IN_DELETE /
+  IN_MOVED_FROM events through libc; no extra dependency.
+- `poll`: used when inotify is unavailable (or TX_WATCHER=poll, e.g. for
+  bind mounts on Docker Desktop where events do not cross the VM). The
+  folder is rescanned only when its own mtime changes, and `wait_for()`
+  stats the one file it waits for.
+
+An inotify watch can succeed on a folder whose writes never produce events
+(Docker Desktop or NFS bind mounts), so `wait_for()` also stats its file
+every EVENT_CHECK_INTERVAL seconds with inotify. A file that stays on disk
+for a whole interval without an event means events are not delivered: in
+`auto` mode the watcher then switches to polling for good.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+# With inotify, seconds between wait_for() checks of the file itself
+EVENT_CHECK_INTERVAL = 0.5
+
+
+def _load_inotify():
+    """Return libc with inotify bound, or None when the platform has no inotify."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class TxFolderWatcher:
+    """In-memory index of `*.tx` files (name -> mtime) kept current by folder events."""
+
+    def __init__(self, folder, suffix='.tx', mode='auto', poll_interval=1.0):
+        self.folder = folder
+        self.suffix = suffix
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.backend = None
+        self._files = {}
+        self._cond = threading.Condition()
+        self._folder_mtime = None
+        self._thread = None
+        self._polling = False
+
+    def start(self):
+        """Scan the folder once and start following changes (no-op if running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._rescan()
+
+        fd = self._open_inotify() if self.mode in ('auto', 'inotify') else None
+        if fd is not None:
+            self.backend = 'inotify'
+            target, args = self._inotify_loop, (fd,)
+        else:
+            self.backend = 'poll'
+            self._polling = True
+            target, args = self._poll_loop, ()
+        self._thread = threading.Thread(target=target, args=args, name="tx-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.folder} with {self.backend} ({len(self._files)} tx files)")
+
+    def files(self):
+        """Return a copy of the index: {filename: mtime}."""
+        with self._cond:
+            return dict(self._files)
+
+    def wait_for(self, filename, newer_than=None, timeout=5):
+        """Wait until filename is indexed (and newer than newer_than); return False on timeout."""
+        def ready(mtime):
+            return mtime is not None and (newer_than is None or mtime > newer_than)
+
+        deadline = time.monotonic() + timeout
+        seen_without_event = False
+        with self._cond:
+            while True:
+                if ready(self._files.get(filename)):
+                    return True
+                remaining = deadline - time.monotonic()
+                if self.backend == 'inotify':
+                    self._cond.wait(max(0, min(remaining, EVENT_CHECK_INTERVAL)))
+                    if ready(self._files.get(filename)):
+                        return True
+                    # Events may never come for this folder: look at the file itself
+                    if ready(self._stat(filename)):
+                        if seen_without_event:
+                            self._events_missed(filename)
+                            return True
+                        if remaining <= 0:
+                            self._update(filename)
+                            return True
+                        seen_without_event = True
+                        continue
+                else:
+                    # Polling: check the one file we need instead of the whole folder
+                    self._cond.wait(max(0, min(remaining, 0.1)))
+                    self._update(filename)
+                    if ready(self._files.get(filename)):
+                        return True
+                if remaining <= 0:
+                    return False
+
+    def describe(self):
+        with self._cond:
+            return {"folder": self.folder, "backend": self.backend, "files": len(self._files)}
+
+    def _stat(self, filename):
+        try:
+            return os.stat(os.path.join(self.folder, filename)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _update(self, filename):
+        """Re-stat one file and record it (or its removal). Caller may hold the lock."""
+        mtime = self._stat(filename)
+        with self._cond:
+            if mtime is None:
+                self._files.pop(filename, None)
+            else:
+                self._files[filename] = mtime
+            self._cond.notify_all()
+
+    def _rescan(self):
+        files = {}
+        try:
+            self._folder_mtime = os.stat(self.folder).st_mtime
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix):
+                        try:
+                            files[entry.name] = entry.stat().st_mtime
+                        except FileNotFoundError:
+                            pass
+        except FileNotFoundError:
+            self._folder_mtime = None
+        with self._cond:
+            self._files = files
+            self._cond.notify_all()
+
+    def _open_inotify(self):
+        libc = _load_inotify()
+        if libc is None:
+            if self.mode == 'inotify':
+                logger.warning("inotify is not available here, falling back to polling")
+            return None
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify_init1 failed ({os.strerror(ctypes.get_errno())}), falling back to polling")
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.folder), WATCH_MASK) < 0:
+            logger.warning(f"Cannot watch {self.folder} ({os.strerror(ctypes.get_errno())}), falling back to polling")
+            os.close(fd)
+            return None
+        return fd
+
+    def _events_missed(self, filename):
+        """filename changed on disk without an inotify event. Caller holds the lock."""
+        self._update(filename)
+        if self.mode != 'auto' or self._polling:
+            return
+        logger.warning(f"{filename} appeared in {self.folder} without an inotify event, switching to polling")
+        self._start_polling()
+
+    def _start_polling(self):
+        # The inotify thread may keep running; its events are still applied
+        self.backend = 'poll'
+        self._polling = True
+        threading.Thread(target=self._poll_loop, name="tx-watcher-poll", daemon=True).start()
+
+    def _inotify_loop(self, fd):
+        try:
+            while self._read_events(fd):
+                pass
+        finally:
+            os.close(fd)
+        logger.warning(f"{self.folder} is no longer watchable, switching to polling")
+        self._rescan()
+        with self._cond:
+            if self._polling:
+                return
+            self.backend = 'poll'
+            self._polling = True
+        self._poll_loop()
+
+    def _read_events(self, fd):
+        """Apply one batch of events; return False once the folder watch is gone."""
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow, rescanning tx folder")
+                self._rescan()
+            elif mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                return False
+            elif name.endswith(self.suffix):
+                self._update(name)
+        return True
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                folder_mtime = os.stat(self.folder).st_mtime
+            except FileNotFoundError:
+                folder_mtime = None
+            # Adding or removing a file changes the folder mtime; rewrites of
+            # existing files are picked up by wait_for() stat-ing them directly
+            if folder_mtime != self._folder_mtime:
+                self._rescan()
@@ -0,0 +1,292 @@
+"""Runs nockchain-wallet subcommands for the Flask app.
+
+Every wallet CLI invocation goes through `run_wallet_command()`. Concurrent
+identical read-only commands are coalesced: the first caller runs the
+process and the others wait for and share its result.
+
+The executor is chosen with WALLET_EXECUTOR:
+- `local`: run the local nockchain-wallet binary (default outside Docker),
+  or the command in WALLET_CMD_PREFIX (e.g. benchmarks/fake_wallet.py)
+- `docker-cli`: `docker exec` into the wallet container (default in Docker)
+- `docker-api`: call the Docker Engine API over DOCKER_SOCKET directly
+- `replay`: answer from the recording in WALLET_REPLAY_FILE, at
+  WALLET_REPLAY_SPEED times the recorded speed (0: without delays)
+
+With WALLET_RECORD_FILE set, every command run by the executor is appended
+to that file (secrets redacted) for later replay.
+
+Every process also waits for its turn in the wallet's CommandScheduler
+(see scheduler.py): up to WALLET_MAX_READERS read-only commands at once,
+mutating commands alone, request handlers before the background sync.
+
+With SHARED_STATE_DIR set (several server processes), commands also take
+the shared wallet lock file: read-only commands together, mutating
+commands alone, across all processes.
+"""
+import contextlib
+import logging
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+from executors import DockerApiExecutor, RecordingExecutor, ReplayExecutor, SubprocessExecutor
+from metrics import REGISTRY
+from scheduler import PRIORITY_NAMES, CommandScheduler, current_priority
+from shared_state import from_env as shared_state_from_env
+
+logger = logging.getLogger(__name__)
+
+# Check if running in Docker
+NOCKCHAIN_WALLET_HOST = os.getenv('NOCKCHAIN_WALLET_HOST')
+WALLET_CONTAINER = os.getenv('WALLET_CONTAINER', 'nockchain-wallet-service')
+DOCKER_SOCKET = os.getenv('DOCKER_SOCKET', '/var/run/docker.sock')
+WALLET_EXECUTOR = os.getenv('WALLET_EXECUTOR') or ('docker-cli' if NOCKCHAIN_WALLET_HOST else 'local')
+# Command run by the local executor instead of the nockchain-wallet on PATH
+WALLET_CMD_PREFIX = shlex.split(os.getenv('WALLET_CMD_PREFIX', '')) or ['nockchain-wallet']
+WALLET_RECORD_FILE = os.getenv('WALLET_RECORD_FILE')
+WALLET_REPLAY_FILE = os.getenv('WALLET_REPLAY_FILE')
+WALLET_REPLAY_SPEED = float(os.getenv('WALLET_REPLAY_SPEED', 1))
+# Folder the wallet writes .tx files to, watched by app.py
+TX_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'txs')
+
+if NOCKCHAIN_WALLET_HOST:
+    # Running in Docker - wallet commands will be executed in the wallet container
+    logger.info(f"Running in Docker mode - wallet container: {NOCKCHAIN_WALLET_HOST}")
+else:
+    # Running locally - use local nockchain-wallet
+    logger.info("Running in local mode - using local nockchain-wallet")
+
+
+def create_executor(kind):
+    """Build the executor for a WALLET_EXECUTOR value."""
+    if kind == 'local':
+        return SubprocessExecutor('local', WALLET_CMD_PREFIX)
+    if kind == 'docker-cli':
+        return SubprocessExecutor('docker-cli', ['docker', 'exec', WALLET_CONTAINER, 'nockchain-wallet'],
+                                  probe_cmd=['docker', 'inspect', '--format', '{{.State.Running}}', WALLET_CONTAINER])
+    if kind == 'docker-api':
+        return DockerApiExecutor(WALLET_CONTAINER, socket_path=DOCKER_SOCKET)
+    if kind == 'replay':
+        if not WALLET_REPLAY_FILE:
+            raise ValueError("WALLET_EXECUTOR=replay needs WALLET_REPLAY_FILE")
+        return ReplayExecutor(WALLET_REPLAY_FILE, speed=WALLET_REPLAY_SPEED, tx_folder=TX_FOLDER)
+    raise ValueError(f"Unknown WALLET_EXECUTOR: {kind}")
+
+
+executor = create_executor(WALLET_EXECUTOR)
+if WALLET_RECORD_FILE:
+    executor = RecordingExecutor(executor, WALLET_RECORD_FILE, tx_folder=TX_FOLDER)
+logger.info(f"Wallet executor: {executor.describe()}")
+
+# Subcommands that only read wallet state and can safely share one process
+READ_ONLY_COMMANDS = {
+    'list-notes',
+    'list-active-addresses',
+    'list-master-addresses',
+    'show-tx',
+}
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers using the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """Run fn() unless a call with this key is running, then share its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+COMMAND_SECONDS = REGISTRY.histogram(
+    'wallet_command_duration_seconds',
+    "Wallet process run time (without the wait for a turn), by subcommand",
+    ('command',)
+)
+COMMAND_RESULTS = REGISTRY.counter(
+    'wallet_command_results_total',
+    "Wallet processes by subcommand and exit code (or timeout, closed: stream closed early, error)",
+    ('command', 'exit_code')
+)
+WAIT_SECONDS = REGISTRY.histogram(
+    'wallet_command_wait_seconds',
+    "Time wallet commands waited for their turn, by priority",
+    ('priority',)
+)
+
+
+# Outcome of the most recent wallet process, for the readiness probe
+_last_command = None
+
+
+def _record(command, start, exit_code):
+    global _last_command
+    duration = time.monotonic() - start
+    COMMAND_SECONDS.observe(duration, command=command)
+    COMMAND_RESULTS.inc(command=command, exit_code=exit_code)
+    _last_command = (command, exit_code, duration, time.monotonic())
+
+
+# One wallet per backend, so one scheduler
+scheduler = CommandScheduler(
+    max_readers=int(os.getenv('WALLET_MAX_READERS', 4)),
+    queue_timeout=float(os.getenv('WALLET_QUEUE_TIMEOUT', 120))
+)
+
+# Lock files and snapshots shared with the other server processes, if any
+shared_state = shared_state_from_env()
+
+
+def _process_lock(args):
+    """Cross-process wallet lock for a command (no-op in a single process)."""
+    if shared_state is None:
+        return contextlib.nullcontext()
+    return shared_state.wallet_lock.hold(shared=args[0] in READ_ONLY_COMMANDS)
+
+
+@contextlib.contextmanager
+def _turn(args):
+    """Hold the wallet for a command: scheduler slot, then the cross-process lock."""
+    start = time.monotonic()
+    with scheduler.slot(['nockchain-wallet'] + args, exclusive=args[0] not in READ_ONLY_COMMANDS), \
+            _process_lock(args):
+        WAIT_SECONDS.observe(time.monotonic() - start, priority=PRIORITY_NAMES[current_priority()])
+        yield
+
+
+def _run(args, timeout, check):
+    with _turn(args):
+        start = time.monotonic()
+        try:
+            result = executor.run(args, timeout=timeout, check=check)
+        except subprocess.CalledProcessError as e:
+            _record(args[0], start, e.returncode)
+            raise
+        except subprocess.TimeoutExpired:
+            _record(args[0], start, 'timeout')
+            raise
+        except Exception:
+            _record(args[0], start, 'error')
+            raise
+        _record(args[0], start, result.returncode)
+        return result
+
+
+_commands = SingleFlight()
+_results = SingleFlight()
+
+# Bumped after every mutating command so reads issued afterwards never join
+# a process that started before the wallet state changed
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def run_wallet_command(args, timeout=None, check=True):
+    """Run `nockchain-wallet <args>` and return the CompletedProcess.
+
+    Behaves like subprocess.run(capture_output=True, text=True): raises
+    CalledProcessError when check is set and TimeoutExpired on timeout.
+    """
+    global _generation
+    args = list(args)
+
+    if args[0] in READ_ONLY_COMMANDS:
+        key = (_generation, tuple(args), timeout, check)
+        return _commands.do(key, lambda: _run(args, timeout, check))
+
+    try:
+        return _run(args, timeout, check)
+    finally:
+        with _generation_lock:
+            _generation += 1
+
+
+@contextlib.contextmanager
+def open_wallet_stream(args, timeout=None):
+    """Start `nockchain-wallet <args>` and yield a stream of its stdout lines.
+
+    Use as a context manager; see executors.SubprocessStream for the interface.
+    """
+    with _turn(list(args)), executor.stream(args, timeout=timeout) as stream:
+        start = time.monotonic()
+        try:
+            yield stream
+        finally:
+            if stream.timed_out:
+                exit_code = 'timeout'
+            else:
+                # None when the stream was closed before the process ended
+                exit_code = stream.returncode if stream.returncode is not None else 'closed'
+            _record(args[0], start, exit_code)
+
+
+def coalesce(key, fn):
+    """Share fn() (typically run + parse of a read-only command) between concurrent callers."""
+    return _results.do((_generation, key), fn)
+
+
+def last_command():
+    """Return the subcommand, exit code and duration of the last wallet process, or None."""
+    if _last_command is None:
+        return None
+    command, exit_code, duration, finished = _last_command
+    return {
+        "command": command,
+        "exit_code": exit_code,
+        "duration_ms": round(duration * 1000, 1),
+        "seconds_ago": round(time.monotonic() - finished, 1)
+    }
+
+
+def runner_stats():
+    """Return process and parsed-result coalescing counters, scheduler metrics and the last command."""
+    return {
+        "commands": _commands.stats(),
+        "results": _results.stats(),
+        "scheduler": scheduler.stats(),
+        "last_command": last_command()
+    }
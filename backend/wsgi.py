@@ -0,0 +1,11 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Any WSGI server works; each server process imports this module once and
+starts its background services here (`python app.py` does the same for
+the development server).
+"""
+from app import app, start_background_sync
+
+start_background_sync()
@@ -4,6 +4,12 @@ import axios from 'axios'
 // Use environment variable or fallback
 const API_BASE = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:5007';
 
+// Read endpoints answer with an ETag and Cache-Control: no-cache, so the
+// browser keeps their bodies and revalidates each axios GET with
+// If-None-Match: an unchanged balance, history page or address list comes
+// back as a bodyless 304 and axios still sees the full cached response.
+// Keep GET URLs stable (no cache-busting parameters) to benefit from it.
+
 // DOM Elements
 const loadingDisplay = document.getElementById('loadingDisplay')
 const balanceDisplay = document.getElementById('balanceDisplay')
@@ -26,10 +32,13 @@ const sendTxModal = document.getElementById('sendTxModal')
 const createTxStep = document.getElementById('createTxStep')
 const confirmTxStep = document.getElementById('confirmTxStep')
 const processingTxStep = document.getElementById('processingTxStep')
+const processingTxMessage = document.getElementById('processingTxMessage')
+const PROCESSING_TX_MESSAGE = processingTxMessage.textContent
 const successTxStep = document.getElementById('successTxStep')
 let currentTransactionName = null
 let allNotes = []
 let selectedNotes = new Set()
+let balanceVersion = null // Snapshot version allNotes reflects, for /api/balance?since=
 
 // Sorting state
 let sortBy = 'block_height' // 'block_height' or 'assets'
@@ -38,6 +47,20 @@ let sortOrder = 'desc' // 'asc' or 'desc'
 // Current view state
 let currentView = 'notes' // 'notes' or 'history'
 
+// Transaction history pagination state
+const HISTORY_PAGE_SIZE = 50
+let historyCursor = null
+let historyHasMore = false
+let historyLoading = false
+let historyIndex = 0
+const historySentinel = document.createElement('div')
+historySentinel.className = 'text-center text-slate-500 text-sm py-4'
+const historyObserver = new IntersectionObserver(entries => {
+  if (entries.some(entry => entry.isIntersecting)) {
+    loadMoreHistory()
+  }
+})
+
 // Convert Nick to Nock
 function nickToNock(nick) {
   return (nick / 65536).toFixed(4)
@@ -91,36 +114,30 @@ function getStatusBadge(status) {
 
 // Load transaction history
 async function loadTransactionHistory() {
+  // Start over from the newest page; older pages load on scroll
+  historyCursor = null
+  historyHasMore = false
+  historyIndex = 0
+  
   try {
     historyList.innerHTML = '<div class="text-center text-slate-500 py-12">Loading history...</div>'
     
-    const response = await axios.get(`${API_BASE}/api/transaction-history`)
+    const transactions = await fetchHistoryPage()
     
-    if (response.data.success) {
-      const transactions = response.data.transactions
-      
-      if (transactions.length === 0) {
-        historyList.innerHTML = `
-          <div class="text-center text-slate-500 py-16">
-            <div class="text-6xl mb-4 opacity-50">📜</div>
-            <p class="text-xl mb-2">No transactions yet</p>
-            <p class="text-sm">Your transaction history will appear here</p>
-          </div>
-        `
-        return
-      }
-      
-      // Sort by created_at descending (most recent first)
-      transactions.sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
-      
-      historyList.innerHTML = ''
-      transactions.forEach((tx, index) => {
-        const txItem = createHistoryItem(tx, index)
-        historyList.appendChild(txItem)
-      })
-    } else {
-      throw new Error(response.data.error || 'Failed to load history')
+    if (transactions.length === 0) {
+      historyList.innerHTML = `
+        <div class="text-center text-slate-500 py-16">
+          <div class="text-6xl mb-4 opacity-50">📜</div>
+          <p class="text-xl mb-2">No transactions yet</p>
+          <p class="text-sm">Your transaction history will appear here</p>
+        </div>
+      `
+      return
     }
+    
+    historyList.innerHTML = ''
+    appendHistoryItems(transactions)
+    watchHistorySentinel()
   } catch (error) {
     historyList.innerHTML = `
       <div class="text-center text-red-500 py-12">
@@ -132,6 +149,64 @@ async function loadTransactionHistory() {
   }
 }
 
+// Fetch the next history page (newest first) and remember its cursor
+async function fetchHistoryPage() {
+  const params = { limit: HISTORY_PAGE_SIZE }
+  if (historyCursor) {
+    params.cursor = historyCursor
+  }
+  
+  const response = await axios.get(`${API_BASE}/api/transaction-history`, { params })
+  
+  if (!response.data.success) {
+    throw new Error(response.data.error || 'Failed to load history')
+  }
+  
+  historyCursor = response.data.next_cursor
+  historyHasMore = response.data.has_more
+  return response.data.transactions
+}
+
+// Render transactions at the end of the list, followed by the scroll sentinel
+function appendHistoryItems(transactions) {
+  transactions.forEach(tx => {
+    const txItem = createHistoryItem(tx, historyIndex++)
+    historyList.appendChild(txItem)
+  })
+  
+  historyList.appendChild(historySentinel)
+}
+
+// (Re)start watching the sentinel; re-observing fires again if it is still visible
+function watchHistorySentinel() {
+  historyObserver.unobserve(historySentinel)
+  if (historyHasMore) {
+    historyObserver.observe(historySentinel)
+  }
+}
+
+// Load the next page when the end of the list scrolls into view
+async function loadMoreHistory() {
+  if (historyLoading || !historyHasMore) {
+    return
+  }
+  
+  historyLoading = true
+  historySentinel.textContent = 'Loading more...'
+  try {
+    appendHistoryItems(await fetchHistoryPage())
+  } catch (error) {
+    console.error('Error loading more history:', error)
+    showErrorToast('Error loading history: ' + error.message)
+    // Stop retrying on every scroll; reopening the history view starts over
+    historyHasMore = false
+  } finally {
+    historySentinel.textContent = ''
+    historyLoading = false
+    watchHistorySentinel()
+  }
+}
+
 // Create history item
 function createHistoryItem(tx, index) {
   const txDiv = document.createElement('div')
@@ -294,6 +369,72 @@ async function loadActiveAddress() {
   }
 }
 
+// Run a long-running wallet operation as a background job (?async=true)
+// and poll it until it finishes, so the request never hits a client timeout.
+// Resolves and rejects like axios.post with the operation's response body.
+async function postJob(path, data) {
+  const submitted = await axios.post(`${API_BASE}${path}?async=true`, data)
+  const statusUrl = `${API_BASE}${submitted.data.status_url}`
+  
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, 500))
+    const { job } = (await axios.get(statusUrl)).data
+    
+    if (job.status === 'succeeded') {
+      return { data: job.result }
+    }
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      const error = new Error(job.error || `Job ${job.status}`)
+      error.response = { data: job.result || { error: error.message } }
+      throw error
+    }
+  }
+}
+
+// POST to an endpoint that answers with server-sent events and call
+// onEvent(event, data) for each one as it arrives (EventSource only does GET).
+// Resolves with the `result` event's data, rejects like axios.post on `error`.
+async function postEventStream(path, data, onEvent) {
+  const response = await fetch(`${API_BASE}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+    body: JSON.stringify(data)
+  })
+  if (!response.ok) {
+    const error = new Error(`HTTP ${response.status}`)
+    error.response = { data: await response.json().catch(() => ({ error: error.message })) }
+    throw error
+  }
+  
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      const event = block.match(/^event: (.*)$/m)?.[1] || 'message'
+      const payload = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || 'null')
+      onEvent(event, payload)
+      
+      if (event === 'result') {
+        return payload
+      }
+      if (event === 'error') {
+        const error = new Error(payload.error)
+        error.response = { data: payload }
+        throw error
+      }
+    }
+  }
+  throw new Error('Connection closed before the operation finished')
+}
+
 // Set active address
 async function setActiveAddress(address, version) {
   console.log('setActiveAddress called with:', address, 'version:', version)
@@ -305,7 +446,7 @@ async function setActiveAddress(address, version) {
     // Show loading state
     const toast = showLoadingToast('Setting active address...')
     
-    const response = await axios.post(`${API_BASE}/api/set-active-address`, {
+    const response = await postJob('/api/set-active-address', {
       address: address
     })
     
@@ -321,44 +462,16 @@ async function setActiveAddress(address, version) {
       closeAllAddressesModal()
       
       // Show success message
-      showSuccessToast('Address changed! Wallet synchronized.')
+      showSuccessToast('Address changed! Synchronizing wallet...')
       
       // IMPORTANT: Clear all notes and selected notes FIRST
       allNotes = []
       selectedNotes.clear()
+      balanceVersion = null
       
-      // The backend already returns the balance data, so we use it directly
-      const balanceData = response.data.balance
-      
-      // Update the UI with the data from the response
-      if (balanceData && !balanceData.error) {
-        // Update notes count
-        notesCount.textContent = balanceData.notes_count
-        
-        // Display total in Nock and Nick
-        const totalNock = nickToNock(balanceData.total_assets)
-        totalAssets.innerHTML = `
-          <span class="text-4xl font-bold">${totalNock}</span>
-          <span class="text-lg text-blue-100 ml-2">nock</span>
-          <br>
-          <span class="text-lg text-blue-200">${balanceData.total_assets.toLocaleString()}</span>
-          <span class="text-sm text-blue-200 ml-1">nick</span>
-        `
-        
-        // Store all notes (now that allNotes is cleared, we have a fresh start)
-        allNotes = balanceData.notes || []
-        
-        console.log('New notes loaded:', allNotes.length, 'notes for address:', address)
-        
-        // Render notes with current sorting
-        renderNotes()
-        
-        updateSendSelectedButton()
-        
-        // Show balance content, hide error
-        errorDisplay.classList.add('hidden')
-        balanceContent.classList.remove('hidden')
-      }
+      // The backend syncs the new address in the background; /api/balance
+      // waits for that sync instead of starting another one
+      await updateBalance()
       
       // Update active address display using the version passed as parameter
       const activeAddressElem = document.getElementById('activeAddress')
@@ -553,13 +666,18 @@ function copyToClipboard(text) {
 }
 
 // Update Balance Function - Modified to also load active address
-async function updateBalance() {
+// quiet: refresh in place (for pushed updates) instead of showing the loader
+async function updateBalance({ quiet = false } = {}) {
   try {
     // Show loading animation
-    loadingDisplay.classList.remove('hidden')
-    balanceDisplay.classList.add('hidden')
+    if (!quiet) {
+      loadingDisplay.classList.remove('hidden')
+      balanceDisplay.classList.add('hidden')
+    }
     
-    const response = await axios.get(`${API_BASE}/api/balance`)
+    // Once notes are loaded, only ask for what changed since that snapshot
+    const params = balanceVersion !== null && allNotes.length > 0 ? { since: balanceVersion } : {}
+    const response = await axios.get(`${API_BASE}/api/balance`, { params })
     const data = response.data
     
     // Hide loading animation
@@ -586,14 +704,20 @@ async function updateBalance() {
         <span class="text-sm text-blue-200 ml-1">nick</span>
       `
       
-      // IMPORTANT: Clear before storing new notes
-      allNotes = []
-      selectedNotes.clear()
-      
-      // Store all notes
-      allNotes = data.notes || []
-      
-      console.log('Balance updated:', allNotes.length, 'notes loaded')
+      if (data.delta) {
+        applyBalanceDelta(data)
+        console.log('Balance updated:', data.added.length, 'notes added,', data.removed.length, 'removed')
+      } else {
+        // IMPORTANT: Clear before storing new notes
+        allNotes = []
+        selectedNotes.clear()
+        
+        // Store all notes
+        allNotes = data.notes || []
+        
+        console.log('Balance updated:', allNotes.length, 'notes loaded')
+      }
+      balanceVersion = data.version ?? null
       
       // Render notes with current sorting
       renderNotes()
@@ -606,10 +730,70 @@ async function updateBalance() {
   } catch (error) {
     // Hide loading animation on error
     loadingDisplay.classList.add('hidden')
-    alert('Error: ' + error.message)
+    if (quiet) {
+      console.error('Balance refresh failed:', error)
+    } else {
+      alert('Error: ' + error.message)
+    }
   }
 }
 
+// Apply a /api/balance?since= answer to allNotes: drop the removed names,
+// insert or replace the added notes, and keep the selection on the notes
+// that are still there (selectedNotes holds indexes into allNotes)
+function applyBalanceDelta(data) {
+  const selectedNames = new Set(Array.from(selectedNotes).map(index => allNotes[index].name))
+  const removed = new Set(data.removed)
+  const added = new Map(data.added.map(note => [note.name, note]))
+  
+  allNotes = allNotes.filter(note => !removed.has(note.name) && !added.has(note.name))
+  allNotes.push(...added.values())
+  
+  selectedNotes.clear()
+  allNotes.forEach((note, index) => {
+    if (selectedNames.has(note.name)) {
+      selectedNotes.add(index)
+    }
+  })
+}
+
+// Follow backend changes over /api/events instead of polling. The backend
+// only pushes what its own syncs discover, so open tabs add no wallet load;
+// EventSource reconnects by itself and resumes from the last event id.
+// It gives up on an error status though (503 when the backend has too many
+// streams open), so then try again later.
+function subscribeToEvents() {
+  const events = new EventSource(`${API_BASE}/api/events`)
+  
+  events.addEventListener('error', () => {
+    if (events.readyState === EventSource.CLOSED) {
+      setTimeout(subscribeToEvents, 30000)
+    }
+  })
+  
+  events.addEventListener('balance', () => {
+    updateBalance({ quiet: true })
+  })
+  events.addEventListener('transaction', () => {
+    if (currentView === 'history') {
+      loadTransactionHistory()
+    }
+  })
+  events.addEventListener('active-address', () => {
+    updateBalance({ quiet: true })
+    if (currentView === 'history') {
+      loadTransactionHistory()
+    }
+  })
+  events.addEventListener('resync', () => {
+    updateBalance({ quiet: true })
+    if (currentView === 'history') {
+      loadTransactionHistory()
+    }
+  })
+  return events
+}
+
 // Create a note item with expandable details
 function createNoteItem(note, index) {
   const noteDiv = document.createElement('div')
@@ -839,6 +1023,7 @@ function resetTxModal() {
   amountLabel.textContent = 'Amount (Nock)'
   
   document.getElementById('feeInput').value = '10'
+  processingTxMessage.textContent = PROCESSING_TX_MESSAGE
   currentTransactionName = null
 }
 
@@ -908,17 +1093,17 @@ async function signAndSendTransaction() {
     confirmTxStep.classList.add('hidden')
     processingTxStep.classList.remove('hidden')
 
-    // Sign transaction
-    await axios.post(`${API_BASE}/api/sign-transaction`, {
-      transaction_name: currentTransactionName
-    })
-
-    // Send transaction
-    const response = await axios.post(`${API_BASE}/api/send-transaction`, {
+    // Sign and send in one request, showing each stage as the backend reaches it
+    const stageLabels = { sign: 'Signing transaction...', send: 'Sending transaction...' }
+    const result = await postEventStream('/api/transaction-pipeline', {
       transaction_name: currentTransactionName
+    }, (event, data) => {
+      if (event === 'stage' && data.status === 'started' && stageLabels[data.stage]) {
+        processingTxMessage.textContent = stageLabels[data.stage]
+      }
     })
 
-    if (response.data.success) {
+    if (result.success) {
       processingTxStep.classList.add('hidden')
       successTxStep.classList.remove('hidden')
       
@@ -963,18 +1148,14 @@ async function importKeysFromFile(input) {
   console.log('Sending request to:', `${API_BASE}/api/import-keys`)
 
   try {
-    const response = await axios.post(`${API_BASE}/api/import-keys`, formData)
+    const response = await postJob('/api/import-keys', formData)
     
     console.log('Response:', response.data)
     
     if (response.data.success) {
       alert('✅ ' + response.data.message + '\n\n⏳ Synchronizing wallet, please wait...')
       
-      // Wait for wallet sync
-      console.log('Waiting for wallet sync...')
-      await new Promise(resolve => setTimeout(resolve, 3000))
-      
-      // Update balance
+      // /api/balance waits for the background sync started by the import
       console.log('Updating balance...')
       await updateBalance()
       
@@ -1023,7 +1204,7 @@ async function importKeysFromSeedphrase() {
   `
   
   try {
-    const response = await axios.post(`${API_BASE}/api/import-seedphrase`, {
+    const response = await postJob('/api/import-seedphrase', {
       seedphrase: seedphrase,
       version: parseInt(version)
     })
@@ -1044,11 +1225,7 @@ async function importKeysFromSeedphrase() {
       
       alert('✅ ' + response.data.message + '\n\n⏳ Synchronizing wallet, please wait...')
       
-      // Wait for wallet sync
-      console.log('Waiting for wallet sync...')
-      await new Promise(resolve => setTimeout(resolve, 3000))
-      
-      // Update balance
+      // /api/balance waits for the background sync started by the import
       console.log('Updating balance...')
       await updateBalance()
       
@@ -1334,4 +1511,5 @@ document.addEventListener('DOMContentLoaded', function() {
 
   // Initialize
   updateBalance()
+  subscribeToEvents()
 })